@@ -0,0 +1,123 @@
+import os
+import json
+import sqlite3
+import numpy as np
+
+from simulation.cache import MODEL_VERSION
+
+FLUSH_EVERY = 256  # lookups counted before the counts are written anyway
+
+class ObjectiveMemo:
+    """On-disk memo of design scores, shared by optimizer runs, strategies and worker processes.
+
+    Candidates are snapped to a grid of resolution times the width of each
+    parameter's bounds and the snapped design is what gets simulated, so every
+    candidate in a grid cell has exactly the same scores and a hit returns what a
+    fresh run would. The entry holds all scores of the design (comfort RMSE,
+    cycles and crop mass), so the "cycle" and "crop_mass" strategies of the same
+    crop share evaluations; the optimizer stores a simulated design for every
+    crop at once. Keys also cover the site, years, crop, profile and
+    MODEL_VERSION.
+
+    The memo is an sqlite file, so an interrupted campaign resumes warm. Each
+    process opens its own connection; hit and miss counts are kept in the file
+    too, so stats() covers every worker and earlier sessions. Lookups only count
+    in memory and the counts are written with the next put, stats() or close(),
+    or every FLUSH_EVERY lookups, so a lookup never takes the write lock.
+
+    Args:
+        path (str): sqlite file, created if missing.
+        resolution (float): grid step as a fraction of the bounds width.
+    """
+
+    def __init__(self, path, resolution=1e-4):
+        self.path = path
+        self.resolution = resolution
+        self._connection = None
+        self.session = {"hits": 0, "misses": 0}
+        self.pending = {"hits": 0, "misses": 0}  # counted in session, not written yet
+
+    def __getstate__(self):
+        return {"path": self.path, "resolution": self.resolution, "_connection": None,
+                "session": {"hits": 0, "misses": 0}, "pending": {"hits": 0, "misses": 0}}
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            if os.path.dirname(self.path): os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=60)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS scores (key TEXT PRIMARY KEY, comfort REAL, cycles REAL, crop_mass REAL)")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS counts (name TEXT PRIMARY KEY, value INTEGER)")
+            self._connection.execute("INSERT OR IGNORE INTO counts VALUES ('hits', 0), ('misses', 0)")
+            self._connection.commit()
+        return self._connection
+
+    def quantize(self, values, bounds):
+        """The candidate snapped to the grid, inside the bounds."""
+        low, high = np.array(bounds, dtype=float).T
+        step = (high - low) * self.resolution
+        return np.clip(low + np.round((np.asarray(values, dtype=float) - low) / step) * step, low, high)
+
+    def key(self, site, years, crop, profile, param_dict):
+        years = list(years) if isinstance(years, (list, tuple)) else [years]
+        return json.dumps([MODEL_VERSION, site, [int(year) for year in years], crop, profile,
+                           {name: float(value) for name, value in param_dict.items()}])
+
+    def get(self, key):
+        """(comfort, cycles, crop_mass) stored for key, or None."""
+        row = self.connection.execute("SELECT comfort, cycles, crop_mass FROM scores WHERE key = ?", (key,)).fetchone()
+        name = "hits" if row is not None else "misses"
+        self.session[name] += 1
+        self.pending[name] += 1
+        if self.pending["hits"] + self.pending["misses"] >= FLUSH_EVERY:
+            with self.connection:
+                self._write_counts()
+        if row is None:
+            return None
+        return tuple(np.nan if value is None else value for value in row)  # sqlite stores NaN as NULL
+
+    def put(self, key, comfort, cycles, crop_mass):
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)", (key, float(comfort), float(cycles), float(crop_mass)))
+            self._write_counts()
+
+    def put_many(self, entries):
+        """Stores (key, comfort, cycles, crop_mass) entries in one transaction."""
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?)",
+                                        [(key, float(comfort), float(cycles), float(crop_mass)) for key, comfort, cycles, crop_mass in entries])
+            self._write_counts()
+
+    def stats(self):
+        """Hits, misses and hit rate over every process and session, plus this session's counts."""
+        with self.connection:
+            self._write_counts()
+        counts = dict(self.connection.execute("SELECT name, value FROM counts").fetchall())
+        entries = self.connection.execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+        lookups = counts["hits"] + counts["misses"]
+        return {"entries": entries, "hits": counts["hits"], "misses": counts["misses"],
+                "hit_rate": counts["hits"] / lookups if lookups else 0.0,
+                "session_hits": self.session["hits"], "session_misses": self.session["misses"]}
+
+    def clear(self):
+        with self.connection:
+            self.connection.execute("DELETE FROM scores")
+            self.connection.execute("UPDATE counts SET value = 0")
+        self.pending = {"hits": 0, "misses": 0}
+
+    def close(self):
+        """Writes the pending counts and closes this process's connection."""
+        if self._connection is None:
+            return
+        with self._connection:
+            self._write_counts()
+        self._connection.close()
+        self._connection = None
+
+    def _write_counts(self):
+        """Adds the pending counts to the counts table, inside the caller's transaction."""
+        if self.pending["hits"] or self.pending["misses"]:
+            self.connection.executemany("UPDATE counts SET value = value + ? WHERE name = ?",
+                                        [(count, name) for name, count in self.pending.items()])
+            self.pending = {"hits": 0, "misses": 0}
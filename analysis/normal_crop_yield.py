@@ -1,3 +1,4 @@
+import warnings
 import pandas as pd
 import numpy as np
 
@@ -8,13 +9,21 @@ from components.crop_model import compute_crop_growth
 from crops.retrieve_dict import get_crop_dict
 from components.const import RHO_AIR
 from data.read_nrel import compile_nrel_data, compile_multiple_nrel_data
+from simulation.forcing import build_forcing
+from simulation.quality import check_forcing
 
-def normal_crop_yield(file_path, crop):
-    
-    if isinstance(file_path, list):
-        weather_data = compile_multiple_nrel_data(file_path)
-    else:
-        weather_data = compile_nrel_data(file_path)
+def normal_crop_yield(file_path, crop, forcing=None):
+    """Crop cycles and yield grown in the open, straight on the outside temperature.
+
+    A prebuilt forcing (e.g. OptimizationContext.forcing) replaces reading file_path.
+    """
+    if forcing is None:
+        if isinstance(file_path, list):
+            weather_data = compile_multiple_nrel_data(file_path)
+        else:
+            weather_data = compile_nrel_data(file_path)
+        forcing, quality = check_forcing(build_forcing(weather_data))
+        if not quality.clean: warnings.warn(f"Weather of {file_path} repaired:\n{quality}")
     
     #T_base, T_opt, RUE, ideal_RH, RH_sensitivity, GDD_maturity, CO2_rsponse = get_crop_dict(crop)
     T_sum, HI, I50A, I50B, T_base, T_opt, RUE, I50maxH, I50maxW, T_heat, T_extreme, SCO2, S_water = get_crop_dict(crop)
@@ -26,20 +35,14 @@ def normal_crop_yield(file_path, crop):
     TT = 0
     total_crop_mass = 0
 
-    for i in range(len(weather_data)): # run the simualtion for the whole data set
-        T_ext = weather_data.loc[i, "temperature"]
-        RH_outside = weather_data.loc[i, "humidity"]
-        pressure = weather_data.loc[i, "pressure"]
-        solar = weather_data.loc[i, "solar"]
-        solar_angle = weather_data.loc[i, "solar_angle"]
-        time = weather_data.loc[i, "time"]
-        hour = pd.to_datetime(time).hour
-        date = pd.to_datetime(time)
+    for i in range(len(forcing)): # run the simualtion for the whole data set
+        T_ext = forcing.temperature[i]
+        solar = forcing.solar[i]
 
         radiation_MJ_24h += solar*0.0036
 
 
-        if hour == 0 and i>0:
+        if forcing.is_midnight[i] and i>0:
             last_day_rel_idx = max(0, i-24)
             T_air_24 = temps[last_day_rel_idx:i]
             
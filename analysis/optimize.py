@@ -1,9 +1,21 @@
+import os
+import warnings
 import numpy as np
 import pandas as pd
+from contextlib import contextmanager
+from functools import lru_cache, partial
 from scipy.optimize import differential_evolution
 from simulation.run import run_simulation 
-from greenhouse_setups.params import update_params
+from simulation.batch import run_batch_simulation
+from simulation.cache import ResultCache
+from greenhouse_setups.params import update_params, GreenhouseParams
+from greenhouse_setups.read_profiles import build_params
 from data.read_nrel import compile_nrel_data, compile_multiple_nrel_data
+from simulation.forcing import build_forcing
+from simulation.quality import check_forcing
+from simulation.crops import score_crops, crop_names
+from data.weather_store import WeatherStore
+from analysis.parallel import population_map
 
 
 PLANT_TEMPERATURE_RANGES = {
@@ -26,118 +38,343 @@ PLANT_TEMPERATURE_RANGES = {
 
 
 
-def simulate_greenhouse_raqaypampa(year, crop, profile, params=None):
-    if isinstance(year, list) or year is list:
-        file_paths = [f"data/raqaypampa/{i}.csv" for i in year]
-        weather_data = compile_multiple_nrel_data(file_paths)
-    else:
-        file_path = f"data/raqaypampa/{year}.csv"
-        weather_data = compile_nrel_data(file_path)
-    
-    # init
-    T_init = weather_data["temperature"].iloc[0]
-    RH_init = weather_data["humidity"].iloc[0]  # Initial humidity
+class OptimizationContext:
+    """Weather of one site and year set, loaded once and shared by every run on it.
+
+    Holds the weather frame, its read-only Forcing and the initial conditions taken
+    from the first hour, so the thousands of objective calls of an optimization
+    only index arrays instead of re-reading CSVs. Get one with get_context.
+
+    If a weather store was built for the site (data.weather_store) and holds the
+    years with their csv files unchanged, the forcing is read from it and
+    weather_data is None; otherwise the csv files are read through the NPZ cache
+    of compile_nrel_data. The forcing is checked with
+    simulation.quality.check_forcing; quality holds the report.
+    """
+
+    def __init__(self, site, year):
+        self.site = site
+        self.years = list(year) if isinstance(year, (list, tuple)) else [year]
+        if WeatherStore.exists(site) and WeatherStore(site).is_current(self.years):
+            self.weather_data = None
+            self.forcing = WeatherStore(site).forcing(self.years)
+        elif isinstance(year, (list, tuple)):
+            self.weather_data = compile_multiple_nrel_data([f"data/{site}/{i}.csv" for i in year], use_cache=True)
+        else:
+            self.weather_data = compile_nrel_data(f"data/{site}/{year}.csv", use_cache=True)
+        if self.weather_data is not None: self.forcing = build_forcing(self.weather_data)
+
+        # gaps, duplicates and bad values are repaired once here, not in every run
+        self.forcing, self.quality = check_forcing(self.forcing)
+        if not self.quality.clean:
+            warnings.warn(f"Weather of {site} {self.years} repaired:\n{self.quality}")
+            self.weather_data = None  # rows no longer match the repaired forcing
+
+        # init
+        self.T_init = self.forcing.temperature[0]
+        self.RH_init = self.forcing.humidity[0]  # Initial humidity
+
+    def simulate(self, crop, profile, params=None, output="full", cache=None):
+        """Runs one greenhouse design on the context's weather, see run_simulation.
+
+        params is a dict of overrides applied after the profile, or a complete
+        GreenhouseParams (then profile is ignored and the loaded setup untouched).
+        """
+        if isinstance(params, GreenhouseParams):
+            return run_simulation(self.weather_data, self.T_init, self.T_init, self.RH_init, crop, 3600,
+                                  forcing=self.forcing, params=params, output=output, cache=cache)
+        return run_simulation(self.weather_data, self.T_init, self.T_init, self.RH_init, crop, 3600, profile, params,
+                              forcing=self.forcing, output=output, cache=cache)
+
+    def simulate_batch(self, crop, designs):
+        """Runs a list of GreenhouseParams together, see run_batch_simulation."""
+        return run_batch_simulation(self.weather_data, self.T_init, self.T_init, self.RH_init, crop, 3600,
+                                    forcing=self.forcing, params=designs)
+
+    def crop_report(self, params, crops=None):
+        """Comfort RMSE, cycles and crop mass of every crop in one greenhouse design.
+
+        The design is simulated once and every crop is scored on the trajectory
+        (see simulation.crops.score_crops), instead of one run per crop.
+
+        Args:
+            params (GreenhouseParams or dict): the design, a dict is applied to DESIGN_PROFILE.
+            crops (list): crops to score, every crop in crops/simple_crop_data.json if None.
+
+        Returns:
+            DataFrame: comfort, cycles and crop_mass indexed by crop.
+        """
+        if not isinstance(params, GreenhouseParams): params = build_params(DESIGN_PROFILE, params)
+        crops = crop_names() if crops is None else list(crops)
+        simulated_data, _, _ = self.simulate(crops[0], None, params, output="states")
+        crops, comfort, cycles, crop_mass = crop_scores(simulated_data["GH_T_air"], self.forcing, crops)
+        return pd.DataFrame({"comfort": comfort, "cycles": cycles, "crop_mass": crop_mass}, index=pd.Index(crops, name="crop"))
+
+
+@lru_cache(maxsize=8)
+def _cached_context(site, year):
+    return OptimizationContext(site, list(year) if isinstance(year, tuple) else year)
+
+def get_context(year, site="raqaypampa"):
+    """The shared OptimizationContext of a site and a year or list of years."""
+    return _cached_context(site, tuple(year) if isinstance(year, list) else year)
+
+
+_INSTALLED_CONTEXT = None  # the context of a running optimization, in this process
+
+def use_context(context):
+    """Installs context as the one the objectives of this process run on.
 
-    simulated_data, cycles, crop_mass = run_simulation(weather_data, T_init, T_init, RH_init, crop, 3600, profile, params)
-    
-    return simulated_data, cycles, crop_mass
+    The initializer of the optimizers' worker pools, so each worker runs on the
+    context given to the optimizer instead of the get_context one of its years.
+    None goes back to get_context. Returns the context installed before.
+    """
+    global _INSTALLED_CONTEXT
+    previous, _INSTALLED_CONTEXT = _INSTALLED_CONTEXT, context
+    return previous
+
+
+@contextmanager
+def installed_context(context):
+    """use_context for the duration of a with block (the serial path of the optimizers)."""
+    previous = use_context(context)
+    try:
+        yield context
+    finally:
+        use_context(previous)
+
+
+def objective_context(years, site):
+    """The context the objectives run on: the installed one, else get_context(years, site)."""
+    return _INSTALLED_CONTEXT if _INSTALLED_CONTEXT is not None else get_context(years, site)
+
+
+def simulate_greenhouse_raqaypampa(year, crop, profile, params=None, output="full", cache=None):
+    return get_context(year).simulate(crop, profile, params, output=output, cache=cache)
+
+
+PARAM_BOUNDS = {
+    "nr_water_bottles": (0, 50),
+    "bottles_percent_open": (0,1),
+    #"wall_conductivity": (0.8, 0.9),
+    "wall_thickness": (0.08, 0.5),  # Wall thickness in meters
+    "gh_length": (3, 10),
+    "gh_width": (3, 10),  # Greenhouse area in m²
+    "gh_height": (1.5, 5),  # Greenhouse area in m²
+    "gh_roof_height": (0.001,0.5)
+}
+DESIGN_PROFILE = "raqay_default2.json"
+RESULT_CACHE = ResultCache(max_entries=4)  # per process, small as the memo covers most repeats; DE re-evaluates identical designs once it converges
 
 
-def optimize_greenhouse_design(year, crop, optimizing_strategy):
+def optimize_greenhouse_design(year, crop, optimizing_strategy, context=None, workers=1, seed=None, vectorized=False, memo=None):
     """
     Optimizes greenhouse parameters to maintain ideal temperature ranges for plant growth.
 
+    The population is evaluated a generation at a time (updating="deferred"), so
+    for a given seed the result is the same for any number of workers. With
+    vectorized=True a generation is simulated as one batch (see
+    run_batch_simulation) instead of one run per candidate; with several workers
+    each takes a slice of the population.
+
     Args:
         year (int): The year of weather data to use.
         crop (str): The type of plant being grown (default: tomato).
+        context (OptimizationContext): preloaded weather, get_context(year) if not given;
+            every candidate runs on it (see use_context).
+        workers (int): processes evaluating each generation, -1 for all cores.
+        seed (int): seed of differential_evolution.
+        vectorized (bool): evaluate whole generations with the population objectives.
+        memo (ObjectiveMemo): on-disk memo of design scores (analysis.memo); the
+            candidates are then snapped to its grid.
 
     Returns:
         dict: Optimized greenhouse parameters.
     """
     #target_temps = PLANT_TEMPERATURE_RANGES.get(crop)
 
-    param_bounds = {
-        "nr_water_bottles": (0, 50),
-        "bottles_percent_open": (0,1),
-        #"wall_conductivity": (0.8, 0.9),
-        "wall_thickness": (0.08, 0.5),  # Wall thickness in meters
-        "gh_length": (3, 10),
-        "gh_width": (3, 10),  # Greenhouse area in m²
-        "gh_height": (1.5, 5),  # Greenhouse area in m²
-        "gh_roof_height": (0.001,0.5)
-    }
+    param_keys = list(PARAM_BOUNDS.keys())
+    bounds = [PARAM_BOUNDS[key] for key in param_keys]
+    if context is None: context = get_context(year)
+    args = (context.site, year, crop, param_keys, memo)
 
-    bounds = [param_bounds[key] for key in param_bounds.keys()]
+    if optimizing_strategy == "cycle":
+        objective, population_objective = objective_function2, population_objective2
+    elif optimizing_strategy == "crop_mass":
+        objective, population_objective = objective_function3, population_objective3
+    else:
+        objective, population_objective = objective_function1, population_objective1
 
-    def objective_function1(param_values):
-        """
-        Objective function for optimization: Minimize temperature deviation from ideal range.
-        """
-        # Map parameter values
-        param_keys = list(param_bounds.keys())
-        param_dict = {param_keys[i]: param_values[i] for i in range(len(param_keys))}
+    with population_map(workers, use_context, (context,)) as population, installed_context(context):
+        if vectorized:
+            n_slices = workers if workers > 0 else os.cpu_count()
+            evaluate = map if population == 1 else population
 
-        simulated_data, _, _ = simulate_greenhouse_raqaypampa(year, crop, "raqay_default2.json", param_dict)
-        if simulated_data is None:
-            return np.sqrt(100000)
+            def generation_objective(candidates):
+                # differential_evolution passes (params, candidates)
+                slices = np.array_split(candidates.T, n_slices)
+                return np.concatenate(list(evaluate(partial(population_objective, site=context.site, years=year, crop=crop, param_keys=param_keys, memo=memo), slices)))
 
-        T_greenhouse = simulated_data["GH_T_air"]
+            result = differential_evolution(generation_objective, bounds, strategy="best1bin", popsize=15, tol=1,
+                                            updating="deferred", vectorized=True, seed=seed)
+        else:
+            result = differential_evolution(objective, bounds, args=args, strategy="best1bin", popsize=15, tol=1,
+                                            updating="deferred", workers=population, seed=seed)
 
-        day_mask = (simulated_data["time"].dt.hour >= 6) & (simulated_data["time"].dt.hour < 18)
-        night_mask = ~day_mask
+    #result = differential_evolution(objective_function2, bounds, strategy="best1bin", popsize=15, tol=0.5)
+    x = memo.quantize(result.x, bounds) if memo is not None else result.x
+    optimal_params = {param_keys[i]: x[i] for i in range(len(x))}
 
-        target_temps = PLANT_TEMPERATURE_RANGES[crop]
-        rmse_day = np.sqrt(np.mean(np.maximum(0, T_greenhouse[day_mask] - target_temps["day_max"])**2 + np.maximum(0, target_temps["day_min"] - T_greenhouse[day_mask])**2))
+    print("\noptimal Greenhouse params:")
+    print(optimal_params)
+    if memo is not None: print("Objective memo:", memo.stats())
+    update_params(optimal_params)
 
-        rmse_night = np.sqrt(np.mean(np.maximum(0, T_greenhouse[night_mask] - target_temps["night_max"])**2 + np.maximum(0, target_temps["night_min"] - T_greenhouse[night_mask])**2))
+    return optimal_params
 
-        total_rmse = rmse_day + rmse_night
 
-        print(f"Trying Parameters: {param_dict}, RMSE: {total_rmse:.4f}")
+def comfort_rmse(T_greenhouse, hour, crop):
+    """Day plus night RMSE outside the crop's temperature range, over the last axis."""
+    day_mask = (hour >= 6) & (hour < 18)
+    night_mask = ~day_mask
 
-        return total_rmse
+    target_temps = PLANT_TEMPERATURE_RANGES[crop]
+    T_day, T_night = T_greenhouse[..., day_mask], T_greenhouse[..., night_mask]
+    rmse_day = np.sqrt(np.mean(np.maximum(0, T_day - target_temps["day_max"])**2 + np.maximum(0, target_temps["day_min"] - T_day)**2, axis=-1))
 
-    def objective_function2(param_values):
-        """
-        Objective function: maximize the amount of cycles.
-        """
-        # Map parameter values
-        param_keys = list(param_bounds.keys())
-        param_dict = {param_keys[i]: param_values[i] for i in range(len(param_keys))}
+    rmse_night = np.sqrt(np.mean(np.maximum(0, T_night - target_temps["night_max"])**2 + np.maximum(0, target_temps["night_min"] - T_night)**2, axis=-1))
 
-        simulated_data, cycles, crop_mass = simulate_greenhouse_raqaypampa(year, crop, "raqay_default2.json", param_dict)
-        print(f"Trying Parameters: {param_dict}, CYCLES: {cycles:.4f}, CROP MASS {crop_mass:.4f}")
+    return rmse_day + rmse_night
 
-        return -cycles
 
-    def objective_function3(param_values):
-        """
-        Objective function: maximize the amount of cycles.
-        """
-        # Map parameter values
-        param_keys = list(param_bounds.keys())
-        param_dict = {param_keys[i]: param_values[i] for i in range(len(param_keys))}
+def crop_scores(T_greenhouse, forcing, crops=None):
+    """Comfort RMSE, cycles and crop mass of several crops from one trajectory.
 
-        simulated_data, cycles, crop_mass = simulate_greenhouse_raqaypampa(year, crop, "raqay_default2.json", param_dict)
-        print(f"Trying Parameters: {param_dict}, CYCLES: {cycles:.4f}, CROP MASS {crop_mass:.4f}")
+    Returns:
+        tuple: (crops, comfort, cycles, crop_mass), the scores shaped (crops,) or
+        (crops, designs) for a batch of trajectories.
+    """
+    crops, cycles, crop_mass = score_crops(T_greenhouse, forcing, 3600, crops)
+    comfort = np.array([comfort_rmse(T_greenhouse, forcing.hour, crop) for crop in crops])
+    return crops, comfort, cycles, crop_mass
 
-        return -crop_mass
 
-    if optimizing_strategy == "cycle":
-        result = differential_evolution(objective_function2, bounds, strategy="best1bin", popsize=15, tol=1)
+def _put_every_crop(memo, site, years, param_dicts, T_greenhouse, forcing):
+    # the thermal trajectory does not depend on the crop, so one run fills the entries of every crop
+    crops, comfort, cycles, crop_mass = crop_scores(T_greenhouse, forcing, list(PLANT_TEMPERATURE_RANGES))
+    if isinstance(param_dicts, dict):
+        param_dicts, comfort, cycles, crop_mass = [param_dicts], comfort[:, None], cycles[:, None], crop_mass[:, None]
+    memo.put_many((memo.key(site, years, crop, DESIGN_PROFILE, param_dict), comfort[k, j], cycles[k, j], crop_mass[k, j])
+                  for k, crop in enumerate(crops) for j, param_dict in enumerate(param_dicts))
 
-    elif optimizing_strategy == "crop_mass":
-        result = differential_evolution(objective_function3, bounds, strategy="best1bin", popsize=15, tol=1)
-    else:
-        result = differential_evolution(objective_function1, bounds, strategy="best1bin", popsize=15, tol=1)
 
+def design_scores(param_values, site, years, crop, param_keys, memo=None):
+    """Comfort RMSE, cycles and crop mass of one candidate.
 
+    Runs on the (per process) shared context, see objective_context, without
+    touching the loaded setup.
+    With an ObjectiveMemo the candidate is snapped to the memo's grid and looked
+    up before simulating; a simulated design is then stored for every crop, so
+    optimizing the next crop finds the designs already tried.
 
-    #result = differential_evolution(objective_function2, bounds, strategy="best1bin", popsize=15, tol=0.5)
-    optimal_params = {list(param_bounds.keys())[i]: result.x[i] for i in range(len(result.x))}
+    Returns:
+        tuple: (param_dict, comfort, cycles, crop_mass).
+    """
+    if memo is not None: param_values = memo.quantize(param_values, [PARAM_BOUNDS[key] for key in param_keys])
+    param_dict = {param_keys[i]: param_values[i] for i in range(len(param_keys))}
+    key = memo.key(site, years, crop, DESIGN_PROFILE, param_dict) if memo is not None else None
+    scores = memo.get(key) if memo is not None else None
+    if scores is not None:
+        return (param_dict, *scores)
+
+    params = build_params(DESIGN_PROFILE, param_dict)
+    simulated_data, cycles, crop_mass = objective_context(years, site).simulate(crop, None, params, output="states", cache=RESULT_CACHE)
+    comfort = comfort_rmse(simulated_data["GH_T_air"], simulated_data.forcing.hour, crop) if simulated_data is not None else np.sqrt(100000)
+    if memo is not None and simulated_data is not None:
+        _put_every_crop(memo, site, years, param_dict, simulated_data["GH_T_air"], simulated_data.forcing)
+    elif memo is not None:
+        memo.put(key, comfort, cycles, crop_mass)
+    return param_dict, comfort, cycles, crop_mass
+
+
+def objective_function1(param_values, site, years, crop, param_keys, memo=None):
+    """
+    Objective function for optimization: Minimize temperature deviation from ideal range.
+    """
+    param_dict, total_rmse, _, _ = design_scores(param_values, site, years, crop, param_keys, memo)
 
-    print("\noptimal Greenhouse params:")
-    print(optimal_params)
-    update_params(optimal_params)
+    print(f"Trying Parameters: {param_dict}, RMSE: {total_rmse:.4f}")
 
-    return optimal_params
+    return total_rmse
+
+
+def objective_function2(param_values, site, years, crop, param_keys, memo=None):
+    """
+    Objective function: maximize the amount of cycles.
+    """
+    param_dict, _, cycles, crop_mass = design_scores(param_values, site, years, crop, param_keys, memo)
+    print(f"Trying Parameters: {param_dict}, CYCLES: {cycles:.4f}, CROP MASS {crop_mass:.4f}")
+
+    return -cycles
+
+
+def objective_function3(param_values, site, years, crop, param_keys, memo=None):
+    """
+    Objective function: maximize the crop mass.
+    """
+    param_dict, _, cycles, crop_mass = design_scores(param_values, site, years, crop, param_keys, memo)
+    print(f"Trying Parameters: {param_dict}, CYCLES: {cycles:.4f}, CROP MASS {crop_mass:.4f}")
+
+    return -crop_mass
+
+
+def population_scores(population, site, years, crop, param_keys, memo=None):
+    """design_scores of a population shaped (candidates, params), as arrays.
+
+    The candidates not found in the memo are simulated together as one batch and
+    stored for every crop, as in design_scores.
+    """
+    population = np.array(population, dtype=float)
+    if memo is not None:
+        bounds = [PARAM_BOUNDS[key] for key in param_keys]
+        population = np.array([memo.quantize(values, bounds) for values in population])
+    scores = np.full((len(population), 3), np.nan)
+    keys = [memo.key(site, years, crop, DESIGN_PROFILE, dict(zip(param_keys, values))) for values in population] if memo is not None else None
+
+    missing = []
+    for i in range(len(population)):
+        stored = memo.get(keys[i]) if memo is not None else None
+        if stored is None:
+            missing.append(i)
+        else:
+            scores[i] = stored
+
+    if missing:
+        designs = [build_params(DESIGN_PROFILE, dict(zip(param_keys, population[i]))) for i in missing]
+        context = objective_context(years, site)
+        trajectories, cycles, crop_mass = context.simulate_batch(crop, designs)
+        scores[missing] = np.column_stack([comfort_rmse(trajectories["GH_T_air"], context.forcing.hour, crop), cycles, crop_mass])
+        if memo is not None:
+            _put_every_crop(memo, site, years, [dict(zip(param_keys, population[i])) for i in missing], trajectories["GH_T_air"], context.forcing)
+    return scores[:, 0], scores[:, 1], scores[:, 2]
+
+
+def population_objective1(population, site, years, crop, param_keys, memo=None):
+    """objective_function1 of every candidate of a population shaped (candidates, params)."""
+    total_rmse, _, _ = population_scores(population, site, years, crop, param_keys, memo)
+    print(f"Tried {len(population)} designs, best RMSE: {np.nanmin(total_rmse) if np.isfinite(total_rmse).any() else np.nan:.4f}")
+    return total_rmse
+
+
+def population_objective2(population, site, years, crop, param_keys, memo=None):
+    """objective_function2 (most cycles) of every candidate of a population."""
+    _, cycles, crop_mass = population_scores(population, site, years, crop, param_keys, memo)
+    print(f"Tried {len(population)} designs, most CYCLES: {np.nanmax(cycles) if np.isfinite(cycles).any() else np.nan:.4f}")
+    return -cycles
+
+
+def population_objective3(population, site, years, crop, param_keys, memo=None):
+    """objective_function3 (most crop mass) of every candidate of a population."""
+    _, cycles, crop_mass = population_scores(population, site, years, crop, param_keys, memo)
+    print(f"Tried {len(population)} designs, most CROP MASS: {np.nanmax(crop_mass) if np.isfinite(crop_mass).any() else np.nan:.4f}")
+    return -crop_mass
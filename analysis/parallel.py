@@ -0,0 +1,29 @@
+import os
+from contextlib import contextmanager
+from multiprocessing import Pool
+
+@contextmanager
+def population_map(workers=1, initializer=None, initargs=()):
+    """The workers argument of differential_evolution, backed by a process pool.
+
+    The pool's initializer loads the weather (or validation data) once per worker,
+    so tasks only carry the candidate vector and a few names; on Linux the workers
+    are forked and share the parent's already loaded arrays. Objectives must build
+    their parameters with build_params instead of the module globals of
+    greenhouse_setups.params, so a candidate gives the same result in any worker.
+
+    Args:
+        workers (int): processes, -1 for one per core; 1 evaluates serially.
+        initializer (callable): run once in every worker.
+        initargs (tuple): arguments of the initializer.
+
+    Yields:
+        The map-like callable (or 1) to pass as workers.
+    """
+    if workers == -1:
+        workers = os.cpu_count()
+    if workers == 1:
+        yield 1
+        return
+    with Pool(workers, initializer, initargs) as pool:
+        yield pool.map
@@ -0,0 +1,176 @@
+import os
+import numpy as np
+import pandas as pd
+from functools import partial
+
+from analysis.optimize import PARAM_BOUNDS, get_context, population_scores, use_context, installed_context
+from analysis.parallel import population_map
+
+# minimized objectives, in the column order of the scores
+OBJECTIVES = ("cycles", "crop_mass", "comfort")
+
+def optimize_pareto_designs(year, crop, context=None, generations=50, popsize=60, workers=1, seed=None, memo=None):
+    """NSGA-II search for the Pareto front of cycles, crop mass and comfort RMSE.
+
+    Replaces separate "cycle", "crop_mass" and comfort runs of
+    optimize_greenhouse_design with one campaign: every design is simulated once
+    and scored on all three objectives (see population_scores), and every
+    generation is evaluated as one batch. All evaluated designs are kept in an
+    archive and the front is taken over the archive, so no design found on the
+    way is lost. With an ObjectiveMemo the designs are snapped to its grid and
+    shared with the single-objective runs and other crops.
+
+    Args:
+        year (int or list): year(s) of weather data to use.
+        crop (str): crop whose cycles, crop mass and temperature ranges are scored.
+        context (OptimizationContext): preloaded weather, get_context(year) if not given;
+            every design runs on it (see use_context).
+        generations (int): generations after the initial population.
+        popsize (int): designs per generation.
+        workers (int): processes evaluating each generation, -1 for all cores.
+        seed (int): seed of the initial population and the variation operators.
+        memo (ObjectiveMemo): on-disk memo of design scores (analysis.memo).
+
+    Returns:
+        DataFrame: the Pareto designs, one row each with the parameters, cycles,
+        crop_mass and comfort, most cycles first.
+    """
+    param_keys = list(PARAM_BOUNDS.keys())
+    bounds = np.array([PARAM_BOUNDS[key] for key in param_keys], dtype=float)
+    if context is None: context = get_context(year)
+    rng = np.random.default_rng(seed)
+
+    archive_x, archive_scores = [], []
+    with population_map(workers, use_context, (context,)) as population, installed_context(context):
+        n_slices = workers if workers > 0 else os.cpu_count()
+        evaluate_slice = partial(population_scores, site=context.site, years=year, crop=crop, param_keys=param_keys, memo=memo)
+        pool_map = map if population == 1 else population
+
+        def evaluate(x):
+            if memo is not None: x = np.array([memo.quantize(values, bounds) for values in x])
+            slices = [np.asarray(part) for part in np.array_split(x, n_slices) if len(part)]
+            comfort, cycles, crop_mass = (np.concatenate(scores) for scores in zip(*pool_map(evaluate_slice, slices)))
+            archive_x.append(x)
+            archive_scores.append(np.column_stack([cycles, crop_mass, comfort]))
+            return x, _objectives(archive_scores[-1])
+
+        x, objectives = evaluate(bounds[:, 0] + (bounds[:, 1] - bounds[:, 0]) * rng.random((popsize, len(param_keys))))
+        rank, crowding = _rank_and_crowding(objectives)
+        for generation in range(generations):
+            parents = x[_tournament(rank, crowding, popsize, rng)]
+            children, children_objectives = evaluate(_mutate(_crossover(parents, bounds, rng), bounds, rng))
+
+            x, objectives = np.vstack([x, children]), np.vstack([objectives, children_objectives])
+            survivors = _survivors(objectives, popsize)
+            x, objectives = x[survivors], objectives[survivors]
+            rank, crowding = _rank_and_crowding(objectives)
+
+            best = -objectives.min(axis=0)
+            print(f"Generation {generation + 1}: {np.sum(rank == 0)} Pareto designs, most CYCLES: {best[0]:.4f}, "
+                  f"most CROP MASS: {best[1]:.4f}, best RMSE: {-best[2]:.4f}")
+
+    x, scores = np.vstack(archive_x), np.vstack(archive_scores)
+    x, unique = np.unique(x, axis=0, return_index=True)
+    scores = scores[unique]
+    front = pareto_front(_objectives(scores))
+    front = front[np.isfinite(_objectives(scores[front])).all(axis=1)]
+
+    designs = pd.DataFrame(x[front], columns=param_keys)
+    for k, name in enumerate(OBJECTIVES):
+        designs[name] = scores[front, k]
+    if memo is not None: print("Objective memo:", memo.stats())
+    return designs.sort_values(["cycles", "crop_mass"], ascending=False, ignore_index=True)
+
+
+def pareto_front(objectives):
+    """Indices of the non-dominated rows of minimized objectives shaped (designs, objectives)."""
+    return np.flatnonzero(~_dominance(objectives).any(axis=0))
+
+
+def non_dominated_sort(objectives):
+    """Front number of every row of minimized objectives, 0 for the Pareto front."""
+    dominates = _dominance(objectives)
+    dominated_by = dominates.sum(axis=0)
+    rank = np.full(len(objectives), -1)
+    front = np.flatnonzero(dominated_by == 0)
+    level = 0
+    while len(front):
+        rank[front] = level
+        dominated_by = dominated_by - dominates[front].sum(axis=0)
+        dominated_by[rank >= 0] = -1
+        front = np.flatnonzero(dominated_by == 0)
+        level += 1
+    return rank
+
+
+def crowding_distance(objectives):
+    """Crowding distance of every row within its front, infinite at the extremes."""
+    distance = np.zeros(len(objectives))
+    if len(objectives) <= 2:
+        return np.full(len(objectives), np.inf)
+    for column in objectives.T:
+        order = np.argsort(column, kind="stable")
+        ordered = column[order]
+        span = ordered[-1] - ordered[0]
+        distance[order[[0, -1]]] = np.inf
+        if np.isfinite(span) and span > 0:
+            distance[order[1:-1]] += (ordered[2:] - ordered[:-2]) / span
+    return distance
+
+
+def _objectives(scores):
+    # cycles and crop mass are maximized; unstable designs (NaN) are dominated by every other
+    objectives = scores * np.array([-1, -1, 1])
+    return np.where(np.isnan(objectives), np.inf, objectives)
+
+
+def _dominance(objectives):
+    """dominates[i, j] is True if row i is no worse than row j everywhere and better somewhere."""
+    no_worse = (objectives[:, None, :] <= objectives[None, :, :]).all(axis=2)
+    better = (objectives[:, None, :] < objectives[None, :, :]).any(axis=2)
+    return no_worse & better
+
+
+def _rank_and_crowding(objectives):
+    rank = non_dominated_sort(objectives)
+    crowding = np.empty(len(objectives))
+    for level in np.unique(rank):
+        members = rank == level
+        crowding[members] = crowding_distance(objectives[members])
+    return rank, crowding
+
+
+def _survivors(objectives, size):
+    """Best size rows by front, the last front cut by crowding distance."""
+    rank, crowding = _rank_and_crowding(objectives)
+    return np.lexsort((-crowding, rank))[:size]
+
+
+def _tournament(rank, crowding, size, rng):
+    """Binary tournament on (front, crowding distance)."""
+    a, b = rng.integers(len(rank), size=(2, size))
+    a_wins = (rank[a] < rank[b]) | ((rank[a] == rank[b]) & (crowding[a] >= crowding[b]))
+    return np.where(a_wins, a, b)
+
+
+def _crossover(parents, bounds, rng, probability=0.9, eta=15):
+    """Simulated binary crossover of consecutive parent pairs."""
+    children = parents.copy()
+    n_pairs = len(parents) // 2
+    first, second = parents[0:2 * n_pairs:2], parents[1:2 * n_pairs:2]
+    u = rng.random(first.shape)
+    beta = np.where(u <= 0.5, (2 * u)**(1 / (eta + 1)), (1 / (2 * (1 - u)))**(1 / (eta + 1)))
+    crossed = (rng.random((n_pairs, 1)) < probability) & (rng.random(first.shape) < 0.5)
+    beta = np.where(crossed, beta, 1)
+    children[0:2 * n_pairs:2] = 0.5 * ((1 + beta) * first + (1 - beta) * second)
+    children[1:2 * n_pairs:2] = 0.5 * ((1 - beta) * first + (1 + beta) * second)
+    return np.clip(children, bounds[:, 0], bounds[:, 1])
+
+
+def _mutate(x, bounds, rng, eta=20):
+    """Polynomial mutation of one parameter per design on average."""
+    low, high = bounds[:, 0], bounds[:, 1]
+    u = rng.random(x.shape)
+    delta = np.where(u < 0.5, (2 * u)**(1 / (eta + 1)) - 1, 1 - (2 * (1 - u))**(1 / (eta + 1)))
+    mutated = rng.random(x.shape) < 1 / x.shape[1]
+    return np.clip(x + np.where(mutated, delta * (high - low), 0), low, high)
@@ -4,6 +4,7 @@ from components.const import CP_WATER
 from components.radiation import radiation_loss_calc
 from components.walls import conduction_calc
 from components.const import BOTTLE_EVAP_RATE_HOLE, LV
+from components.vectorize import where
 
 def bottle_heat_exchange(T_top, T_bottle, bottle_mass, bottle_area, percent_open, h_bottle, dt):
     """
@@ -25,19 +26,18 @@ def bottle_heat_exchange(T_top, T_bottle, bottle_mass, bottle_area, percent_open
     THICKNESS = 0.001
 
     # Convert temperatures to Kelvin for radiation calculations
-    if bottle_mass > 0 and bottle_area > 0:
-        Q_convection = h_bottle * bottle_area * (T_top - T_bottle)
-        Q_radiation = radiation_loss_calc(T_bottle, T_top, EMISSITIVITY, bottle_area)
-        Q_conduction = conduction_calc(T_top, T_bottle, K_BOTTLE, THICKNESS, bottle_area)
-        Q_evap = BOTTLE_EVAP_RATE_HOLE*LV*percent_open*bottle_mass
-        #print(Q_radiation, Q_convection, Q_conduction)
-
-        Q_total = Q_convection + Q_conduction - Q_radiation - Q_evap  
-
-        # Compute new bottle temperature
-        M_bottle = bottle_mass * CP_WATER  # Effective thermal mass
-        T_bottle_new = T_bottle + (Q_total / M_bottle)
-
-        return Q_total, T_bottle_new
-    else:
-        return 0, T_bottle
\ No newline at end of file
+    has_bottles = (bottle_mass > 0) & (bottle_area > 0)
+
+    Q_convection = h_bottle * bottle_area * (T_top - T_bottle)
+    Q_radiation = radiation_loss_calc(T_bottle, T_top, EMISSITIVITY, bottle_area)
+    Q_conduction = conduction_calc(T_top, T_bottle, K_BOTTLE, THICKNESS, bottle_area)
+    Q_evap = BOTTLE_EVAP_RATE_HOLE*LV*percent_open*bottle_mass
+    #print(Q_radiation, Q_convection, Q_conduction)
+
+    Q_total = where(has_bottles, Q_convection + Q_conduction - Q_radiation - Q_evap, 0)
+
+    # Compute new bottle temperature
+    M_bottle = where(has_bottles, bottle_mass * CP_WATER, 1)  # Effective thermal mass
+    T_bottle_new = T_bottle + (Q_total / M_bottle)
+
+    return Q_total, T_bottle_new
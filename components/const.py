@@ -16,4 +16,9 @@ R_WATER = 461.5  # J/(kgK) for water vapor
 
 BOTTLE_EVAP_RATE_HOLE = 0.0001 # evap rate through the hole of the bottles
 
-SOLAR_TO_AIR_RATIO = 0.2
\ No newline at end of file
+SOLAR_TO_AIR_RATIO = 0.2
+
+PRESET_WATER_BOTTLE_SIZE = 3 # liters//mass
+PRESET_WATER_BOTTLE_AREA = 0.15 # square meters
+OPEN_BOTTLE_EXPOSED_RATIO = 0.0001 # share of the bottle area exposed when open
+
@@ -1,4 +1,5 @@
 import numpy as np
+from components.vectorize import where
 
 def compute_crop_growth(biomass, old_TT, radiation, T_air, T_base, T_opt, T_max, T_heat_stress, T_extreme, I_50a, RUE, CO2_conc, S_CO2):
     """FROM SIMPLE CROP MODEL
@@ -28,7 +29,7 @@ def compute_crop_growth(biomass, old_TT, radiation, T_air, T_base, T_opt, T_max,
 
 def biomass_rate(radiation, TT, T_air, T_base, T_opt, T_max, T_heat_stress, T_extreme, I_50a, RUE, CO2_conc, S_CO2):
     #assume water is fine
-    return radiation * f_solar(TT, 0.95, I_50a) * RUE * f_co2(CO2_conc, S_CO2) * f_temp(T_air, T_base, T_opt) * min(f_heat(T_max, T_heat_stress, T_extreme), 1)
+    return radiation * f_solar(TT, 0.95, I_50a) * RUE * f_co2(CO2_conc, S_CO2) * f_temp(T_air, T_base, T_opt) * np.minimum(f_heat(T_max, T_heat_stress, T_extreme), 1)
 
 # def biomass_cumulative(biomass_cum, biomass_rate):
 #     return biomass_cum + biomass_rate
@@ -37,7 +38,7 @@ def biomass_rate(radiation, TT, T_air, T_base, T_opt, T_max, T_heat_stress, T_ex
 #     return biomass_cum_maturity * hi
 
 def delta_tt(t, t_base):
-    return max(t - t_base, 0)
+    return np.maximum(t - t_base, 0)
 
 # solar func
 def f_solar(I, f_solar_max, I_50a, tt_sum=0, tt_50b=0, growth_period=True):
@@ -47,20 +48,14 @@ def f_solar(I, f_solar_max, I_50a, tt_sum=0, tt_50b=0, growth_period=True):
     #     return f_solar_max / (1 + np.exp(0.01 * (tt - (tt_sum - tt_50b))))
 
 def f_temp(t, t_base, t_opt):
-    if t < t_base:
-        return 0
-    elif t_base <= t < t_opt:
-        return (t - t_base) / (t_opt - t_base)
-    else:
-        return 1
+    span = t_opt - t_base
+    ramp = (t - t_base) / where(span > 0, span, 1)
+    return where(t < t_base, 0, where(t < t_opt, ramp, 1))
 
 def f_heat(t_max, t_heat, t_extreme):
-    if t_max <= t_heat:
-        return 1
-    elif t_heat < t_max <= t_extreme:
-        return 1 - ((t_max - t_heat) / (t_extreme - t_heat))
-    else:
-        return 0
+    span = t_extreme - t_heat
+    decline = 1 - ((t_max - t_heat) / where(span > 0, span, 1))
+    return where(t_max <= t_heat, 1, where(t_max <= t_extreme, decline, 0))
 
 def f_co2(co2, s_co2):
     if 350 <= co2 < 700:
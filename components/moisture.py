@@ -1,5 +1,6 @@
 import numpy as np
 from components.const import C_TO_K, PA_SEA_LVL, AIR_DEN, WP_RATIO, SVP_WATER
+from components.vectorize import where
 
 def compute_humidity_change(T_air, RH_air, T_ext, RH_ext, ventilation_rate, transpiration_rate, T_soil, radiation, evap_coef, T_wall, cond_coef, cond_area, T_bottle, bottle_area, debug=False):
     """
@@ -76,7 +77,7 @@ def absolute_humidity(T, RH):
         """
         svp = P_sat_calc(T)  # svp eq., Tetens eq.
         avp = RH / 100 * svp # actual vapor pressure
-        return max(0, WP_RATIO * avp / (PA_SEA_LVL - avp))  # kg/m3
+        return np.maximum(0, WP_RATIO * avp / (PA_SEA_LVL - avp))  # kg/m3
 
 
 def P_sat_calc(T):
@@ -163,11 +164,9 @@ def compute_condensation(T_air, RH_air, T_wall, cond_coef, cond_area):
     e_s_wall = P_sat_calc(T_wall)  # Saturation vapor pressure at wall (kPa)
     e_air = P_sat_calc(T_air) * (RH_air / 100)  # Actual vapor pressure (kPa)
 
-    if e_air > e_s_wall:  # Condensation occurs if the air is oversaturated
-        condensation_rate = cond_coef * cond_area * (e_air - e_s_wall)  # kg/s
-        return condensation_rate  # Moisture removed in kg/m³
-
-    return 0  # No condensation
+    # Condensation occurs if the air is oversaturated
+    condensation_rate = cond_coef * cond_area * (e_air - e_s_wall)  # kg/s
+    return where(e_air > e_s_wall, condensation_rate, 0)  # Moisture removed in kg/m³, none otherwise
 
 
 def cp_water_calc(T_water):
@@ -0,0 +1,20 @@
+import numpy as np
+
+def where(condition, x, y):
+    """Elementwise select that keeps scalar inputs scalar.
+
+    np.where always returns an ndarray, which would turn the scalar state of a
+    single simulation into 0-d arrays. Scalars take a plain branch instead, so the
+    component functions work the same for one greenhouse or a batch of them.
+
+    Args:
+        condition (bool or array): selection mask
+        x (float or array): value where condition holds
+        y (float or array): value elsewhere
+
+    Returns:
+        float or array: selected values
+    """
+    if np.ndim(condition) == 0:
+        return x if condition else y
+    return np.where(condition, x, y)
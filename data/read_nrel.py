@@ -1,5 +1,41 @@
+import os
+import hashlib
+import numpy as np
 import pandas as pd
 
+
+# parsed weather files, see compile_nrel_data
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+def _parser_version():
+    """Hash of this module, so frames cached by an older parser are not reused."""
+    with open(__file__, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()[:16]
+
+PARSER_VERSION = _parser_version()
+
+# NSRDB columns the model reads, with their names in the weather frame
+NREL_COLUMNS = {
+    "Temperature": "temperature",
+    "Relative Humidity": "humidity",
+    "DNI": "solar",
+    "Pressure": "pressure",
+    "Solar Zenith Angle": "solar_angle",
+}
+
+# further NSRDB columns that can be requested with extra_columns
+NREL_EXTRA_COLUMNS = {
+    "GHI": "ghi",
+    "DHI": "dhi",
+    "Wind Speed": "wind_speed",
+    "Wind Direction": "wind_direction",
+    "Dew Point": "dew_point",
+    "Precipitable Water": "precipitable_water",
+    "Cloud Type": "cloud_type",
+    "Clearsky DNI": "clearsky_dni",
+}
+
 def load_csv_profile():
     pass
 
@@ -8,7 +44,67 @@ def save_csv():
     pass
 
 
-def compile_nrel_data(file_path):
+def compile_nrel_data(file_path, use_cache=False, fast=False, extra_columns=()):
+    """Reads an NSRDB csv into the weather DataFrame the simulation runs on.
+
+    With use_cache the parsed frame is cached as an NPZ file in CACHE_DIR. It is
+    reused while the source file keeps its mtime and size, or, if those changed,
+    its content hash, and while PARSER_VERSION (a hash of this module) is
+    unchanged, so repeated loads skip the CSV parsing. The frame is returned as parsed: gaps
+    and bad values are repaired by the simulation entry points
+    (simulation.quality.check_weather).
+
+    Args:
+        file_path (str): NSRDB csv file.
+        use_cache (bool): read and write the cache; off by default, so a plain
+            load leaves no files behind.
+        fast (bool): parse with read_nrel_fast (float32 values) instead of the
+            reference parser.
+        extra_columns (tuple): names from NREL_EXTRA_COLUMNS to keep as well, e.g. "ghi".
+
+    Returns:
+        DataFrame: time, year, month, day, hour, temperature, humidity, solar, pressure and solar_angle.
+    """
+    variant = ("fast" if fast else "reference", *extra_columns)
+    if use_cache:
+        weather_data = _load_cached(file_path, variant)
+        if weather_data is not None:
+            return weather_data
+
+    weather_data = read_nrel_fast(file_path, extra_columns) if fast else parse_nrel_data(file_path, extra_columns)
+    if use_cache:
+        _store_cached(file_path, weather_data, variant)
+    return weather_data
+
+
+def read_nrel_fast(file_path, extra_columns=()):
+    """Column-pruned, typed NSRDB reader.
+
+    Parses only the date and model columns (plus extra_columns) with explicit
+    dtypes: int16 dates and float32 values. The timestamps are computed from
+    Year/Month/Day/Hour/Minute with datetime64 arithmetic instead of pd.to_datetime.
+    The values differ from parse_nrel_data only by the float32 rounding.
+    """
+    _check_extra_columns(extra_columns)
+    extras = {source: name for source, name in NREL_EXTRA_COLUMNS.items() if name in extra_columns}
+
+    dates = {"Year": np.int16, "Month": np.int16, "Day": np.int16, "Hour": np.int16, "Minute": np.int16}
+    values = {source: np.float32 for source in (*NREL_COLUMNS, *extras)}
+    raw = pd.read_csv(file_path, skiprows=2, usecols=[*dates, *values], dtype={**dates, **values}, engine="c")
+
+    year, month, day, hour, minute = (raw[column].to_numpy() for column in dates)
+    months = ((year.astype(np.int64) - 1970) * 12 + month - 1).astype("datetime64[M]")
+    time = months.astype("datetime64[D]") + (day - 1).astype("timedelta64[D]")
+    time = time.astype("datetime64[ns]") + hour.astype("timedelta64[h]") + minute.astype("timedelta64[m]")
+
+    weather_data = pd.DataFrame({"time": time, "year": year, "month": month, "day": day, "hour": hour})
+    for source, name in (*NREL_COLUMNS.items(), *extras.items()):
+        weather_data[name] = raw[source].to_numpy()
+    return weather_data
+
+
+def parse_nrel_data(file_path, extra_columns=()):
+    _check_extra_columns(extra_columns)
     weather_data = pd.read_csv(file_path, skiprows=2)
 
     # Rename columns for clarity's sake.
@@ -26,19 +122,68 @@ def compile_nrel_data(file_path):
 
 
     weather_data["time"] = pd.to_datetime(weather_data[["year", "month", "day", "hour"]]) # single data format
-    weather_data = weather_data[["time", "year", "month", "day", "hour", "temperature", "humidity", "solar", "pressure", "solar_angle"]] # relevant info
+    weather_data = weather_data.rename(columns=NREL_EXTRA_COLUMNS)
+    weather_data = weather_data[["time", "year", "month", "day", "hour", "temperature", "humidity", "solar", "pressure", "solar_angle", *extra_columns]] # relevant info
     weather_data[["temperature", "humidity", "solar", "solar_angle"]] = weather_data[["temperature", "humidity", "solar", "solar_angle"]].astype(float) # to float
 
     #weather_data["pressure"] *= 100 # hPa to Pa
 
     return weather_data
 
-def compile_multiple_nrel_data(file_paths):
+def compile_multiple_nrel_data(file_paths, use_cache=False, fast=False, extra_columns=()):
     all_weather_data = []
     
     for file_path in file_paths:
-        yearly_data = compile_nrel_data(file_path)
+        yearly_data = compile_nrel_data(file_path, use_cache=use_cache, fast=fast, extra_columns=extra_columns)
         all_weather_data.append(yearly_data)
     
     compiled_data = pd.concat(all_weather_data, ignore_index=True)
-    return compiled_data
\ No newline at end of file
+    return compiled_data
+
+def _check_extra_columns(extra_columns):
+    unknown = set(extra_columns) - set(NREL_EXTRA_COLUMNS.values())
+    if unknown:
+        raise KeyError(f"Unknown extra columns {sorted(unknown)}, expected some of {list(NREL_EXTRA_COLUMNS.values())}")
+
+
+def _cache_path(file_path, variant):
+    name = hashlib.sha1(repr((os.path.abspath(file_path), variant)).encode()).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, name + ".npz")
+
+
+def _file_hash(file_path):
+    with open(file_path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def _load_cached(file_path, variant):
+    """The cached frame of file_path, or None if there is none or the file changed."""
+    cache_path = _cache_path(file_path, variant)
+    if not os.path.exists(cache_path):
+        return None
+
+    stat = os.stat(file_path)
+    with np.load(cache_path) as cached:
+        if str(cached["__path"]) != os.path.abspath(file_path) or "__parser" not in cached.files or str(cached["__parser"]) != PARSER_VERSION:
+            return None
+        touched = int(cached["__mtime_ns"]) != stat.st_mtime_ns or int(cached["__size"]) != stat.st_size
+        # touched or copied: only the content decides
+        if touched and str(cached["__sha256"]) != _file_hash(file_path):
+            return None
+        columns = [name for name in cached.files if not name.startswith("__")]
+        weather_data = pd.DataFrame({name: cached[name] for name in columns})
+
+    if touched:
+        _store_cached(file_path, weather_data, variant)  # same content, remember the new mtime
+    return weather_data
+
+
+def _store_cached(file_path, weather_data, variant):
+    stat = os.stat(file_path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = _cache_path(file_path, variant)
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        np.savez(file, __path=os.path.abspath(file_path), __parser=PARSER_VERSION, __mtime_ns=stat.st_mtime_ns, __size=stat.st_size,
+                 __sha256=_file_hash(file_path), **{name: weather_data[name].to_numpy() for name in weather_data.columns})
+    os.replace(tmp_path, cache_path)
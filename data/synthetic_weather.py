@@ -0,0 +1,161 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+from data.read_nrel import compile_nrel_data
+
+# modelled series; solar is modelled through its clearness, solar / clear-sky solar
+VARIABLES = ("temperature", "humidity", "pressure", "clearness")
+MIN_CLEARSKY = 50  # W/m², clear-sky solar below which the clearness is not fitted
+DAYS_PER_YEAR = 365
+
+class WeatherModel:
+    """Statistical weather of one site, fitted by fit_weather_model.
+
+    Every variable is a mean of seasonal and diurnal harmonics (with their
+    interaction, so the daily range changes over the year) plus an AR(1) residual;
+    the residual innovations are correlated across variables. The solar geometry
+    is taken from the data as a climatology: the zenith angle and clear-sky solar
+    per day of year and hour.
+    """
+
+    def __init__(self, coefficients, phi, innovation_cov, zenith, clearsky, site=None):
+        self.coefficients = coefficients  # (features, variables)
+        self.phi = phi  # (variables,) lag-1 autocorrelation of the residuals
+        self.innovation_cov = innovation_cov  # (variables, variables)
+        self.zenith = zenith  # (365, 24) degrees
+        self.clearsky = clearsky  # (365, 24) W/m²
+        self.site = site
+
+    def mean(self, day_of_year, hour):
+        """Harmonic mean of every variable, shaped (steps, variables)."""
+        return _harmonics(day_of_year, hour) @ self.coefficients
+
+
+def fit_weather_model(site="raqaypampa", years=None):
+    """Fits a WeatherModel to the yearly NSRDB csv files under data/<site>.
+
+    Args:
+        site (str): folder under data/ holding <year>.csv files.
+        years (list): years to fit on, every csv in the folder if None.
+
+    Returns:
+        WeatherModel: the fitted model.
+    """
+    site_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), site)
+    if years is None:
+        years = sorted(int(name[:-4]) for name in os.listdir(site_dir) if name[:-4].isdigit() and name.endswith(".csv"))
+    frames = [compile_nrel_data(os.path.join(site_dir, f"{year}.csv"), extra_columns=("clearsky_dni",)) for year in years]
+
+    day_of_year = np.concatenate([_day_of_year(frame["time"].to_numpy()) for frame in frames])
+    hour = np.concatenate([frame["hour"].to_numpy() for frame in frames])
+    weather = pd.concat(frames, ignore_index=True)
+
+    clearsky = weather["clearsky_dni"].to_numpy(dtype=float)
+    sunlit = clearsky > MIN_CLEARSKY
+    clearness = np.full(len(weather), np.nan)
+    clearness[sunlit] = np.clip(weather["solar"].to_numpy(dtype=float)[sunlit] / clearsky[sunlit], 0, 1)
+    values = np.column_stack([weather["temperature"].to_numpy(dtype=float), weather["humidity"].to_numpy(dtype=float),
+                              weather["pressure"].to_numpy(dtype=float), clearness])
+
+    features = _harmonics(day_of_year, hour)
+    coefficients = np.empty((features.shape[1], len(VARIABLES)))
+    for k in range(len(VARIABLES)):
+        valid = ~np.isnan(values[:, k])
+        coefficients[:, k] = np.linalg.lstsq(features[valid], values[valid, k], rcond=None)[0]
+    residuals = values - features @ coefficients
+
+    # AR(1) per variable, on pairs of consecutive hours within each year
+    same_year = np.ones(len(weather), dtype=bool)
+    same_year[np.cumsum([len(frame) for frame in frames])[:-1]] = False
+    same_year = same_year[1:]
+    now, before = residuals[1:][same_year], residuals[:-1][same_year]
+    phi = np.empty(len(VARIABLES))
+    for k in range(len(VARIABLES)):
+        valid = ~np.isnan(now[:, k]) & ~np.isnan(before[:, k])
+        phi[k] = np.sum(now[valid, k] * before[valid, k]) / np.sum(before[valid, k]**2)
+    innovations = now - before * phi
+    innovation_cov = pd.DataFrame(innovations).cov().to_numpy()  # pairwise, skips the night gaps of the clearness
+
+    zenith, sky = (np.zeros((DAYS_PER_YEAR, 24)) for _ in range(2))
+    counts = np.zeros((DAYS_PER_YEAR, 24))
+    np.add.at(zenith, (day_of_year, hour), weather["solar_angle"].to_numpy(dtype=float))
+    np.add.at(sky, (day_of_year, hour), clearsky)
+    np.add.at(counts, (day_of_year, hour), 1)
+    counts = np.maximum(counts, 1)
+
+    return WeatherModel(coefficients, phi, innovation_cov, zenith / counts, sky / counts, site)
+
+
+def generate_weather(model, years=1, seed=0, start_year=2001, chunk_days=365):
+    """Streams synthetic hourly weather in the schema of compile_nrel_data.
+
+    The output depends on the seed only, not on chunk_days, so a long run can be
+    regenerated piece by piece. February 29 is skipped, as in the NSRDB files.
+
+    Args:
+        model (WeatherModel): fitted weather model.
+        years (int): length of the series in years.
+        seed (int): seed of the random residuals; one seed per synthetic site.
+        start_year (int): calendar year of the first step.
+        chunk_days (int): days per yielded DataFrame.
+
+    Yields:
+        DataFrame: time, year, month, day, hour, temperature, humidity, solar,
+        pressure and solar_angle of the next chunk.
+    """
+    rng = np.random.default_rng(seed)
+    mixing = np.linalg.cholesky(model.innovation_cov + 1e-12 * np.eye(len(VARIABLES)))
+    stationary = np.sqrt(np.diag(model.innovation_cov) / (1 - model.phi**2))
+    state = rng.standard_normal(len(VARIABLES)) * stationary  # residuals before the first step
+
+    days = pd.date_range(f"{start_year}-01-01", f"{start_year + years - 1}-12-31", freq="D")
+    days = days[~((days.month == 2) & (days.day == 29))].to_numpy().astype("datetime64[h]")
+
+    for start in range(0, len(days), chunk_days):
+        time = (days[start:start + chunk_days, None] + np.arange(24).astype("timedelta64[h]")).ravel()
+        hour = np.tile(np.arange(24), len(time) // 24)
+        day_of_year = _day_of_year(time)
+
+        innovations = rng.standard_normal((len(time), len(VARIABLES))) @ mixing.T
+        residuals = np.empty_like(innovations)
+        for k in range(len(VARIABLES)):
+            residuals[:, k], _ = lfilter([1], [1, -model.phi[k]], innovations[:, k], zi=[model.phi[k] * state[k]])
+        state = residuals[-1]
+
+        temperature, humidity, pressure, clearness = (model.mean(day_of_year, hour) + residuals).T
+        dates = pd.DatetimeIndex(time)
+        weather_data = pd.DataFrame({
+            "year": dates.year.to_numpy(dtype=np.int64),
+            "month": dates.month.to_numpy(dtype=np.int64),
+            "day": dates.day.to_numpy(dtype=np.int64),
+            "hour": hour.astype(np.int64),
+        })
+        weather_data.insert(0, "time", pd.to_datetime(weather_data[["year", "month", "day", "hour"]]))  # as parse_nrel_data
+        weather_data["temperature"] = temperature
+        weather_data["humidity"] = np.clip(humidity, 0, 100)
+        weather_data["solar"] = model.clearsky[day_of_year, hour] * np.clip(clearness, 0, 1)
+        weather_data["pressure"] = np.round(pressure).astype(np.int64)
+        weather_data["solar_angle"] = model.zenith[day_of_year, hour]
+        yield weather_data
+
+
+def _day_of_year(time):
+    """Day of the year from 0 to 364, with February 29 counted as February 28."""
+    days = np.asarray(time).astype("datetime64[D]")
+    years = days.astype("datetime64[Y]")
+    day_of_year = (days - years.astype("datetime64[D]")).astype(np.int64)
+    year = years.astype(np.int64) + 1970
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    return np.where(leap & (day_of_year >= 59), day_of_year - 1, day_of_year)
+
+
+def _harmonics(day_of_year, hour):
+    """Regression features: constant, seasonal and diurnal harmonics and their interaction."""
+    season = 2 * np.pi * np.asarray(day_of_year) / DAYS_PER_YEAR
+    day = 2 * np.pi * np.asarray(hour) / 24
+    seasonal = [np.cos(season), np.sin(season), np.cos(2 * season), np.sin(2 * season)]
+    diurnal = [np.cos(day), np.sin(day), np.cos(2 * day), np.sin(2 * day), np.cos(3 * day), np.sin(3 * day)]
+    interaction = [s * d for s in seasonal[:2] for d in diurnal[:2]]
+    return np.column_stack([np.ones(len(season)), *seasonal, *diurnal, *interaction])
@@ -0,0 +1,134 @@
+import os
+import json
+import numpy as np
+
+from data.read_nrel import compile_nrel_data
+from simulation.forcing import Forcing, FORCING_COLUMNS
+
+STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".store")
+
+def build_weather_store(site, years=None, store_dir=STORE_DIR):
+    """Consolidates the yearly NSRDB csv files of a site into one weather store.
+
+    Writes <site>.f64.npy, a float64 array shaped (columns, steps) with the forcing
+    columns (the values the model computes with, so a store gives the same runs
+    as the csv files), <site>.time.npy with the timestamps (ns) and <site>.json,
+    the index of years with their offsets and the mtime and size of their csv.
+    Years are stored in ascending order, so any range of consecutive years is one
+    contiguous slice. Each year is stored as compile_nrel_data parses it; the
+    forcing read back is checked by its user (see analysis.optimize).
+
+    Args:
+        site (str): folder under data/ holding <year>.csv files.
+        years (list): years to include, every csv in the folder if None.
+        store_dir (str): where the store is written.
+
+    Returns:
+        WeatherStore: the new store, opened read-only.
+    """
+    site_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), site)
+    if years is None:
+        years = [int(name[:-4]) for name in os.listdir(site_dir) if name[:-4].isdigit() and name.endswith(".csv")]
+    years = sorted(int(year) for year in years)
+
+    sources = [os.path.join(site_dir, f"{year}.csv") for year in years]
+    frames = [compile_nrel_data(source) for source in sources]
+    n_steps = sum(len(frame) for frame in frames)
+
+    os.makedirs(store_dir, exist_ok=True)
+    values = np.lib.format.open_memmap(os.path.join(store_dir, f"{site}.f64.npy"), mode="w+", dtype=np.float64, shape=(len(FORCING_COLUMNS), n_steps))
+    times = np.lib.format.open_memmap(os.path.join(store_dir, f"{site}.time.npy"), mode="w+", dtype=np.int64, shape=(n_steps,))
+
+    index = {"site": site, "columns": list(FORCING_COLUMNS), "steps": n_steps, "years": {}}
+    offset = 0
+    for year, source, frame in zip(years, sources, frames):
+        length = len(frame)
+        for row, column in enumerate(FORCING_COLUMNS):
+            values[row, offset:offset + length] = frame[column].to_numpy(dtype=np.float64)
+        times[offset:offset + length] = frame["time"].to_numpy().astype("datetime64[ns]").view(np.int64)
+        index["years"][str(year)] = {"offset": offset, "length": length, "source": _source_stamp(source)}
+        offset += length
+
+    values.flush()
+    times.flush()
+    del values, times
+    with open(os.path.join(store_dir, f"{site}.json"), "w") as file:
+        json.dump(index, file, indent=4)
+
+    return WeatherStore(site, store_dir)
+
+
+class WeatherStore:
+    """Read-only, memory-mapped weather of one site (see build_weather_store).
+
+    Slices of consecutive years are views into the mapped file, so opening the same
+    store in many worker processes shares one copy of the data through the page
+    cache instead of one parsed DataFrame per worker. A year whose csv changed
+    since the store was built is stale (see is_current) and should be read from
+    the csv, or the store rebuilt.
+    """
+
+    def __init__(self, site, store_dir=STORE_DIR):
+        with open(os.path.join(store_dir, f"{site}.json")) as file:
+            self.index = json.load(file)
+        self.site = site
+        self.store_dir = store_dir
+        self.columns = tuple(self.index["columns"])
+        self.values = np.load(os.path.join(store_dir, f"{site}.f64.npy"), mmap_mode="r")
+        self.times = np.load(os.path.join(store_dir, f"{site}.time.npy"), mmap_mode="r").view("datetime64[ns]")
+
+    @staticmethod
+    def exists(site, store_dir=STORE_DIR):
+        return all(os.path.exists(os.path.join(store_dir, f"{site}{suffix}")) for suffix in (".json", ".f64.npy", ".time.npy"))
+
+    @property
+    def years(self):
+        return [int(year) for year in self.index["years"]]
+
+    def has_years(self, years):
+        return all(str(year) in self.index["years"] for year in years)
+
+    def is_current(self, years):
+        """True if every year is stored and its csv kept the mtime and size it was stored with."""
+        site_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), self.site)
+        return self.has_years(years) and all(
+            self.index["years"][str(year)].get("source") == _source_stamp(os.path.join(site_dir, f"{year}.csv")) for year in years)
+
+    def span(self, years):
+        """(start, stop) steps of a range of consecutive stored years."""
+        years = sorted(int(year) for year in np.atleast_1d(years))
+        entries = [self.index["years"].get(str(year)) for year in years]
+        if None in entries:
+            raise KeyError(f"Years {[year for year, entry in zip(years, entries) if entry is None]} are not in the {self.site} store")
+        for before, after in zip(entries, entries[1:]):
+            if before["offset"] + before["length"] != after["offset"]:
+                raise ValueError(f"Years {years} are not consecutive in the {self.site} store")
+        return entries[0]["offset"], entries[-1]["offset"] + entries[-1]["length"]
+
+    def slice(self, years):
+        """Zero-copy views of the forcing columns and times of consecutive years.
+
+        Returns:
+            tuple: (dict of float64 column views, datetime64[ns] time view).
+        """
+        start, stop = self.span(years)
+        return {column: self.values[row, start:stop] for row, column in enumerate(self.columns)}, self.times[start:stop]
+
+    def forcing(self, years):
+        """Forcing of the given years in the given order.
+
+        The years need not be consecutive: the per-year views are joined in order,
+        which copies them into the Forcing's own arrays.
+        """
+        spans = [self.span(year) for year in np.atleast_1d(years)]
+        time = np.concatenate([self.times[start:stop] for start, stop in spans])
+        return Forcing(time, *(np.concatenate([self.values[self.columns.index(column), start:stop] for start, stop in spans])
+                               for column in FORCING_COLUMNS))
+
+
+def _source_stamp(path):
+    """mtime (ns) and size of a source csv, or None if it is missing."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
@@ -1,5 +1,9 @@
 import json
 import numpy as np
+from dataclasses import dataclass, field, fields
+from components.const import PRESET_WATER_BOTTLE_SIZE, PRESET_WATER_BOTTLE_AREA, OPEN_BOTTLE_EXPOSED_RATIO, CP_WATER
+from components.vectorize import where
+from components.thermal_mass import thermal_mass_calc
 
 def calc_dimensions(l, w, h, roof_h):
     global wall_area, roof_area, roof_volume, ground_area, volume
@@ -101,6 +105,93 @@ def update_all_params(params):
     update_defaults(params)
     update_params(params)
 
+@dataclass(frozen=True, slots=True)
+class GreenhouseParams:
+    """Resolved greenhouse parameters plus the constants derived from them.
+
+    Built once per run and passed explicitly to simulation.update.step_cycle, so the
+    hourly step neither re-imports the module globals nor recomputes geometry and
+    material products. Fields hold floats for one design or arrays for a batch.
+    """
+
+    h_conv: float
+    vent_rate: float
+    top_vent_rate: float
+    plant_transpiration_rate: float
+    volume: float
+    wall_area: float
+    roof_area: float
+    ground_area: float
+    roof_volume: float
+    wall_cp: float
+    wall_rho: float
+    wall_conductivity: float
+    wall_thickness: float
+    wall_emissivity: float
+    wall_solar_absorp_coef: float
+    roof_conductivity: float
+    roof_thickness: float
+    roof_emissivity: float
+    roof_solar_absorp_coef: float
+    roof_rho: float
+    roof_cp: float
+    soil_depth: float
+    soil_density: float
+    soil_cp: float
+    soil_conduct: float
+    nr_water_bottles: float
+    bottles_percent_open: float
+
+    # derived, see __post_init__
+    tot_water_mass: float = field(init=False)  # kg
+    tot_bottle_area: float = field(init=False)  # m2
+    open_bottle_area: float = field(init=False)  # m2 of water exposed through open bottles
+    exchange_area: float = field(init=False)  # m2 of wall and roof
+    thermal_mass_soil: float = field(init=False)  # J/K
+    bottle_heat_capacity: float = field(init=False)  # J/K of the bottle water, 1 without bottles
+    thin_wall: bool = field(init=False)  # film walls follow the air temperature
+
+    def __post_init__(self):
+        derived = {
+            "tot_water_mass": PRESET_WATER_BOTTLE_SIZE*self.nr_water_bottles,
+            "tot_bottle_area": PRESET_WATER_BOTTLE_AREA*self.nr_water_bottles,
+            "open_bottle_area": PRESET_WATER_BOTTLE_AREA*self.nr_water_bottles*self.bottles_percent_open*OPEN_BOTTLE_EXPOSED_RATIO,
+            "exchange_area": self.wall_area + self.roof_area,
+            "thermal_mass_soil": thermal_mass_calc(0, 0, 0, 0, 0, 0, 0, 0, self.ground_area, self.soil_depth, self.soil_density, self.soil_cp, 0, 0, 0, 0),
+            "bottle_heat_capacity": where(self.nr_water_bottles > 0, PRESET_WATER_BOTTLE_SIZE*self.nr_water_bottles * CP_WATER, 1),
+            "thin_wall": self.wall_thickness < 0.01,
+        }
+        for name, value in derived.items():
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def input_names(cls):
+        return tuple(f.name for f in fields(cls) if f.init)
+
+    @classmethod
+    def from_globals(cls):
+        """Parameters of the currently loaded setup."""
+        return cls(**{name: globals()[name] for name in cls.input_names()})
+
+    @classmethod
+    def stack(cls, designs):
+        """One GreenhouseParams whose fields are arrays over the given designs."""
+        return cls(**{name: np.array([getattr(design, name) for design in designs], dtype=float) for name in cls.input_names()})
+
+
+def resolve_params(*params_dicts):
+    """GreenhouseParams for the loaded setup with the dicts applied in order.
+
+    The module globals are restored afterwards, so the loaded setup is unchanged.
+    """
+    base = {name: globals()[name] for name in ALL_PARAMS}
+    try:
+        for params in params_dicts:
+            update_all_params(params)
+        return GreenhouseParams.from_globals()
+    finally:
+        globals().update(base)
+
 ### GREENHOUSE DEFAULT PARAMS
 gh_length = 0
 gh_width = 0
@@ -143,6 +234,15 @@ roof_cp = 0
 roof_rho = 0
 R_roof = 1
 
+# every parameter set by update_all_params
+ALL_PARAMS = ("gh_length", "gh_width", "gh_height", "gh_roof_height",
+              "wall_area", "roof_area", "ground_area", "volume", "roof_volume",
+              "h_conv", "vent_rate", "top_vent_rate", "plant_transpiration_rate",
+              "nr_water_bottles", "bottles_percent_open", "thermal_mass", "thermal_mass_top",
+              "soil_depth", "soil_conduct", "soil_cp", "soil_density",
+              "wall_solar_absorp_coef", "wall_conductivity", "wall_thickness", "wall_emissivity", "wall_cp", "wall_rho", "R_wall",
+              "roof_solar_absorp_coef", "roof_conductivity", "roof_thickness", "roof_emissivity", "roof_cp", "roof_rho", "R_roof")
+
 default_params_path = "greenhouse_setups/suticollo_opt1.json"
 with open(default_params_path, "r") as file:
     params_dict = json.load(file)
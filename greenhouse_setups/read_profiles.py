@@ -1,11 +1,17 @@
 import json
-from greenhouse_setups.params import update_all_params
+from greenhouse_setups.params import update_all_params, resolve_params
 
-def load_params(data_path):
+def read_profile(data_path):
     file_path = "greenhouse_setups/" + data_path
     with open(file_path, "r") as file:
-        params_dict = json.load(file)
-        update_all_params(params_dict)
+        return json.load(file)
+
+def load_params(data_path):
+    update_all_params(read_profile(data_path))
+
+def build_params(profile=None, overrides=None):
+    """Compiles a profile plus overrides into GreenhouseParams without touching the loaded setup."""
+    return resolve_params(read_profile(profile) if profile else {}, overrides or {})
 
 def save_params(file_path, params):
     with open(file_path, "w") as file:
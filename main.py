@@ -8,7 +8,9 @@ from visuals.plot_selected_params import plot_parameters
 from gui.visualize_greenhouse import run_visualizer
 from validate.optimize import optimize_params
 from greenhouse_setups.params import update_all_params
-from analysis.optimize import simulate_greenhouse_raqaypampa, optimize_greenhouse_design
+from analysis.optimize import simulate_greenhouse_raqaypampa, optimize_greenhouse_design, get_context, PARAM_BOUNDS
+from analysis.pareto import optimize_pareto_designs
+from analysis.memo import ObjectiveMemo
 from data.read_nrel import compile_nrel_data
 from gui.interface_wip import *
 from analysis.RMSE import rmse_for_validation
@@ -85,27 +87,32 @@ run_visualizer(param_file, data)
 
 save_values = {}
 years = [2023,2022,2021,2020,2019]
-
-for optimizing in ["cycle", "crop_mass"]:
-   save_values[optimizing] = {}
-   for crop in ["Lettuce", "Tomato", "Potato", "Maize", "Cassava", "Carrot", "Greenbean", "Chard", "Parsley", "Wheat", "Barley", "Beans", "Peas", "Squash", "Quinoa"]:
-      save_values[optimizing][crop] = {}
-
-      normal_cycles, total_crop_normal = normal_crop_yield([f"data/raqaypampa/{year}.csv" for year in years], crop)
-      print(normal_cycles, total_crop_normal)
-      b_param = optimize_greenhouse_design(years, crop, optimizing)
-      _, cycles, crop_yield = simulate_greenhouse_raqaypampa(years, crop, None, b_param)
-
-      save_values[optimizing][crop]["normal_cycles"] = normal_cycles
-      save_values[optimizing][crop]["total_crop_normal"] = total_crop_normal
-      save_values[optimizing][crop]["cycles"] = cycles
-      save_values[optimizing][crop]["crop_yield"] = crop_yield
-      save_values[optimizing][crop]["b_param"] = b_param
-
-      print(save_values)
-      with open('opt_tis11_2023_2019.json', 'w') as f:
-         json.dump(save_values, f, indent=4)
-
+context = get_context(years) # weather loaded once for every strategy and crop
+memo = ObjectiveMemo("data/.cache/objectives.sqlite") # design scores shared by every objective, every crop and by reruns
+
+# one Pareto campaign per crop instead of a "cycle" and a "crop_mass" run; the best design of each is taken from the front
+save_values["cycle"], save_values["crop_mass"], save_values["pareto"] = {}, {}, {}
+for crop in ["Lettuce", "Tomato", "Potato", "Maize", "Cassava", "Carrot", "Greenbean", "Chard", "Parsley", "Wheat", "Barley", "Beans", "Peas", "Squash", "Quinoa"]:
+   normal_cycles, total_crop_normal = normal_crop_yield([f"data/raqaypampa/{year}.csv" for year in years], crop, context.forcing)
+   print(normal_cycles, total_crop_normal)
+   front = optimize_pareto_designs(years, crop, context, seed=0, memo=memo) # same seed, so every crop starts from designs already in the memo
+   save_values["pareto"][crop] = front.to_dict("records")
+
+   for optimizing, column in [("cycle", "cycles"), ("crop_mass", "crop_mass")]:
+      best = front.loc[front[column].idxmax()]
+      save_values[optimizing][crop] = {
+         "normal_cycles": normal_cycles,
+         "total_crop_normal": total_crop_normal,
+         "cycles": best["cycles"],
+         "crop_yield": best["crop_mass"],
+         "b_param": best[list(PARAM_BOUNDS)].to_dict(),
+      }
+
+   print(save_values)
+   with open('opt_tis11_2023_2019_pareto.json', 'w') as f: # Pareto schema, the single-objective results stay in opt_tis11_2023_2019.json
+      json.dump(save_values, f, indent=4)
+
+memo.close()
 print(save_values)
 
 # for crop in ["Lettuce", "Tomato", "Potato", "Maize", "Cassava", "Carrot", "Greenbean", "Chard", "Parsley", "Wheat", "Barley", "Beans", "Peas", "Squash", "Quinoa"]:
@@ -0,0 +1,129 @@
+import warnings
+import numpy as np
+
+from simulation.update import step_cycle
+from greenhouse_setups.read_profiles import load_params
+from greenhouse_setups.params import resolve_params, GreenhouseParams
+from components.crop_model import compute_crop_growth
+from crops.retrieve_dict import get_crop_dict
+from components.const import RHO_AIR
+from simulation.forcing import build_forcing, steps_per_day
+from simulation.quality import check_weather
+from simulation.kernel import simulate_compiled
+from simulation.integrators import get_integrator
+
+STATE_KEYS = ("GH_T_air", "GH_T_top", "GH_T_bottle", "GH_T_ground", "GH_T_wall_ext", "GH_T_wall_int", "GH_humidity", "crop_mass")
+
+def run_batch_simulation(weather_data, T_air_init, T_top_init, RH_init, crop, dt, profile=None, params_list=None, forcing=None, backend="python", integrator=None, params=None):
+    """Runs several greenhouse designs through the same weather in one pass.
+
+    All designs are stepped together: every state is a NumPy array with one entry
+    per design, so a sweep over N designs costs one vectorized step per hour instead
+    of N calls to update_cycle.
+
+    Args:
+        weather_data (DataFrame): weather as returned by compile_nrel_data.
+        T_air_init (float): initial greenhouse air temperature (°C).
+        T_top_init (float): initial top zone temperature (°C).
+        RH_init (float): initial relative humidity (%).
+        crop (str): crop name in crops/simple_crop_data.json.
+        dt (float): time step (s).
+        profile (str): greenhouse profile json to start from.
+        params_list (list): parameter override dicts, one per design.
+        forcing (Forcing): prebuilt forcing of weather_data, built (after check_weather) here if not given.
+        backend (str): "python" steps all designs together with NumPy, "numba" runs the
+            compiled kernel once per design.
+        integrator (str): time integration of the python backend, see run_simulation.
+            Adaptive sub-steps are shared by all designs, sized for the stiffest one.
+        params (list): GreenhouseParams, one per design, used instead of profile and
+            params_list; the loaded setup is then left untouched.
+
+    Returns:
+        tuple: (dict of state trajectories shaped (designs, steps), cycles per design, total crop mass per design).
+    """
+    if params is not None:
+        designs = list(params)
+    else:
+        if profile: load_params(profile)
+        designs = [resolve_params(params_dict) for params_dict in (params_list if params_list else [{}])]
+    n_designs = len(designs)
+    if forcing is None:
+        weather_data, quality = check_weather(weather_data)
+        if not quality.clean: warnings.warn(f"Weather repaired:\n{quality}", stacklevel=2)
+        forcing = build_forcing(weather_data)
+    n_steps = len(forcing)
+
+    integrator = get_integrator(integrator)
+    if backend == "numba":
+        if integrator is not None: raise ValueError("The numba backend only integrates with forward Euler")
+        runs = [simulate_compiled(forcing, design, crop, dt, T_air_init, T_top_init, RH_init) for design in designs]
+        trajectories = {key: np.array([result[key] for result, _, _ in runs]) for key in STATE_KEYS}
+        return trajectories, np.array([cycles for _, cycles, _ in runs]), np.array([crop_mass for _, _, crop_mass in runs])
+
+    params = GreenhouseParams.stack(designs)
+    if integrator is not None: integrator.reset()
+
+    T_air = np.full(n_designs, T_air_init, dtype=float)
+    T_wall_ext = T_air.copy()
+    T_wall_int = T_air.copy()
+    T_top = np.full(n_designs, T_top_init, dtype=float)
+    T_bottle = T_air + 5
+    T_ground = T_air.copy()
+    RH_air = np.full(n_designs, RH_init, dtype=float)
+    old_rho_air = RHO_AIR
+    old_rho_air_top = RHO_AIR
+
+    trajectories = {key: np.empty((n_designs, n_steps)) for key in STATE_KEYS}
+
+    T_sum, HI, I50A, I50B, T_base, T_opt, RUE, I50maxH, I50maxW, T_heat, T_extreme, SCO2, S_water = get_crop_dict(crop)
+    TT = np.zeros(n_designs)
+    crop_mass = np.zeros(n_designs)
+    radiation_MJ_24h = 0
+    day_steps = steps_per_day(dt)
+    cycles = np.zeros(n_designs)
+    is_unstable = False
+    total_crop_mass = np.zeros(n_designs)
+
+    for i in range(n_steps):
+        radiation_MJ_24h += forcing.solar[i]*0.0036*(dt/3600)
+
+        if forcing.is_midnight[i] and i>0:
+            T_air_24 = trajectories["GH_T_air"][:, max(0, i-day_steps):i]
+
+            # crops, all designs at once
+            T_max, T_mean = T_air_24.max(axis=1), T_air_24.mean(axis=1)
+            crop_mass, TT = compute_crop_growth(crop_mass, TT, radiation_MJ_24h, T_mean, T_base, T_opt, T_max, T_heat, T_extreme, I50A, RUE, 400, SCO2)
+            matured = TT >= T_sum
+            total_crop_mass += np.where(matured, crop_mass, 0)
+            TT = np.where(matured, 0, TT)
+            crop_mass = np.where(matured, 0.01, crop_mass)
+            cycles += matured
+
+            radiation_MJ_24h = 0
+
+        T_air, T_top, T_wall_ext, T_wall_int, T_ground, T_bottle, RH_air, old_rho_air, old_rho_air_top, is_unstable, _ = step_cycle(
+            forcing.temperature[i], T_top, T_air,
+            T_ground, T_wall_ext, T_wall_int, T_bottle,
+            forcing.solar[i], forcing.solar_angle[i],
+            RH_air, forcing.humidity[i],
+            forcing.pressure[i],
+
+            400, 3,
+            old_rho_air, old_rho_air_top,
+
+            dt, forcing.time[i], is_unstable, params, i, integrator, "states",
+        )
+
+        trajectories["GH_T_air"][:, i] = T_air
+        trajectories["GH_T_top"][:, i] = T_top
+        trajectories["GH_T_bottle"][:, i] = T_bottle
+        trajectories["GH_T_ground"][:, i] = T_ground
+        trajectories["GH_T_wall_ext"][:, i] = T_wall_ext
+        trajectories["GH_T_wall_int"][:, i] = T_wall_int
+        trajectories["GH_humidity"][:, i] = RH_air
+        trajectories["crop_mass"][:, i] = crop_mass
+
+    cycles += TT/T_sum
+    total_crop_mass += crop_mass
+
+    return trajectories, cycles, total_crop_mass
@@ -0,0 +1,171 @@
+import os
+import copy
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+from simulation.forcing import FORCING_COLUMNS
+from simulation.results import SimulationResult
+from crops.retrieve_dict import get_crop_dict
+
+# packages whose sources (code, profiles and crop data) define the model
+MODEL_SOURCES = ("simulation", "components", "greenhouse_setups", "crops")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def model_version(root=ROOT, packages=MODEL_SOURCES):
+    """Hash of the .py and .json files of the model packages under root.
+
+    Part of every cache key, so any edit to the model invalidates the results
+    cached by the older sources without a version to bump by hand.
+    """
+    digest = hashlib.sha256()
+    for package in packages:
+        for directory, subdirectories, files in os.walk(os.path.join(root, package)):
+            subdirectories[:] = sorted(name for name in subdirectories if name != "__pycache__")
+            for name in sorted(files):
+                if name.endswith((".py", ".json")):
+                    path = os.path.join(directory, name)
+                    digest.update(os.path.relpath(path, root).replace(os.sep, "/").encode())
+                    with open(path, "rb") as file:
+                        digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+MODEL_VERSION = model_version()
+
+class ResultCache:
+    """Memoizes complete run_simulation results under a hash of their inputs.
+
+    The key covers the forcing arrays, every greenhouse parameter, the crop data,
+    dt, the initial conditions, the backend, integrator and output level, and
+    MODEL_VERSION, the hash of the model sources. Results live in an in-memory
+    LRU tier and, when a directory is given, in an on-disk tier of NPZ files that
+    is trimmed (least recently used first) to max_bytes. Pass one to run_simulation (cache=...); the returned
+    result's cache_status tells "memory", "disk" or "miss".
+
+    Cached output arrays are read-only and every hit returns its own shallow copy
+    of the result, so callers cannot change what later hits see. A cached run
+    cannot book an EnergyLedger.
+
+    Args:
+        directory (str): folder of the on-disk tier, memory only if None.
+        max_entries (int): results kept in memory.
+        max_bytes (int): size limit of the on-disk tier.
+    """
+
+    def __init__(self, directory=None, max_entries=64, max_bytes=512 * 2**20):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()
+        self.hits = {"memory": 0, "disk": 0}
+        self.misses = 0
+        if directory: os.makedirs(directory, exist_ok=True)
+
+    def key(self, forcing, params, crop, dt, T_air_init, T_top_init, RH_init, backend="python", integrator=None, output="full"):
+        """Hex digest identifying one run."""
+        digest = hashlib.sha256(MODEL_VERSION.encode())
+        digest.update(forcing.time.view(np.int64).tobytes())
+        for column in FORCING_COLUMNS:
+            digest.update(getattr(forcing, column).tobytes())
+        for name in params.input_names():
+            digest.update(name.encode())
+            digest.update(np.asarray(getattr(params, name), dtype=float).tobytes())
+
+        settings = None
+        if integrator is not None:
+            settings = (type(integrator).__name__, sorted((k, v) for k, v in vars(integrator).items() if k not in ("h", "stats")))
+        output = output if isinstance(output, str) else tuple(output)
+        digest.update(repr((crop, get_crop_dict(crop), float(dt), float(T_air_init), float(T_top_init), float(RH_init),
+                            backend, settings, output)).encode())
+        return digest.hexdigest()
+
+    def get(self, key, forcing, weather_data=None):
+        """The cached (result, cycles, total_crop_mass) of key, or None.
+
+        A result loaded from disk is rebuilt on the given forcing and weather_data.
+        """
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits["memory"] += 1
+            return _tagged(self.memory[key], "memory")
+
+        path = self._path(key)
+        if path and os.path.exists(path):
+            with np.load(path) as stored:
+                cycles, total_crop_mass = float(stored["__cycles"]), float(stored["__total_crop_mass"])
+                if stored["__unstable"]:
+                    run = (None, cycles, total_crop_mass)
+                else:
+                    result = SimulationResult(forcing, weather_data, columns=())
+                    result.columns = {name: stored[name] for name in stored.files if not name.startswith("__")}
+                    run = (result, cycles, total_crop_mass)
+            os.utime(path)  # recently used
+            self._remember(key, run)
+            self.hits["disk"] += 1
+            return _tagged(run, "disk")
+
+        self.misses += 1
+        return None
+
+    def put(self, key, result, cycles, total_crop_mass):
+        """Stores a run in both tiers; its output arrays become read-only."""
+        self._remember(key, _tagged((result, cycles, total_crop_mass), None))  # own copy, the caller keeps result
+        path = self._path(key)
+        if not path:
+            return
+
+        columns = result.columns if result is not None else {}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, __cycles=cycles, __total_crop_mass=total_crop_mass, __unstable=result is None, **columns)
+        os.replace(tmp_path, path)
+        self._trim()
+
+    def stats(self):
+        """Hit and miss counts."""
+        return {"memory_hits": self.hits["memory"], "disk_hits": self.hits["disk"], "misses": self.misses}
+
+    def clear(self):
+        """Empties both tiers."""
+        self.memory.clear()
+        if self.directory:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz"): os.remove(os.path.join(self.directory, name))
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npz") if self.directory else None
+
+    def _remember(self, key, run):
+        if run[0] is not None:
+            for values in run[0].columns.values():
+                values.setflags(write=False)
+        self.memory[key] = run
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def _trim(self):
+        """Deletes the least recently used files until the disk tier fits max_bytes."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npz"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+
+def _tagged(run, status):
+    """The cached run with a shallow copy of its result carrying status."""
+    result, cycles, total_crop_mass = run
+    if result is not None:
+        result = copy.copy(result)
+        result.columns = dict(result.columns)
+        result.cache_status = status
+    return result, cycles, total_crop_mass
@@ -0,0 +1,90 @@
+import numpy as np
+
+from components.crop_model import compute_crop_growth
+from crops.retrieve_dict import get_crop_dict, read_json
+from simulation.forcing import steps_per_day
+
+CROP_FILE = "crops/simple_crop_data.json"
+
+def crop_names():
+    """Every crop in crops/simple_crop_data.json, in file order."""
+    return list(read_json(CROP_FILE))
+
+
+def daily_climate(T_air, forcing, dt):
+    """Daily crop inputs of a greenhouse trajectory, as the time loop computes them.
+
+    At every midnight after the first step the crop update reads the mean and
+    maximum air temperature of the steps_per_day(dt) steps before it and the solar
+    radiation summed since the previous update.
+
+    Args:
+        T_air (ndarray): GH_T_air shaped (steps,) or (designs, steps).
+        forcing (Forcing): the forcing the trajectory was run on.
+        dt (int): time step (s).
+
+    Returns:
+        tuple: (T_mean, T_max, radiation_MJ_24h), the temperatures shaped
+        (days,) or (designs, days) and the radiation (days,).
+    """
+    T_air = np.asarray(T_air)
+    day_steps = steps_per_day(dt)
+    T_mean, T_max, radiation = [], [], []
+    radiation_MJ_24h = 0
+    for i in range(len(forcing)):
+        radiation_MJ_24h += forcing.solar[i]*0.0036*(dt/3600)
+        if forcing.is_midnight[i] and i>0:
+            T_air_24 = T_air[..., max(0, i-day_steps):i]
+            T_mean.append(T_air_24.mean(axis=-1))
+            T_max.append(T_air_24.max(axis=-1))
+            radiation.append(radiation_MJ_24h)
+            radiation_MJ_24h = 0
+
+    days_shape = T_air.shape[:-1] + (len(radiation),)
+    return (np.stack(T_mean, axis=-1) if T_mean else np.empty(days_shape),
+            np.stack(T_max, axis=-1) if T_max else np.empty(days_shape),
+            np.array(radiation, dtype=float))
+
+
+def score_crops(T_air, forcing, dt, crops=None):
+    """Cycles and crop mass of several crops grown in one greenhouse trajectory.
+
+    The thermal model does not depend on the crop (update_cycle gets a constant
+    crop mass and CO2), so the crop model can run on the daily climate of a
+    finished trajectory. Every crop is grown at once, with its parameters as
+    arrays, giving what run_simulation returns for each crop from a single
+    thermal simulation.
+
+    Args:
+        T_air (ndarray): GH_T_air shaped (steps,) or (designs, steps).
+        forcing (Forcing): the forcing the trajectory was run on.
+        dt (int): time step (s).
+        crops (list): crop names, every crop of crop_names() if None.
+
+    Returns:
+        tuple: (crops, cycles, total_crop_mass), the scores shaped (crops,) or
+        (crops, designs) in the order of the crop list.
+    """
+    crops = crop_names() if crops is None else list(crops)
+    T_mean, T_max, radiation = daily_climate(T_air, forcing, dt)
+
+    # one row per crop, broadcast over the designs
+    table = np.array([get_crop_dict(crop) for crop in crops], dtype=float).reshape((len(crops), 13) + (1,) * (T_mean.ndim - 1))
+    T_sum, HI, I50A, I50B, T_base, T_opt, RUE, I50maxH, I50maxW, T_heat, T_extreme, SCO2, S_water = table.transpose((1, 0, *range(2, table.ndim)))
+
+    shape = (len(crops),) + T_mean.shape[:-1]
+    TT = np.zeros(shape)
+    crop_mass = np.zeros(shape)
+    cycles = np.zeros(shape)
+    total_crop_mass = np.zeros(shape)
+    for day in range(len(radiation)):
+        crop_mass, TT = compute_crop_growth(crop_mass, TT, radiation[day], T_mean[..., day], T_base, T_opt, T_max[..., day], T_heat, T_extreme, I50A, RUE, 400, SCO2)
+        matured = TT >= T_sum
+        total_crop_mass += np.where(matured, crop_mass, 0)
+        TT = np.where(matured, 0, TT)
+        crop_mass = np.where(matured, 0.01, crop_mass)
+        cycles += matured
+
+    cycles += TT/T_sum
+    total_crop_mass += crop_mass
+    return crops, cycles, total_crop_mass
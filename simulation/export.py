@@ -0,0 +1,191 @@
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+from simulation.forcing import FORCING_COLUMNS
+
+FORMAT_VERSION = 1
+# a float column is stored as float32 when no value rounds by more than atol + rtol*|value|
+FLOAT32_TOLERANCE = (1e-4, 1e-6)
+
+class ResultWriter:
+    """Writes simulation outputs as a folder of compressed columnar parts.
+
+    Every append becomes one part (part-<n>.npz, one compressed array per column)
+    and meta.json lists the parts with their row counts next to the run metadata.
+    Float columns are stored as float32 when that rounds no value by more than the
+    (atol, rtol) float32_tolerance, otherwise as float64; time is kept as datetime64[ns].
+    Appending is cheap, so a streaming run can write its steps as they come (see
+    write_records) and read_results can load just a few columns or rows back.
+
+    Args:
+        path (str): folder of the result.
+        metadata (dict): JSON-serializable run description, see result_metadata.
+        float32_tolerance (tuple): (atol, rtol) rounding error allowed for float32
+            storage, None to keep every column in float64.
+        mode (str): "w" starts a new result, "a" appends to the parts already in path.
+    """
+
+    def __init__(self, path, metadata=None, float32_tolerance=FLOAT32_TOLERANCE, mode="w"):
+        self.path = path
+        self.metadata = metadata or {}
+        self.float32_tolerance = float32_tolerance
+        self.parts = []
+        self.columns = None
+        os.makedirs(path, exist_ok=True)
+        if mode == "a" and os.path.exists(os.path.join(path, "meta.json")):
+            meta = read_metadata(path)
+            self.parts, self.columns = meta["parts"], meta["columns"] or None
+            self.metadata = {**meta["metadata"], **self.metadata}
+        elif mode == "w":
+            for name in os.listdir(path):
+                if name.startswith("part-") and name.endswith(".npz"): os.remove(os.path.join(path, name))
+        elif mode != "a":
+            raise ValueError(f"Unknown mode {mode!r}, expected 'w' or 'a'")
+
+    def append(self, columns):
+        """Writes a chunk of rows.
+
+        Args:
+            columns (dict or DataFrame): equally long columns; every chunk must have
+                the same column names.
+        """
+        if isinstance(columns, pd.DataFrame):
+            columns = {name: columns[name].to_numpy() for name in columns.columns}
+        names = list(columns)
+        if self.columns is None:
+            self.columns = names
+        elif names != self.columns:
+            raise ValueError(f"Chunk columns {names} differ from the result columns {self.columns}")
+
+        arrays = {name: self._downcast(np.asarray(values)) for name, values in columns.items()}
+        rows = len(next(iter(arrays.values()))) if arrays else 0
+        name = f"part-{len(self.parts):05d}.npz"
+        with open(os.path.join(self.path, name + ".tmp"), "wb") as file:
+            np.savez_compressed(file, **arrays)
+        os.replace(os.path.join(self.path, name + ".tmp"), os.path.join(self.path, name))
+        self.parts.append({"file": name, "rows": rows})
+        self._write_meta()
+
+    def close(self):
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _downcast(self, values):
+        if values.dtype.kind == "M":
+            return values.astype("datetime64[ns]")
+        if values.dtype == np.float64 and self.float32_tolerance is not None:
+            narrow = values.astype(np.float32)
+            with np.errstate(invalid="ignore"):
+                error = np.abs(narrow.astype(np.float64) - values)
+            atol, rtol = self.float32_tolerance
+            if np.all(np.isfinite(narrow) == np.isfinite(values)) and not np.any(error > atol + rtol * np.abs(values)):
+                return narrow
+        return values
+
+    def _write_meta(self):
+        meta = {"format": FORMAT_VERSION, "columns": self.columns or [], "rows": sum(part["rows"] for part in self.parts),
+                "parts": self.parts, "metadata": self.metadata}
+        with open(os.path.join(self.path, "meta.json"), "w") as file:
+            json.dump(meta, file, indent=4)
+
+
+def forcing_hash(forcing):
+    """sha256 of the forcing arrays, identifying the weather a result was run on."""
+    digest = hashlib.sha256(forcing.time.view(np.int64).tobytes())
+    for column in FORCING_COLUMNS:
+        digest.update(getattr(forcing, column).tobytes())
+    return digest.hexdigest()
+
+
+def result_metadata(forcing, crop=None, profile=None, params=None, **extra):
+    """Metadata of a run: crop, profile, the greenhouse parameters and the weather hash."""
+    values = None
+    if params is not None:
+        values = {name: np.asarray(getattr(params, name), dtype=float).tolist() for name in params.input_names()}
+    return {"crop": crop, "profile": profile, "params": values, "weather_hash": forcing_hash(forcing), **extra}
+
+
+def export_result(result, path, crop=None, profile=None, params=None, columns=None, **extra):
+    """Writes a SimulationResult (time, forcing and outputs) with its metadata.
+
+    Args:
+        result (SimulationResult): the run to store.
+        path (str): folder to write.
+        crop, profile, params: run description stored in the metadata.
+        columns (list): output columns to keep, all if None.
+    """
+    outputs = result.columns if columns is None else {name: result[name] for name in columns}
+    with ResultWriter(path, result_metadata(result.forcing, crop, profile, params, **extra)) as writer:
+        writer.append({"time": result.forcing.time, **{column: getattr(result.forcing, column) for column in FORCING_COLUMNS}, **outputs})
+
+
+def write_records(records, path, metadata=None, chunk_steps=24 * 7, mode="w"):
+    """Writes the StepRecords of iter_simulation as they are produced.
+
+    Rows are buffered and appended every chunk_steps steps, so a run of any length
+    is stored with one chunk in memory.
+
+    Returns:
+        StepRecord: the last record, None if there was none.
+    """
+    last = None
+    with ResultWriter(path, metadata, mode=mode) as writer:
+        buffer = []
+        for record in records:
+            buffer.append(record)
+            last = record
+            if len(buffer) == chunk_steps:
+                writer.append(_records_to_columns(buffer))
+                buffer = []
+        if buffer:
+            writer.append(_records_to_columns(buffer))
+    return last
+
+
+def read_metadata(path):
+    """meta.json of a stored result: columns, row count, parts and run metadata."""
+    with open(os.path.join(path, "meta.json")) as file:
+        return json.load(file)
+
+
+def read_results(path, columns=None, start=0, stop=None):
+    """Reads a stored result back as a DataFrame.
+
+    Only the requested columns are decompressed, and only from the parts that
+    overlap rows start:stop. Float32 columns are returned as stored.
+
+    Args:
+        path (str): folder written by ResultWriter.
+        columns (list): columns to read, all if None.
+        start, stop (int): row range to read.
+    """
+    meta = read_metadata(path)
+    columns = meta["columns"] if columns is None else list(columns)
+    unknown = [name for name in columns if name not in meta["columns"]]
+    if unknown:
+        raise KeyError(f"Columns {unknown} are not in the result, stored are {meta['columns']}")
+    stop = meta["rows"] if stop is None else min(stop, meta["rows"])
+
+    chunks = {name: [] for name in columns}
+    offset = 0
+    for part in meta["parts"]:
+        first, last = max(start - offset, 0), min(stop - offset, part["rows"])
+        if first < last:
+            with np.load(os.path.join(path, part["file"])) as stored:
+                for name in columns:
+                    chunks[name].append(stored[name][first:last])
+        offset += part["rows"]
+    return pd.DataFrame({name: np.concatenate(values) if values else np.empty(0) for name, values in chunks.items()})
+
+
+def _records_to_columns(records):
+    columns = {name: [getattr(record, name) for record in records] for name in records[0]._fields}
+    return {name: pd.to_datetime(values).to_numpy() if name == "time" else np.array(values, dtype=float) for name, values in columns.items()}
@@ -0,0 +1,61 @@
+import pandas as pd
+import numpy as np
+
+FORCING_COLUMNS = ("temperature", "humidity", "pressure", "solar", "solar_angle")
+
+SECONDS_PER_DAY = 86400
+
+def steps_per_day(dt):
+    """Model steps of dt seconds in a day, the window of the daily crop update."""
+    return max(1, int(round(SECONDS_PER_DAY / dt)))
+
+class Forcing:
+    """Weather forcing pre-extracted into contiguous, read-only arrays.
+
+    Built once per weather set (see build_forcing) and shared by every run on it,
+    so the time loop only indexes plain arrays instead of the DataFrame.
+    """
+
+    __slots__ = ("time", "temperature", "humidity", "pressure", "solar", "solar_angle", "hour", "day_index", "is_midnight")
+
+    def __init__(self, time, temperature, humidity, pressure, solar, solar_angle):
+        self.time = _frozen(np.asarray(time, dtype="datetime64[ns]"))
+        self.temperature = _frozen(temperature, float)
+        self.humidity = _frozen(humidity, float)
+        self.pressure = _frozen(pressure, float)
+        self.solar = _frozen(solar, float)
+        self.solar_angle = _frozen(solar_angle, float)
+
+        days = self.time.astype("datetime64[D]")
+        self.hour = _frozen((self.time - days) // np.timedelta64(1, "h"), np.int64)
+        start = days[0] if len(days) else np.datetime64(0, "D")
+        self.day_index = _frozen((days - start) // np.timedelta64(1, "D"), np.int64)
+        # first step of each day, so sub-hourly steps within hour 0 do not count again
+        new_day = np.ones(len(days), dtype=bool)
+        new_day[1:] = days[1:] != days[:-1]
+        self.is_midnight = _frozen((self.hour == 0) & new_day, bool)
+
+    def __len__(self):
+        return len(self.time)
+
+
+def _frozen(values, dtype=None):
+    array = np.ascontiguousarray(values, dtype=dtype)
+    array.setflags(write=False)
+    return array
+
+
+def build_forcing(weather_data):
+    """Extracts the model forcing from a weather DataFrame.
+
+    Args:
+        weather_data (DataFrame): weather with time, temperature, humidity, pressure, solar and solar_angle columns.
+
+    Returns:
+        Forcing: the forcing arrays; passing a Forcing returns it unchanged.
+    """
+    if isinstance(weather_data, Forcing):
+        return weather_data
+
+    return Forcing(pd.to_datetime(weather_data["time"]).to_numpy(),
+                   *(weather_data[column].to_numpy() for column in FORCING_COLUMNS))
@@ -0,0 +1,207 @@
+import warnings
+
+import numpy as np
+
+class AdaptiveIntegrator:
+    """Error-controlled sub-stepping with an embedded Euler/Heun pair.
+
+    Each output step of dt is covered by sub-steps whose size follows the
+    difference between the Euler and the Heun solution, so fast nodes (the roof
+    film, the bottles) get small steps only while they are moving. No clipping is
+    applied. Sub-steps never shrink below dt/max_substeps; a sub-step that misses
+    the tolerance at that size is accepted anyway and counted as forced, and
+    report() warns about it.
+
+    Args:
+        rtol (float): relative tolerance on the node temperatures.
+        atol (float): absolute tolerance (K).
+        max_substeps (int): step budget per output step.
+    """
+
+    name = "adaptive"
+
+    def __init__(self, rtol=1e-3, atol=0.05, max_substeps=1000):
+        self.rtol = rtol
+        self.atol = atol
+        self.max_substeps = max_substeps
+        self.reset()
+
+    def reset(self):
+        self.h = None
+        self.stats = {"steps": 0, "substeps": 0, "max_substeps": 0, "rejected": 0, "forced": 0, "evaluations": 0}
+
+    def advance(self, state, rates, dt, k0):
+        """Integrates state over dt.
+
+        Args:
+            state (ndarray): node temperatures, one row per node.
+            rates (callable): state -> node rates (K/s).
+            dt (float): output step (s).
+            k0 (ndarray): rates at state, already evaluated by the caller.
+
+        Returns:
+            ndarray: node temperatures after dt.
+        """
+        h_min = dt / self.max_substeps
+        h = dt if self.h is None else min(self.h, dt)
+        t = 0.0
+        k1 = k0
+        substeps = 0
+        while dt - t > 1e-9*dt:
+            h = max(min(h, dt - t), min(h_min, dt - t))
+            euler = state + h*k1
+            k2 = rates(euler)
+            heun = state + h/2*(k1 + k2)
+            self.stats["evaluations"] += 1
+
+            scale = self.atol + self.rtol*np.maximum(np.abs(state), np.abs(heun))
+            error = np.max(np.abs(heun - euler) / scale)
+            if not np.isfinite(error): error = np.inf  # shrink instead of looping on nan
+
+            if error <= 1 or h <= h_min:
+                if error > 1: self.stats["forced"] += 1
+                state = heun
+                t += h
+                substeps += 1
+                if dt - t > 1e-9*dt:
+                    k1 = rates(state)
+                    self.stats["evaluations"] += 1
+            else:
+                self.stats["rejected"] += 1
+
+            # second order pair: the error scales with h**2
+            h *= min(5.0, max(0.2, 0.9*error**-0.5)) if error > 0 else 5.0
+
+        self.h = h
+        self.stats["steps"] += 1
+        self.stats["substeps"] += substeps
+        self.stats["max_substeps"] = max(self.stats["max_substeps"], substeps)
+        return state
+
+    def report(self):
+        return _report(self.name, self.stats)
+
+
+class SemiImplicitIntegrator:
+    """Linearly implicit (Rosenbrock) Euler with step-size control.
+
+    Every sub-step solves (I - h*J) dT = h*r, with the node Jacobian J found by
+    perturbing one node at a time. Stiff nodes with little heat capacity relax
+    towards their surroundings instead of overshooting. The linearisation only
+    holds for small changes though (radiation goes with T**4), so a sub-step that
+    moves any node by more than max_change is halved and solved again with the
+    same Jacobian; the sub-step grows back once the changes are small. Sub-steps
+    never shrink below dt/max_substeps; a sub-step that still moves too far at
+    that size is accepted anyway and counted as forced. The full 6x6 Jacobian is
+    kept because the top zone and the bottles are strongly coupled.
+
+    Args:
+        substeps (int): sub-steps per output step to start from.
+        max_change (float): largest node change accepted in one sub-step (K).
+        max_substeps (int): step budget per output step.
+        perturbation (float): temperature perturbation for the Jacobian (K).
+    """
+
+    name = "semi-implicit"
+
+    def __init__(self, substeps=1, max_change=2.0, max_substeps=4096, perturbation=1e-3):
+        self.substeps = substeps
+        self.max_change = max_change
+        self.max_substeps = max_substeps
+        self.perturbation = perturbation
+        self.reset()
+
+    def reset(self):
+        self.h = None
+        self.stats = {"steps": 0, "substeps": 0, "max_substeps": 0, "rejected": 0, "forced": 0, "evaluations": 0}
+
+    def advance(self, state, rates, dt, k0):
+        """Integrates state over dt, see AdaptiveIntegrator.advance."""
+        h_max = dt / self.substeps
+        h_min = dt / self.max_substeps
+        h = h_max if self.h is None else min(self.h, h_max)
+        t = 0.0
+        r = k0
+        J = self._jacobian(state, rates, r)
+        substeps = 0
+        while dt - t > 1e-9*dt:
+            h = max(min(h, dt - t), min(h_min, dt - t))
+            A = np.eye(len(state)) - h*J
+            change = np.moveaxis(np.linalg.solve(A, np.moveaxis(h*r, 0, -1)[..., None])[..., 0], -1, 0)
+            largest = np.max(np.abs(change))
+
+            if largest <= self.max_change or h <= h_min:
+                if largest > self.max_change: self.stats["forced"] += 1
+                state = state + change
+                t += h
+                substeps += 1
+                if largest < self.max_change/2: h = min(2*h, h_max)
+                if dt - t > 1e-9*dt:
+                    r = rates(state)
+                    self.stats["evaluations"] += 1
+                    J = self._jacobian(state, rates, r)
+            else:
+                self.stats["rejected"] += 1
+                h /= 2
+
+        self.h = h
+        self.stats["steps"] += 1
+        self.stats["substeps"] += substeps
+        self.stats["max_substeps"] = max(self.stats["max_substeps"], substeps)
+        return state
+
+    def _jacobian(self, state, rates, r):
+        """J[..., i, j] = d rate_i / d T_j, one matrix per design."""
+        n_nodes = len(state)
+        J = np.empty(np.shape(state)[1:] + (n_nodes, n_nodes))
+        for node in range(n_nodes):
+            perturbed = state.copy()
+            perturbed[node] += self.perturbation
+            J[..., node] = np.moveaxis((rates(perturbed) - r) / self.perturbation, 0, -1)
+        self.stats["evaluations"] += n_nodes
+        return J
+
+    def report(self):
+        return _report(self.name, self.stats)
+
+
+INTEGRATORS = {
+    "adaptive": AdaptiveIntegrator,
+    "semi-implicit": SemiImplicitIntegrator,
+}
+
+def get_integrator(integrator):
+    """Integrator instance from a name in INTEGRATORS or an instance; "euler" and None give None.
+
+    None means the clipped forward Euler reference of step_cycle. The integrators
+    sub-step each dt without clipping and run_simulation leaves their report() in
+    result.integrator_stats. Only the python backend integrates with them.
+    """
+    if integrator is None or integrator == "euler":
+        return None
+    if isinstance(integrator, str):
+        if integrator not in INTEGRATORS:
+            raise ValueError(f"Unknown integrator {integrator!r}, expected 'euler' or one of {list(INTEGRATORS)}")
+        return INTEGRATORS[integrator]()
+    return integrator
+
+
+def _report(name, stats):
+    """Step budget per output step, used to compare integrator settings.
+
+    Warns when sub-steps were forced through at the minimum step size, since the
+    run then did not meet the integrator's accuracy target.
+    """
+    steps = max(stats["steps"], 1)
+    if stats["forced"]:
+        warnings.warn(f"{name} integrator: {stats['forced']} sub-steps missed the tolerance at the minimum step size "
+                      f"and were accepted anyway, raise max_substeps", RuntimeWarning)
+    return {
+        "integrator": name,
+        "steps": stats["steps"],
+        "substeps_per_step": stats["substeps"] / steps,
+        "max_substeps_per_step": stats["max_substeps"],
+        "evaluations_per_step": (stats["evaluations"] + stats["steps"]) / steps,
+        "rejected": stats["rejected"],
+        "forced": stats["forced"],
+    }
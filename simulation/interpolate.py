@@ -0,0 +1,86 @@
+from typing import NamedTuple
+import numpy as np
+
+from simulation.forcing import Forcing, FORCING_COLUMNS, steps_per_day
+
+MIN_COS_ZENITH = 0.05  # below this the sun is too low to infer the sky transmittance
+
+class ForcingRecord(NamedTuple):
+    """One step of interpolated forcing, a weather record for iter_simulation."""
+    time: object
+    temperature: float
+    humidity: float
+    pressure: float
+    solar: float
+    solar_angle: float
+
+
+def iter_forcing_blocks(forcing, dt, source_dt=3600, block_days=7):
+    """Lazily refines a forcing to steps of dt seconds, a block of whole days at a time.
+
+    Temperature, humidity, pressure and the solar zenith angle are interpolated
+    linearly between the source samples. Irradiance is not: it follows the sun, so
+    the source values are turned into a sky transmittance (solar over the cosine of
+    the zenith angle), which is interpolated and multiplied back by the cosine of
+    the interpolated zenith. Sunrise and sunset thus fall inside the hour instead
+    of on a linear ramp, and there is no light while the sun is below the horizon.
+
+    Samples are taken as a uniform series of source_dt steps (years joined in any
+    order stay valid); the last one is held for its own step. A step that lands on
+    a source sample gets exactly its values, so dt=source_dt reproduces the forcing.
+
+    Args:
+        forcing (Forcing): the source forcing (see build_forcing).
+        dt (float): target step (s).
+        source_dt (float): step of the source forcing (s).
+        block_days (int): days of fine steps per block; only one block is held at a time.
+
+    Yields:
+        Forcing: consecutive blocks of the refined forcing.
+    """
+    n_source = len(forcing)
+    n_steps = int(round(n_source * source_dt / dt))
+    transmittance = _sky_transmittance(forcing)
+    time = forcing.time.view(np.int64)
+    block = steps_per_day(dt) * block_days
+
+    for start in range(0, n_steps, block):
+        position = np.arange(start, min(start + block, n_steps)) * (dt / source_dt)
+        i = np.minimum(position.astype(np.int64), n_source - 1)
+        after = np.minimum(i + 1, n_source - 1)
+        f = position - i
+
+        def lerp(values):
+            return values[i] * (1 - f) + values[after] * f
+
+        zenith = lerp(forcing.solar_angle)
+        cos_zenith = np.cos(np.radians(zenith))
+        solar = np.where(cos_zenith > 0, lerp(transmittance) * np.maximum(cos_zenith, 0), 0)
+        solar = np.where(f == 0, forcing.solar[i], solar)  # source samples pass through unchanged
+
+        times = (time[i] + np.round(f * source_dt * 1e9).astype(np.int64)).view("datetime64[ns]")
+        yield Forcing(times, lerp(forcing.temperature), lerp(forcing.humidity), lerp(forcing.pressure), solar, zenith)
+
+
+def interpolate_forcing(forcing, dt, source_dt=3600):
+    """The whole refined forcing as one Forcing, for run_simulation (see iter_forcing_blocks)."""
+    blocks = list(iter_forcing_blocks(forcing, dt, source_dt))
+    return Forcing(np.concatenate([block.time for block in blocks]),
+                   *(np.concatenate([getattr(block, column) for block in blocks]) for column in FORCING_COLUMNS))
+
+
+def iter_forcing_records(forcing, dt, source_dt=3600, block_days=7):
+    """Refined forcing step by step, for iter_simulation; memory stays at one block."""
+    for block in iter_forcing_blocks(forcing, dt, source_dt, block_days):
+        for values in zip(block.time, *(getattr(block, column) for column in FORCING_COLUMNS)):
+            yield ForcingRecord(*values)
+
+
+def _sky_transmittance(forcing):
+    """solar / cos(zenith) at the source samples, bridged over night and low sun."""
+    cos_zenith = np.cos(np.radians(forcing.solar_angle))
+    sunlit = cos_zenith > MIN_COS_ZENITH
+    if not sunlit.any():
+        return np.zeros(len(forcing))
+    index = np.arange(len(forcing))
+    return np.interp(index, index[sunlit], forcing.solar[sunlit] / cos_zenith[sunlit])
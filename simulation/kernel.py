@@ -0,0 +1,243 @@
+import numpy as np
+
+from components.const import RHO_AIR, CP_AIR, CP_WATER, SIGMA, C_TO_K, PA_SEA_LVL, AIR_DEN, WP_RATIO, SVP_WATER, LV, R_AIR, R_WATER, BOTTLE_EVAP_RATE_HOLE
+from crops.retrieve_dict import get_crop_dict
+from simulation.results import SimulationResult, STATE_COLUMNS
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the kernel is only used with backend="numba"
+    njit = None
+
+# GreenhouseParams fields handed to the kernel, in order
+KERNEL_PARAMS = ("vent_rate", "top_vent_rate", "plant_transpiration_rate", "volume", "wall_area", "roof_area", "roof_volume", "ground_area",
+                 "wall_cp", "wall_rho", "wall_thickness", "wall_emissivity", "wall_solar_absorp_coef", "roof_emissivity",
+                 "tot_water_mass", "tot_bottle_area", "bottles_percent_open", "open_bottle_area", "exchange_area", "thermal_mass_soil",
+                 "wall_conductivity", "roof_conductivity", "roof_thickness", "soil_cp", "soil_depth", "soil_conduct", "h_conv", "thin_wall")
+
+MAX_T_FLUC = 50
+
+
+def _jit(function):
+    return njit(cache=True)(function) if njit is not None else function
+
+# Scalar copies of the component functions used by simulation.update.step_cycle,
+# written so numba can compile the whole time loop. step_cycle stays the reference.
+# The expressions keep the operation order of the components, so uncompiled the
+# kernel reproduces step_cycle exactly; compiled, np.exp comes from libm instead of
+# numpy and differs in the last bit, which the clipped model can amplify over a year.
+
+@_jit
+def _clip(x, low, high):
+    if x < low:
+        return low
+    if x > high:
+        return high
+    return x
+
+@_jit
+def _p_sat(T):
+    return SVP_WATER * np.exp((17.27 * T) / (T + 237.3))
+
+@_jit
+def _absolute_humidity(T, RH):
+    avp = RH / 100 * _p_sat(T)
+    return max(0.0, WP_RATIO * avp / (PA_SEA_LVL - avp))
+
+@_jit
+def _rho_air(P, T_air, RH):
+    T_K = T_air + C_TO_K
+    P_vapor = (RH / 100) * (_p_sat(T_air)*1000)
+    P_dry = P*1000 - P_vapor
+    return (P_dry / (R_AIR * T_K)) + (P_vapor / (R_WATER * T_K))
+
+@_jit
+def _radiation(T_inside, T_outside, emissivity, area):
+    return emissivity * SIGMA * area * ((T_inside + C_TO_K)**4.0 - (T_outside + C_TO_K)**4.0)
+
+@_jit
+def _thermal_mass(rho_air, cp_air, cp_water, volume_air, M_walls, water_mass, RH, T_air, P_atm):
+    M_air = volume_air * rho_air * cp_air
+    P_sat = _p_sat(T_air)/100
+    M_RH = max((RH / 100) * (0.622 * (P_sat / (P_atm - P_sat))) * M_air, 0.0) * cp_water
+    return M_air + M_walls + 0.0 + water_mass * cp_water + M_RH
+
+@_jit
+def _humidity_change(T_air, RH_air, T_ext, RH_ext, ventilation_rate, transpiration_rate, T_soil, radiation, T_wall, cond_area, T_bottle, bottle_area):
+    H_air = _absolute_humidity(T_air, RH_air)
+    H_ext = _absolute_humidity(T_ext, RH_ext)
+
+    e_s = _p_sat(T_soil)
+    evaporation = 0.2 * radiation * (e_s - e_s * (RH_air / 100)) / PA_SEA_LVL / 1000
+    e_s = _p_sat(T_bottle)
+    bottle_evap = 0.2 * bottle_area * (e_s - e_s * (RH_air / 100)) / PA_SEA_LVL / 1000
+    e_s_wall = _p_sat(T_wall)
+    e_air = _p_sat(T_air) * (RH_air / 100)
+    condensation = 0.01 * cond_area * (e_air - e_s_wall) if e_air > e_s_wall else 0.0
+
+    new_H = H_air + ventilation_rate * (H_ext - H_air) + transpiration_rate * AIR_DEN + evaporation + bottle_evap - condensation
+
+    avp = (new_H * PA_SEA_LVL) / (WP_RATIO + new_H)
+    return _clip((avp / _p_sat(T_air)) * 100, 0.0, 100.0)
+
+@_jit
+def _crop_growth(biomass, old_TT, radiation, T_air, T_max, T_base, T_opt, T_heat, T_extreme, I_50a, RUE, S_CO2):
+    new_TT = max(T_air - T_base, 0.0)
+
+    f_solar = 0.95 / (1 + np.exp(-0.01 * (new_TT - I_50a)))
+    f_co2 = 1 + S_CO2 * (400 - 350)
+    if T_air < T_base:
+        f_temp = 0.0
+    elif T_air < T_opt:
+        f_temp = (T_air - T_base) / (T_opt - T_base)
+    else:
+        f_temp = 1.0
+    if T_max <= T_heat:
+        f_heat = 1.0
+    elif T_max <= T_extreme:
+        f_heat = 1 - ((T_max - T_heat) / (T_extreme - T_heat))
+    else:
+        f_heat = 0.0
+
+    return radiation * f_solar * RUE * f_co2 * f_temp * min(f_heat, 1.0) + biomass, old_TT + new_TT
+
+@_jit
+def _simulate(temperature, humidity, pressure, solar, is_midnight, p, crop, dt, T_air_init, T_top_init, RH_init, out):
+    (vent_rate, top_vent_rate, plant_transpiration_rate, volume, wall_area, roof_area, roof_volume, ground_area,
+     wall_cp, wall_rho, wall_thickness, wall_emissivity, wall_solar_absorp_coef, roof_emissivity,
+     tot_water_mass, tot_bottle_area, bottles_percent_open, open_bottle_area, exchange_area, thermal_mass_soil,
+     wall_conductivity, roof_conductivity, roof_thickness, soil_cp, soil_depth, soil_conduct, h_conv, thin_wall) = p
+    T_sum, T_base, T_opt, T_heat, T_extreme, I50A, RUE, SCO2 = crop
+
+    M_walls = wall_area * wall_thickness * wall_rho * wall_cp
+    has_bottles = tot_water_mass > 0 and tot_bottle_area > 0
+
+    T_air = T_air_init
+    T_wall_ext = T_air_init
+    T_wall_int = T_air_init
+    T_top = T_top_init
+    T_bottle = T_air_init + 5
+    T_ground = T_air_init
+    RH_air = RH_init
+
+    TT = 0.0
+    crop_mass = 0.0
+    radiation_MJ_24h = 0.0
+    day_steps = max(1, int(round(86400.0 / dt)))  # steps_per_day
+    cycles = 0.0
+    total_crop_mass = 0.0
+
+    for i in range(len(temperature)):
+        T_ext = temperature[i]
+        P = pressure[i]
+        radiation_MJ_24h += solar[i]*0.0036*(dt/3600.0)
+
+        if is_midnight[i] and i > 0:
+            T_air_24 = out[0, max(0, i-day_steps):i]
+            crop_mass, TT = _crop_growth(crop_mass, TT, radiation_MJ_24h, T_air_24.mean(), T_air_24.max(), T_base, T_opt, T_heat, T_extreme, I50A, RUE, SCO2)
+            if TT >= T_sum:
+                total_crop_mass += crop_mass
+                TT, crop_mass = 0.0, 0.01
+                cycles += 1
+            radiation_MJ_24h = 0.0
+
+        cp_air = _clip(CP_AIR + (_absolute_humidity(T_air, RH_air) * 1860), CP_AIR*0.8, CP_AIR*1.2)
+        cp_water = _clip(4181.3 - 3.2 * T_bottle + 0.0024 * T_bottle**2, CP_WATER*0.98, CP_WATER*1.02)
+        rho_air = _clip(_rho_air(P, T_air, RH_air), RHO_AIR*0.8, RHO_AIR*1.2)
+        rho_air_top = _clip(_rho_air(P, T_top, RH_air), RHO_AIR*0.8, RHO_AIR*1.2)
+
+        thermal_mass_mid = _thermal_mass(rho_air, cp_air, cp_water, volume, M_walls, tot_water_mass, RH_air, T_air, P)
+        thermal_mass_wall = _thermal_mass(rho_air_top, cp_air, cp_water, volume, M_walls, 0.0, 0.0, 0.0, 0.0)
+        thermal_mass_top = _thermal_mass(0.0, 0.0, 0.0, 0.0, M_walls, tot_water_mass, RH_air, T_top, P)
+
+        # bottles
+        if has_bottles:
+            Q_bottle = (15 * tot_bottle_area * (T_top - T_bottle) + (1 * tot_bottle_area * (T_top - T_bottle)) / 0.001
+                        - _radiation(T_bottle, T_top, 1, tot_bottle_area) - BOTTLE_EVAP_RATE_HOLE*LV*bottles_percent_open*tot_water_mass)
+            T_bottle_new = T_bottle + (Q_bottle / (tot_water_mass * CP_WATER))
+        else:
+            Q_bottle = 0.0
+            T_bottle_new = T_bottle
+
+        # walls
+        Q_wall_solar = max(wall_solar_absorp_coef * solar[i] * (wall_area/2), 0.0)
+        Q_wall_ext_cond = (wall_conductivity * wall_area * (T_wall_ext - T_wall_int)) / wall_thickness
+        Q_wall_int_conv = wall_conductivity * wall_area * (T_wall_int - T_air)
+        Q_wall_int_cond = (wall_conductivity * wall_area * (T_wall_int - T_air)) / wall_thickness
+        if thin_wall:
+            T_wall_ext_new = T_air
+            T_wall_int_new = T_air
+        else:
+            Q_net_ext = Q_wall_solar + wall_conductivity * wall_area * (T_wall_ext - T_ext) - (_radiation(T_wall_ext, T_ext, wall_emissivity, wall_area) + Q_wall_ext_cond)
+            Q_net_int = Q_wall_ext_cond - (Q_wall_int_conv + Q_wall_int_cond + _radiation(T_wall_int, T_air, wall_emissivity, wall_area))
+            T_wall_ext_new = T_wall_ext + _clip((dt*Q_net_ext) / (thermal_mass_wall), -MAX_T_FLUC, MAX_T_FLUC)
+            T_wall_int_new = T_wall_int + _clip((dt*Q_net_int) / (thermal_mass_wall), -MAX_T_FLUC, MAX_T_FLUC)
+
+        # top zone
+        Q_top_solar = solar[i] * 0.9 * roof_area
+        Q_top_net = Q_top_solar - ((roof_conductivity * roof_area * (T_top - T_ext)) / roof_thickness/500 + roof_conductivity * roof_area * (T_top - T_ext)
+                                   + _radiation(T_top, T_ext, roof_emissivity, roof_area) + rho_air_top * roof_volume * top_vent_rate * cp_air * (T_top - T_ext)
+                                   + roof_conductivity * roof_area * (T_top - T_air) + _radiation(T_top, T_air, roof_emissivity, roof_area)) + Q_bottle
+
+        # ground
+        Q_ground_net = 1 * ground_area * (T_air - T_ground) - (soil_cp * ground_area * (T_ground - T_air)) / soil_depth
+        T_ground_new = T_ground + (dt * Q_ground_net) / (RHO_AIR * CP_AIR * thermal_mass_soil)
+        Q_ground = soil_conduct * ground_area * (T_ext - T_ground) / soil_depth
+
+        # main air body
+        Q_latent = plant_transpiration_rate * (1 - RH_air) * (LV - 2370 * T_air)
+        Q_air_net = (Q_top_solar/4 + h_conv * (roof_area + wall_area) * (T_air - T_top) + Q_wall_int_conv + Q_wall_int_cond
+                     - ((wall_conductivity * wall_area * (T_air - T_ext)) / wall_thickness + wall_conductivity * wall_area * (T_air - T_ext) + _radiation(T_air, T_ext, wall_emissivity, wall_area)
+                        + rho_air * volume * vent_rate * cp_air * (T_air - T_ext) + Q_ground + Q_latent) + Q_bottle/4)
+
+        RH_air_new = _clip(_humidity_change(T_air, RH_air, T_ext, humidity[i], vent_rate, plant_transpiration_rate, T_ground, solar[i],
+                                            T_wall_int, exchange_area, T_bottle, open_bottle_area), 0.5, 100.0)
+        T_top_new = T_top + _clip(dt * Q_top_net / (thermal_mass_top), -MAX_T_FLUC, MAX_T_FLUC)
+        T_air_new = T_air + _clip(dt * Q_air_net / (thermal_mass_mid), -MAX_T_FLUC, MAX_T_FLUC)
+
+        T_air, T_top, T_wall_ext, T_wall_int, T_ground, T_bottle, RH_air = T_air_new, T_top_new, T_wall_ext_new, T_wall_int_new, T_ground_new, T_bottle_new, RH_air_new
+
+        out[0, i] = T_air
+        out[1, i] = T_top
+        out[2, i] = T_bottle
+        out[3, i] = T_ground
+        out[4, i] = T_wall_ext
+        out[5, i] = T_wall_int
+        out[6, i] = RH_air
+        out[7, i] = crop_mass
+
+    return cycles + TT/T_sum, total_crop_mass + crop_mass
+
+
+def crop_constants(crop):
+    """The crop parameters used by the kernel, as a tuple of floats."""
+    T_sum, HI, I50A, I50B, T_base, T_opt, RUE, I50maxH, I50maxW, T_heat, T_extreme, SCO2, S_water = get_crop_dict(crop)
+    return tuple(float(value) for value in (T_sum, T_base, T_opt, T_heat, T_extreme, I50A, RUE, SCO2))
+
+def kernel_params(params):
+    """The GreenhouseParams fields used by the kernel, as a tuple of floats."""
+    return tuple(float(getattr(params, name)) for name in KERNEL_PARAMS)
+
+def simulate_compiled(forcing, params, crop, dt, T_air_init, T_top_init, RH_init, weather_data=None):
+    """Runs one greenhouse through the forcing with the compiled kernel.
+
+    This is run_simulation's backend="numba": the clipped forward Euler model
+    only, without integrators, ledger or diagnostic flux columns. It follows the
+    same equations as the python backend but is not bit-identical to it: rounding
+    differences in exp can grow into different trajectories on weather that
+    drives the clipped model hard.
+
+    Returns:
+        tuple: (SimulationResult with the state columns, cycles, total crop mass).
+    """
+    if njit is None:
+        raise ImportError("The compiled backend needs numba (pip install numba).")
+
+    out = np.empty((len(STATE_COLUMNS), len(forcing)))
+    cycles, total_crop_mass = _simulate(forcing.temperature, forcing.humidity, forcing.pressure, forcing.solar, forcing.is_midnight,
+                                        kernel_params(params), crop_constants(crop), float(dt),
+                                        float(T_air_init), float(T_top_init), float(RH_init), out)
+
+    result = SimulationResult(forcing, weather_data, columns=())
+    result.columns = {name: out[k] for k, name in enumerate(STATE_COLUMNS)}
+    return result, cycles, total_crop_mass
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+
+from simulation.update import HeatFlows, NODES
+
+J_PER_KWH = 3.6e6
+
+PERIODS = {"day": "datetime64[D]", "month": "datetime64[M]", "year": "datetime64[Y]"}
+
+# heat flows booked by default: every flow in HeatFlows
+LEDGER_FLUXES = tuple(name for name in HeatFlows._fields if name.startswith("Q_"))
+
+# net flow into each state node, in NODES order
+NODE_NET_FLUXES = ("Q_air_net", "Q_top_net", "Q_net_ext", "Q_net_int", "Q_ground_net", "Q_bottle")
+
+
+class _Account:
+    """Running sums of one aggregation period."""
+
+    def __init__(self, n_fluxes):
+        self.steps = 0
+        self.total = np.zeros(n_fluxes)  # J
+        self.day = np.zeros(n_fluxes)  # J, steps with sun
+        self.night = np.zeros(n_fluxes)  # J
+        self.min = np.full(n_fluxes, np.inf)  # W
+        self.max = np.full(n_fluxes, -np.inf)  # W
+        self.stored = np.zeros(len(NODES))  # J taken up by each node
+        self.net = np.zeros(len(NODES))  # J of net flow into each node
+
+    def add(self, Q, energy, is_day, stored, net):
+        self.steps += 1
+        self.total += energy
+        if is_day:
+            self.day += energy
+        else:
+            self.night += energy
+        np.minimum(self.min, Q, out=self.min)
+        np.maximum(self.max, Q, out=self.max)
+        self.stored += stored
+        self.net += net
+
+
+class EnergyLedger:
+    """Accumulates heat flow totals during a run instead of storing the flow series.
+
+    Pass one to run_simulation (ledger=...); every step books the flows (W) as
+    energy (flow * dt) into running sums per aggregation period, split into day
+    (solar > 0) and night, together with the extreme flows. It also books the heat
+    each state node takes up against the net flow into it, so the energy-balance
+    residual shows how much the clipping (or an integrator) departs from the heat
+    balance. Memory depends on the number of periods, not on the run length.
+
+    Args:
+        fluxes (list): HeatFlows names to book, all heat flows by default.
+        periods (tuple): aggregation periods out of "day", "month" and "year";
+            the whole run is always kept as period "run".
+    """
+
+    def __init__(self, fluxes=LEDGER_FLUXES, periods=("month", "year")):
+        unknown = [name for name in fluxes if name not in HeatFlows._fields]
+        if unknown:
+            raise ValueError(f"Unknown fluxes {unknown}")
+        unknown = [period for period in periods if period not in PERIODS]
+        if unknown:
+            raise ValueError(f"Unknown periods {unknown}, expected some of {list(PERIODS)}")
+
+        self.fluxes = tuple(fluxes)
+        self.periods = tuple(periods)
+        self._index = [HeatFlows._fields.index(name) for name in self.fluxes]
+        self._net_index = [HeatFlows._fields.index(name) for name in NODE_NET_FLUXES]
+        self.accounts = {"run": {"run": _Account(len(self.fluxes))}, **{period: {} for period in self.periods}}
+
+    def add(self, time, solar, flows, dt, stored):
+        """Books one step.
+
+        Args:
+            time (datetime64): time of the step.
+            solar (float): solar radiation of the step (W/m²).
+            flows (HeatFlows): heat flows at the start of the step.
+            dt (float): step length (s).
+            stored (sequence): heat taken up by each node over the step (J), in NODES order.
+        """
+        values = np.array(flows)
+        Q = values[self._index]
+        energy = Q * dt
+        net = values[self._net_index] * dt
+        is_day = solar > 0
+        time = np.datetime64(time)
+
+        self.accounts["run"]["run"].add(Q, energy, is_day, stored, net)
+        for period in self.periods:
+            label = str(time.astype(PERIODS[period]))
+            accounts = self.accounts[period]
+            if label not in accounts:
+                accounts[label] = _Account(len(self.fluxes))
+            accounts[label].add(Q, energy, is_day, stored, net)
+
+    def totals(self, period="run"):
+        """Flux totals per period.
+
+        Returns:
+            DataFrame: one row per period label and flux, with the energy in kWh
+            (total, day, night) and the lowest and highest flow in W.
+        """
+        rows = []
+        for label, account in self.accounts[period].items():
+            for i, name in enumerate(self.fluxes):
+                rows.append({"period": label, "flux": name,
+                             "energy_kWh": account.total[i] / J_PER_KWH,
+                             "day_kWh": account.day[i] / J_PER_KWH,
+                             "night_kWh": account.night[i] / J_PER_KWH,
+                             "min_W": account.min[i], "max_W": account.max[i]})
+        return pd.DataFrame(rows)
+
+    def balance(self, period="run"):
+        """Energy balance of each node per period.
+
+        Returns:
+            DataFrame: stored heat, net inflow and their difference (residual) in
+            kWh, per period label and node. A residual of zero means the node's
+            temperature change is fully explained by its heat flows.
+        """
+        rows = []
+        for label, account in self.accounts[period].items():
+            for i, node in enumerate(NODES):
+                rows.append({"period": label, "node": node,
+                             "stored_kWh": account.stored[i] / J_PER_KWH,
+                             "net_kWh": account.net[i] / J_PER_KWH,
+                             "residual_kWh": (account.stored[i] - account.net[i]) / J_PER_KWH})
+        return pd.DataFrame(rows)
+
+    def residual(self):
+        """Energy-balance residual of the whole run over all nodes (kWh)."""
+        account = self.accounts["run"]["run"]
+        return float(np.sum(account.stored - account.net) / J_PER_KWH)
@@ -0,0 +1,224 @@
+import numpy as np
+import pandas as pd
+
+from simulation.forcing import Forcing, FORCING_COLUMNS, build_forcing
+
+# physically plausible range of each forcing column, values outside count as missing
+VALID_RANGES = {
+    "temperature": (-60, 60),  # °C
+    "humidity": (0, 100),  # %
+    "pressure": (400, 1100),  # hPa
+    "solar": (0, 1500),  # W/m²
+    "solar_angle": (0, 180),  # degrees
+}
+MAX_INTERPOLATED_STEPS = 6  # longer gaps are filled from the climatology
+SEGMENT_GAP = np.timedelta64(30, "D")  # larger jumps in time join separate periods, e.g. years out of order
+
+# calendar columns of a weather frame, recomputed from the repaired time axis
+DATE_PARTS = {
+    "year": lambda time: time.astype("datetime64[Y]").astype(np.int64) + 1970,
+    "month": lambda time: time.astype("datetime64[M]").astype(np.int64) % 12 + 1,
+    "day": lambda time: (time.astype("datetime64[D]") - time.astype("datetime64[M]")) // np.timedelta64(1, "D") + 1,
+    "hour": lambda time: (time - time.astype("datetime64[D]")) // np.timedelta64(1, "h"),
+}
+
+class QualityReport:
+    """What check_forcing found and repaired.
+
+    Attributes:
+        steps_in, steps_out (int): length of the forcing before and after.
+        step (int): time step (s) the forcing was checked against.
+        segments (int): separate periods, split at jumps in time of more than SEGMENT_GAP.
+        reordered (int): steps moved to put their segment in time order.
+        duplicates (int): steps dropped because their time was already seen.
+        irregular (int): steps dropped because they are off the step grid.
+        inserted (int): missing steps added to make each segment contiguous; a
+            missing February 29 is not inserted, as NSRDB years leave it out.
+        columns (dict): per forcing column, the counts of missing (NaN or inserted)
+            and out_of_range values, and how many were interpolated or taken from
+            the climatology.
+    """
+
+    def __init__(self, steps_in):
+        self.steps_in = steps_in
+        self.steps_out = steps_in
+        self.step = None
+        self.segments = 0
+        self.reordered = 0
+        self.duplicates = 0
+        self.irregular = 0
+        self.inserted = 0
+        self.columns = {column: {"missing": 0, "out_of_range": 0, "interpolated": 0, "climatology": 0} for column in FORCING_COLUMNS}
+
+    @property
+    def clean(self):
+        """True if the forcing needed no repair."""
+        return (self.reordered == self.duplicates == self.irregular == self.inserted == 0
+                and not any(counts["missing"] or counts["out_of_range"] for counts in self.columns.values()))
+
+    def __str__(self):
+        lines = [f"{self.steps_in} steps in, {self.steps_out} out, {self.step} s step, {self.segments} segments, "
+                 f"{self.reordered} reordered, {self.duplicates} duplicates, {self.irregular} irregular, {self.inserted} inserted"]
+        for column, counts in self.columns.items():
+            if counts["missing"] or counts["out_of_range"]:
+                lines.append(f"  {column}: " + ", ".join(f"{count} {name}" for name, count in counts.items()))
+        return "\n".join(lines)
+
+
+def check_forcing(forcing, step=None):
+    """Pre-flight check and repair of a forcing, run once when it is loaded.
+
+    Splits the time axis into segments wherever time jumps by more than
+    SEGMENT_GAP (years joined out of order or with a gap), sorts each segment by
+    time, drops duplicate and off-grid steps, inserts the missing steps of each
+    segment and treats values outside VALID_RANGES as missing. Gaps of up to
+    MAX_INTERPOLATED_STEPS are interpolated linearly; longer ones take the mean
+    of the column at the same month and hour. The returned forcing is contiguous
+    and finite, so the time loop needs no checks of its own. A clean forcing is
+    returned unchanged.
+
+    Args:
+        forcing (Forcing): forcing to check (see build_forcing).
+        step (int): expected time step (s), the median step of the forcing if None.
+
+    Returns:
+        tuple: (Forcing, QualityReport).
+    """
+    repaired, report, _ = _repair(forcing, step)
+    return repaired, report
+
+
+def check_weather(weather_data, step=None):
+    """check_forcing of a weather DataFrame, returning the repaired frame.
+
+    The forcing columns are repaired as in check_forcing and year, month, day and
+    hour follow the new time axis. Other columns (e.g. sensor records) are taken
+    from the kept rows and are NaN on inserted ones. A clean frame is returned
+    unchanged, as is the forcing when given a Forcing.
+
+    Returns:
+        tuple: (DataFrame or Forcing, QualityReport).
+    """
+    if isinstance(weather_data, Forcing):
+        return check_forcing(weather_data, step)
+    repaired, report, source = _repair(build_forcing(weather_data), step)
+    if report.clean:
+        return weather_data, report
+
+    columns = {}
+    for column in weather_data.columns:
+        if column == "time":
+            columns[column] = repaired.time
+        elif column in FORCING_COLUMNS:
+            columns[column] = getattr(repaired, column)
+        elif column in DATE_PARTS:
+            columns[column] = DATE_PARTS[column](repaired.time).astype(weather_data[column].dtype)
+        else:
+            columns[column] = weather_data[column].reset_index(drop=True).reindex(source).to_numpy()
+    return pd.DataFrame(columns), report
+
+
+def _repair(forcing, step):
+    """check_forcing, also returning the source step of every row (-1 if inserted)."""
+    report = QualityReport(len(forcing))
+    time = forcing.time.view(np.int64)
+    if len(time) == 0:
+        return forcing, report, np.arange(0)
+
+    # segments of the time axis, split at jumps of more than SEGMENT_GAP either way
+    jumps = np.abs(np.diff(time)) > SEGMENT_GAP // np.timedelta64(1, "ns")
+    segment = np.concatenate([[0], np.cumsum(jumps)])
+    report.segments = int(segment[-1]) + 1
+
+    # sorted by time within each segment (stable, so the first of a duplicate time is kept)
+    steps = np.lexsort((time, segment))
+    report.reordered = int(np.sum(steps != np.arange(len(steps))))
+    new = np.ones(len(steps), dtype=bool)
+    new[1:] = (np.diff(time[steps]) != 0) | (np.diff(segment[steps]) != 0)
+    report.duplicates = int(np.sum(~new))
+    steps, segment = steps[new], segment[steps[new]]
+    sorted_time = time[steps]
+
+    within = np.diff(segment) == 0
+    if step is None:
+        diffs = np.diff(sorted_time)[within]
+        step = int(round(np.median(diffs) / 10**9)) if len(diffs) else 3600
+    report.step = step
+    step_ns = np.int64(step) * 10**9
+
+    # grid position of every step within its segment
+    starts = sorted_time[np.concatenate([[0], np.flatnonzero(~within) + 1])]
+    offset = sorted_time - starts[segment]
+    on_grid = offset % step_ns == 0
+    report.irregular = int(np.sum(~on_grid))
+    steps, segment, position = steps[on_grid], segment[on_grid], offset[on_grid] // step_ns
+
+    lengths = np.zeros(report.segments, dtype=np.int64)
+    np.maximum.at(lengths, segment, position + 1)
+    first_row = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+
+    # source step of every row
+    n_rows = int(lengths.sum())
+    source = np.full(n_rows, -1)
+    source[first_row[segment] + position] = steps
+    taken = source >= 0
+
+    new_time = np.repeat(starts, lengths) + (np.arange(n_rows) - np.repeat(first_row, lengths)) * step_ns
+    new_time = new_time.view("datetime64[ns]")
+
+    # NSRDB years leave out February 29, which is not a gap
+    days = new_time.astype("datetime64[D]")
+    leap_day = (days - days.astype("datetime64[M]") == np.timedelta64(28, "D")) & (days.astype("datetime64[M]").astype(np.int64) % 12 == 1)
+    if (leap_day & ~taken).any():
+        rows = taken | ~leap_day
+        new_time, source, taken = new_time[rows], source[rows], taken[rows]
+        n_rows = len(new_time)
+    report.inserted = int(np.sum(~taken))
+    report.steps_out = n_rows
+    month = new_time.astype("datetime64[M]").astype(np.int64) % 12
+    hour = (new_time - new_time.astype("datetime64[D]")) // np.timedelta64(1, "h")
+
+    columns = {}
+    for column in FORCING_COLUMNS:
+        values = np.full(n_rows, np.nan)
+        values[taken] = getattr(forcing, column)[source[taken]]
+        counts = report.columns[column]
+        low, high = VALID_RANGES[column]
+        out_of_range = (values < low) | (values > high)
+        counts["out_of_range"] = int(np.sum(out_of_range))
+        values[out_of_range] = np.nan
+        missing = np.isnan(values)
+        counts["missing"] = int(np.sum(missing)) - counts["out_of_range"]
+        if missing.any():
+            values, counts["interpolated"], counts["climatology"] = _fill(values, missing, month, hour)
+        columns[column] = values
+
+    if report.clean:
+        return forcing, report, source
+    return Forcing(new_time, *(columns[column] for column in FORCING_COLUMNS)), report, source
+
+
+def _fill(values, missing, month, hour):
+    """Fills NaNs: short gaps linearly, long ones with the month and hour climatology."""
+    values = values.copy()
+    index = np.arange(len(values))
+    valid = ~missing
+    if not valid.any():
+        raise ValueError("A forcing column has no valid values to fill from")
+
+    # length of the gap each missing value belongs to
+    gap_id = np.cumsum(valid)
+    gap_length = np.bincount(gap_id[missing], minlength=gap_id[-1] + 1)[gap_id]
+    bounded = (index > np.flatnonzero(valid)[0]) & (index < np.flatnonzero(valid)[-1])
+    short = missing & (gap_length <= MAX_INTERPOLATED_STEPS) & bounded
+    values[short] = np.interp(index[short], index[valid], values[valid])
+
+    long = missing & ~short
+    if long.any():
+        key = month * 24 + hour
+        sums = np.bincount(key[valid], weights=values[valid], minlength=12 * 24)
+        counts = np.bincount(key[valid], minlength=12 * 24)
+        hourly = np.bincount(hour[valid], weights=values[valid], minlength=24) / np.maximum(np.bincount(hour[valid], minlength=24), 1)
+        climatology = np.where(counts > 0, sums / np.maximum(counts, 1), hourly[np.arange(12 * 24) % 24])
+        values[long] = climatology[key[long]]
+    return values, int(np.sum(short)), int(np.sum(long))
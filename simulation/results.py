@@ -0,0 +1,59 @@
+import pandas as pd
+import numpy as np
+
+from simulation.forcing import FORCING_COLUMNS
+
+STATE_COLUMNS = ("GH_T_air", "GH_T_top", "GH_T_bottle", "GH_T_ground", "GH_T_wall_ext", "GH_T_wall_int", "GH_humidity", "crop_mass")
+
+class SimulationResult:
+    """Output of one simulation run, held in columns preallocated to the forcing length.
+
+    Steps are written by index into fixed NumPy buffers, so a run allocates its whole
+    output once. The weather frame the run started from is never modified; to_frame()
+    joins it with the outputs on demand.
+    """
+
+    def __init__(self, forcing, weather_data=None, columns=STATE_COLUMNS):
+        self.forcing = forcing
+        self.weather_data = weather_data
+        self.integrator_stats = None  # step budget report of a sub-stepping integrator
+        self.cache_status = None  # "memory", "disk" or "miss" when run through a ResultCache
+        self.columns = {}
+        self.add_columns(columns)
+
+    def add_columns(self, names):
+        """Preallocates a column for every name not stored yet."""
+        for name in names:
+            if name not in self.columns:
+                self.columns[name] = np.empty(len(self.forcing))
+
+    def record(self, i, values):
+        """Writes a dict of values into row i."""
+        for key, value in values.items():
+            self.columns[key][i] = value
+
+    def __len__(self):
+        return len(self.forcing)
+
+    def __contains__(self, key):
+        return key in self.columns or key == "time" or key in FORCING_COLUMNS
+
+    def __getitem__(self, key):
+        """Output column (or forcing column) as a NumPy array."""
+        if key in self.columns:
+            return self.columns[key]
+        if key == "time" or key in FORCING_COLUMNS:
+            return getattr(self.forcing, key)
+        raise KeyError(key)
+
+    def to_frame(self):
+        """The weather (or forcing) with every output column appended, as a new DataFrame."""
+        if self.weather_data is not None:
+            inputs = self.weather_data.reset_index(drop=True)
+        else:
+            inputs = pd.DataFrame({"time": self.forcing.time, **{column: getattr(self.forcing, column) for column in FORCING_COLUMNS}})
+
+        inputs = inputs.drop(columns=[column for column in self.columns if column in inputs.columns])
+        # read-only (cached) outputs are copied so the frame can be edited
+        frozen = any(not values.flags.writeable for values in self.columns.values())
+        return pd.concat([inputs, pd.DataFrame(self.columns, copy=frozen)], axis=1)
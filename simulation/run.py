@@ -1,17 +1,69 @@
+import warnings
 import pandas as pd
 import numpy as np
 
-from simulation.update import update_cycle
+from simulation.update import step_cycle, DIAGNOSTICS, HeatFlows
 from greenhouse_setups.read_profiles import load_params
-from greenhouse_setups.params import update_all_params
+from greenhouse_setups.params import update_all_params, GreenhouseParams
 from components.crop_model import compute_crop_growth
 from crops.retrieve_dict import get_crop_dict
 from components.const import RHO_AIR
-
-def run_simulation(weather_data, T_air_init, T_top_init, RH_init, crop, dt, profile=None, params_dict=None):
-    """Runs the full-year greenhouse simulation with minute-level updates and humidity considerations."""
-    if profile: load_params(profile)
-    if params_dict: update_all_params(params_dict)
+from simulation.forcing import build_forcing, steps_per_day
+from simulation.quality import check_weather
+from simulation.results import SimulationResult, STATE_COLUMNS
+from simulation.kernel import simulate_compiled
+from simulation.integrators import get_integrator
+
+def run_simulation(weather_data, T_air_init, T_top_init, RH_init, crop, dt, profile=None, params_dict=None, forcing=None, params=None, backend="python", integrator=None, output="full", ledger=None, cache=None):
+    """Runs the full-year greenhouse simulation with minute-level updates and humidity considerations.
+
+    Args:
+        weather_data (DataFrame): weather as returned by compile_nrel_data, checked
+            and repaired with simulation.quality.check_weather unless forcing is given.
+        T_air_init (float): initial greenhouse air temperature (°C).
+        T_top_init (float): initial top zone temperature (°C).
+        RH_init (float): initial relative humidity (%).
+        crop (str): crop name in crops/simple_crop_data.json.
+        dt (float): time step (s).
+        profile (str): greenhouse profile json to load, if params is None.
+        params_dict (dict): parameter overrides applied after the profile, if params is None.
+        forcing (Forcing): prebuilt forcing of weather_data, reused across runs.
+        params (GreenhouseParams): the greenhouse; the loaded setup is then left untouched.
+        backend (str): "python" (the reference) or "numba", see simulation.kernel.
+        integrator (str): None or "euler", "adaptive" or "semi-implicit", see
+            simulation.integrators.get_integrator. Python backend only.
+        output (str or list): columns recorded besides the states: "full", "states"
+            or names from simulation.update.DIAGNOSTICS and HeatFlows.
+        ledger (EnergyLedger): books the heat flow totals, see simulation.ledger.
+        cache (ResultCache): returns stored runs, see simulation.cache.
+
+    Returns:
+        tuple: (SimulationResult, cycles, total crop mass). The result leaves
+        weather_data untouched; result.to_frame() gives a DataFrame.
+    """
+    if params is None:
+        if profile: load_params(profile)
+        if params_dict: update_all_params(params_dict)
+        params = GreenhouseParams.from_globals()
+    if forcing is None:
+        weather_data, quality = check_weather(weather_data)
+        if not quality.clean: warnings.warn(f"Weather repaired:\n{quality}", stacklevel=2)
+        forcing = build_forcing(weather_data)
+    integrator = get_integrator(integrator)
+    if cache is not None:
+        if ledger is not None: raise ValueError("A cached run cannot book an energy ledger")
+        key = cache.key(forcing, params, crop, dt, T_air_init, T_top_init, RH_init, backend, integrator, output)
+        run = cache.get(key, forcing, weather_data)
+        if run is None:
+            run = run_simulation(weather_data, T_air_init, T_top_init, RH_init, crop, dt, forcing=forcing, params=params, backend=backend, integrator=integrator, output=output)
+            if run[0] is not None: run[0].cache_status = "miss"
+            cache.put(key, *run)
+        return run
+
+    if backend == "numba":
+        if integrator is not None: raise ValueError("The numba backend only integrates with forward Euler")
+        if ledger is not None: raise ValueError("The numba backend does not book an energy ledger")
+        return simulate_compiled(forcing, params, crop, dt, T_air_init, T_top_init, RH_init, weather_data)
 
     T_air = T_air_init
     T_wall_ext = T_air_init
@@ -20,14 +72,18 @@ def run_simulation(weather_data, T_air_init, T_top_init, RH_init, crop, dt, prof
     T_bottle = T_air_init + 5
     T_ground = T_air_init
     RH_air = RH_init
-    GH_T_air = []
-    GH_T_top = []
-    GH_T_bottle = []
-    GH_T_ground = []
-    GH_T_wall_int = []
-    GH_T_wall_ext = []
-    GH_humidities = []
-    crop_masses = []
+    columns = output_columns(output)
+    outputs = output if output in ("full", "states") else columns
+    result = SimulationResult(forcing, weather_data, STATE_COLUMNS + columns)
+    if integrator is not None: integrator.reset()
+    GH_T_air = result["GH_T_air"]
+    GH_T_top = result["GH_T_top"]
+    GH_T_bottle = result["GH_T_bottle"]
+    GH_T_ground = result["GH_T_ground"]
+    GH_T_wall_int = result["GH_T_wall_int"]
+    GH_T_wall_ext = result["GH_T_wall_ext"]
+    GH_humidities = result["GH_humidity"]
+    crop_masses = result["crop_mass"]
     old_rho_air = RHO_AIR
     old_rho_air_top = RHO_AIR
 
@@ -36,29 +92,28 @@ def run_simulation(weather_data, T_air_init, T_top_init, RH_init, crop, dt, prof
     TT = 0
     crop_mass = 0
     radiation_MJ_24h = 0
+    day_steps = steps_per_day(dt)
     cycles = 0
     is_unstable = False
     total_crop_mass = 0
 
-    for i in range(len(weather_data)): # run the simualtion for the whole data set
-        T_ext = weather_data.loc[i, "temperature"]
-        RH_outside = weather_data.loc[i, "humidity"]
-        pressure = weather_data.loc[i, "pressure"]
-        solar = weather_data.loc[i, "solar"]
-        solar_angle = weather_data.loc[i, "solar_angle"]
-        time = weather_data.loc[i, "time"]
-        hour = pd.to_datetime(time).hour
-        date = pd.to_datetime(time)
+    for i in range(len(forcing)): # run the simualtion for the whole data set
+        T_ext = forcing.temperature[i]
+        RH_outside = forcing.humidity[i]
+        pressure = forcing.pressure[i]
+        solar = forcing.solar[i]
+        solar_angle = forcing.solar_angle[i]
+        date = forcing.time[i]
 
-        radiation_MJ_24h += solar*0.0036
+        radiation_MJ_24h += solar*0.0036*(dt/3600)
 
 
-        if hour == 0 and i>0:
-            last_day_rel_idx = max(0, i-24)
+        if forcing.is_midnight[i] and i>0:
+            last_day_rel_idx = max(0, i-day_steps)
             T_air_24 = GH_T_air[last_day_rel_idx:i]
             
             # crops
-            T_max, T_min, T_mean = max(T_air_24), min(T_air_24), np.mean(T_air_24)
+            T_max, T_min, T_mean = T_air_24.max(), T_air_24.min(), T_air_24.mean()
             crop_mass, TT = compute_crop_growth(crop_mass, TT, radiation_MJ_24h, T_mean, T_base, T_opt, T_max, T_heat, T_extreme, I50A, RUE, 400, SCO2)
             if TT >= T_sum:
                 #print("MATURED", crop_mass)
@@ -72,7 +127,7 @@ def run_simulation(weather_data, T_air_init, T_top_init, RH_init, crop, dt, prof
             radiation_MJ_24h = 0
 
         # Call the updated temperature model
-        T_air, T_top, T_wall_ext, T_wall_int, T_ground, T_bottle, RH_air, old_rho_air, old_rho_air_top, is_unstable, variables = update_cycle(
+        T_air, T_top, T_wall_ext, T_wall_int, T_ground, T_bottle, RH_air, old_rho_air, old_rho_air_top, is_unstable, variables = step_cycle(
             T_ext, T_top, T_air,  # temp
             T_ground, T_wall_ext, T_wall_int, T_bottle,  # temp
             solar, solar_angle,  # solar
@@ -82,48 +137,52 @@ def run_simulation(weather_data, T_air_init, T_top_init, RH_init, crop, dt, prof
             400, 3,
             old_rho_air, old_rho_air_top,
             
-            dt, date, is_unstable, i, # Ventilation & Humidity
+            dt, date, is_unstable, params, i, integrator, outputs, ledger, # Ventilation & Humidity
         )
 
         # if i < 10:
         #     print(T_air,T_top, T_bottle)
 
-        if i < 1:
-            greenhouse_data = {key: [] for key in variables.keys()}
-
-        # Append the current values to their respective lists
-        for key, value in variables.items():
-            greenhouse_data[key].append(value)
+        # Store the current values in their preallocated columns
+        if variables: result.record(i, variables)
 
         if is_unstable:
             cycles = 0
             total_crop_mass = 0
             return None, cycles, total_crop_mass
 
-        GH_T_air.append(T_air)
-        GH_T_bottle.append(T_bottle)
-        GH_T_ground.append(T_ground)
-        GH_T_wall_ext.append(T_wall_ext)
-        GH_T_wall_int.append(T_wall_int)
-        GH_T_top.append(T_top)
-        GH_humidities.append(RH_air)
-        crop_masses.append(crop_mass)
-
-    weather_data["GH_T_air"] = GH_T_air
-    weather_data["GH_T_top"] = GH_T_top
-    weather_data["GH_T_bottle"] = GH_T_bottle
-    weather_data["GH_T_ground"] = GH_T_ground
-    weather_data["GH_T_wall_ext"] = GH_T_wall_ext
-    weather_data["GH_T_wall_int"] = GH_T_wall_int
-    weather_data["GH_humidity"] = GH_humidities
-    weather_data["crop_mass"] = crop_masses
-
-    for key, value_list in greenhouse_data.items():
-        weather_data[key] = value_list
+        GH_T_air[i] = T_air
+        GH_T_bottle[i] = T_bottle
+        GH_T_ground[i] = T_ground
+        GH_T_wall_ext[i] = T_wall_ext
+        GH_T_wall_int[i] = T_wall_int
+        GH_T_top[i] = T_top
+        GH_humidities[i] = RH_air
+        crop_masses[i] = crop_mass
 
     cycles += TT/T_sum
     total_crop_mass += crop_mass
-
-    
-
-    return weather_data, cycles, total_crop_mass
+    if integrator is not None: result.integrator_stats = integrator.report()
+
+    return result, cycles, total_crop_mass
+
+
+def output_columns(output):
+    """Diagnostic columns run_simulation records for an output level, besides the states.
+
+    "full" gives every DIAGNOSTICS column and "states" none, which also skips
+    building the flux dict, so optimizer runs that only read the states should use
+    it. Listed states are dropped, they are always recorded. The numba backend
+    records the states only, whatever the output.
+    """
+    if output == "full":
+        return DIAGNOSTICS
+    if output == "states":
+        return ()
+    if isinstance(output, str):
+        raise ValueError(f"Unknown output {output!r}, expected 'full', 'states' or a list of column names")
+
+    unknown = [name for name in output if name not in DIAGNOSTICS and name not in HeatFlows._fields and name not in STATE_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown output columns {unknown}")
+    return tuple(name for name in output if name not in STATE_COLUMNS)
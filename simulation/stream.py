@@ -0,0 +1,127 @@
+from collections import deque
+from collections.abc import Mapping
+from typing import NamedTuple
+import pandas as pd
+import numpy as np
+
+from simulation.update import step_cycle
+from simulation.integrators import get_integrator
+from greenhouse_setups.read_profiles import load_params
+from greenhouse_setups.params import update_all_params, GreenhouseParams
+from components.crop_model import compute_crop_growth
+from crops.retrieve_dict import get_crop_dict
+from components.const import RHO_AIR
+from simulation.forcing import FORCING_COLUMNS, steps_per_day
+
+class StepRecord(NamedTuple):
+    """State of the greenhouse after one step, as yielded by iter_simulation."""
+    time: object
+    GH_T_air: float
+    GH_T_top: float
+    GH_T_bottle: float
+    GH_T_ground: float
+    GH_T_wall_ext: float
+    GH_T_wall_int: float
+    GH_humidity: float
+    crop_mass: float
+    cycles: float  # completed cycles plus the fraction of the current one
+    total_crop_mass: float  # harvested mass plus the standing crop
+
+
+def iter_weather_records(weather_data):
+    """Lazily yields the rows of a weather DataFrame as named tuples."""
+    yield from weather_data[["time", *FORCING_COLUMNS]].itertuples(index=False)
+
+
+def iter_simulation(weather_records, T_air_init, T_top_init, RH_init, crop, dt, profile=None, params_dict=None, params=None, integrator=None, ledger=None):
+    """Streaming counterpart of run_simulation.
+
+    Steps the greenhouse through weather records as they arrive and yields one
+    StepRecord per step. Only the last steps_per_day(dt) air temperatures, one
+    day of them, are kept (for the daily crop update), so memory stays constant
+    however long the forcing is; the records can come from a file reader, a live
+    feed or iter_weather_records.
+
+    Args:
+        weather_records (iterable): mappings or named tuples with time, temperature,
+            humidity, pressure, solar and solar_angle.
+        T_air_init (float): initial greenhouse air temperature (°C).
+        T_top_init (float): initial top zone temperature (°C).
+        RH_init (float): initial relative humidity (%).
+        crop (str): crop name in crops/simple_crop_data.json.
+        dt (float): time step (s).
+        profile, params_dict, params, integrator, ledger: as in run_simulation.
+
+    Yields:
+        StepRecord: the states after each step. cycles and total_crop_mass of the
+        last record equal what run_simulation returns for the same weather.
+    """
+    if params is None:
+        if profile: load_params(profile)
+        if params_dict: update_all_params(params_dict)
+        params = GreenhouseParams.from_globals()
+    integrator = get_integrator(integrator)
+    if integrator is not None: integrator.reset()
+
+    T_air = T_air_init
+    T_wall_ext = T_air_init
+    T_wall_int = T_air_init
+    T_top = T_top_init
+    T_bottle = T_air_init + 5
+    T_ground = T_air_init
+    RH_air = RH_init
+    old_rho_air = RHO_AIR
+    old_rho_air_top = RHO_AIR
+    T_air_window = deque(maxlen=steps_per_day(dt))
+    last_day = None
+
+    T_sum, HI, I50A, I50B, T_base, T_opt, RUE, I50maxH, I50maxW, T_heat, T_extreme, SCO2, S_water = get_crop_dict(crop)
+    TT = 0
+    crop_mass = 0
+    radiation_MJ_24h = 0
+    cycles = 0
+    is_unstable = False
+    total_crop_mass = 0
+
+    for i, record in enumerate(weather_records):
+        if isinstance(record, Mapping):
+            date, T_ext, RH_outside, pressure, solar, solar_angle = (record[key] for key in ("time", *FORCING_COLUMNS))
+        else:
+            date, T_ext, RH_outside, pressure, solar, solar_angle = (getattr(record, key) for key in ("time", *FORCING_COLUMNS))
+
+        radiation_MJ_24h += solar*0.0036*(dt/3600)
+
+        timestamp = pd.Timestamp(date)
+        is_midnight = timestamp.hour == 0 and timestamp.date() != last_day
+        last_day = timestamp.date()
+        if is_midnight and i>0:
+            # crops
+            T_air_24 = np.array(T_air_window)
+            T_max, T_mean = T_air_24.max(), T_air_24.mean()
+            crop_mass, TT = compute_crop_growth(crop_mass, TT, radiation_MJ_24h, T_mean, T_base, T_opt, T_max, T_heat, T_extreme, I50A, RUE, 400, SCO2)
+            if TT >= T_sum:
+                total_crop_mass += crop_mass
+                TT, crop_mass = 0, 0.01
+                cycles += 1
+
+            radiation_MJ_24h = 0
+
+        T_air, T_top, T_wall_ext, T_wall_int, T_ground, T_bottle, RH_air, old_rho_air, old_rho_air_top, is_unstable, _ = step_cycle(
+            T_ext, T_top, T_air,
+            T_ground, T_wall_ext, T_wall_int, T_bottle,
+            solar, solar_angle,
+            RH_air, RH_outside,
+            pressure,
+
+            400, 3,
+            old_rho_air, old_rho_air_top,
+
+            dt, date, is_unstable, params, i, integrator, "states", ledger,
+        )
+
+        if is_unstable:
+            return
+
+        T_air_window.append(T_air)
+        yield StepRecord(date, T_air, T_top, T_bottle, T_ground, T_wall_ext, T_wall_int, RH_air, crop_mass,
+                         cycles + TT/T_sum, total_crop_mass + crop_mass)
@@ -12,6 +12,23 @@ from components.hydroponic import hydroponic_pipe_cooling
 from components.thermal_mass import thermal_mass_calc
 from components.bottles import bottle_heat_exchange
 from components.solar import solar_position, projected_irradiance
+from components.vectorize import where
+from greenhouse_setups.params import GreenhouseParams
+from typing import NamedTuple
+
+MAX_T_FLUC = 50
+MAX_RHO_AIR_FLUC = 0.8
+
+# state nodes advanced by the integrators, in this order
+NODES = ("T_air", "T_top", "T_wall_ext", "T_wall_int", "T_ground", "T_bottle")
+
+# diagnostic variables of a full output step, in recording order
+DIAGNOSTICS = ("T_ext", "Q_wall_solar", "Q_wall_ext_conv", "Q_wall_rad_ext", "Q_wall_ext_cond", "Q_wall_int_conv",
+               "Q_wall_int_rad", "Q_wall_ext_rad", "Q_net_ext", "Q_net_int", "T_wall_ext_new", "T_wall_int_new",
+               "Q_top_solar", "Q_top_cond", "Q_top_conv", "Q_top_rad", "Q_top_vent", "Q_roof_int_conv", "Q_roof_int_rad",
+               "roof_rho", "roof_cp", "Q_air_cond", "Q_air_conv", "Q_air_rad", "Q_air_vent", "Q_air_internal",
+               "Q_wall_air_conv", "Q_wall_air_rad", "crop_mass", "RH_air_new", "Q_top_net", "T_top_new", "Q_air_net",
+               "T_air_new", "thermal_mass_top", "thermal_mass_mid", "thermal_mass_wall")
 
 def update_cycle(T_ext, T_top, T_air, 
                     T_ground, T_wall_ext, T_wall_int, T_bottle, 
@@ -21,28 +38,71 @@ def update_cycle(T_ext, T_top, T_air,
                     CO2_conc, crop_mass,
                     old_rho_air, old_rho_air_top,
                 
-                    dt, date, is_unstable, debug=0):
-
-
-    from greenhouse_setups.params import h_conv, vent_rate, \
-                                  plant_transpiration_rate, volume, roof_area, top_vent_rate, \
-                                  wall_cp, wall_rho, wall_conductivity, wall_thickness, wall_emissivity, wall_solar_absorp_coef, \
-                                  roof_conductivity, roof_thickness, roof_emissivity, roof_solar_absorp_coef, roof_rho, roof_cp, \
-                                  wall_area, roof_area, ground_area, roof_area, roof_volume, \
-                                  soil_depth, soil_density, soil_cp, \
-                                  nr_water_bottles, bottles_percent_open
-
-
-    MAX_T_FLUC = 50
-    MAX_RHO_AIR_FLUC = 0.8
-    PRESET_WATER_BOTTLE_SIZE = 3 # liters//mass
-    PRESET_WATER_BOTTLE_AREA = 0.15 # square meters
+                    dt, date, is_unstable, debug=0, integrator=None, outputs="full", ledger=None):
+    """Advances the greenhouse one time step using the currently loaded parameters."""
+    return step_cycle(T_ext, T_top, T_air,
+                      T_ground, T_wall_ext, T_wall_int, T_bottle,
+                      solar, solar_angle,
+                      RH_air, RH_ext,
+                      pressure,
+                      CO2_conc, crop_mass,
+                      old_rho_air, old_rho_air_top,
+                      dt, date, is_unstable, GreenhouseParams.from_globals(), debug, integrator, outputs, ledger)
+
+
+class HeatFlows(NamedTuple):
+    """Heat flows (W) and heat capacities (J/K) of the greenhouse in one state."""
+    Q_wall_solar: float
+    Q_wall_ext_rad: float
+    Q_wall_ext_conv: float
+    Q_wall_ext_cond: float
+    Q_wall_int_conv: float
+    Q_wall_int_cond: float
+    Q_wall_int_rad: float
+    Q_net_ext: float
+    Q_net_int: float
+    Q_film_net: float
+    Q_top_solar: float
+    Q_top_cond: float
+    Q_top_conv: float
+    Q_top_rad: float
+    Q_top_vent: float
+    Q_roof_int_conv: float
+    Q_roof_int_rad: float
+    Q_top_net: float
+    Q_ground_cond: float
+    Q_ground_air_conv: float
+    Q_ground_net: float
+    Q_ground: float
+    Q_air_cond: float
+    Q_air_conv: float
+    Q_air_rad: float
+    Q_air_vent: float
+    Q_air_internal: float
+    Q_wall_air_conv: float
+    Q_wall_air_rad: float
+    Q_latent: float
+    Q_air_net: float
+    Q_bottle: float
+    thermal_mass_mid: float
+    thermal_mass_top: float
+    thermal_mass_wall: float
+
+
+def heat_flows(T_ext, T_top, T_air, T_ground, T_wall_ext, T_wall_int, T_bottle, solar, RH_air, pressure, params):
+    """Evaluates every heat flow of the greenhouse for the given temperatures.
+
+    This is the right-hand side of the thermal model: step_cycle turns it into an
+    explicit Euler step, the integrators in simulation.integrators evaluate it at
+    intermediate sub-step states.
+
+    Returns:
+        HeatFlows: the flows and heat capacities.
+    """
+    p = params
     # EXTRA_FACTOR_BOTTLE = 100
     # nr_water_bottles *= EXTRA_FACTOR_BOTTLE
 
-    tot_water_mass = PRESET_WATER_BOTTLE_SIZE*nr_water_bottles
-    tot_bottle_area = PRESET_WATER_BOTTLE_AREA*nr_water_bottles
-
     H_absolute = absolute_humidity(T_air, RH_air)
     cp_air = np.clip(CP_AIR + (H_absolute * 1860), CP_AIR*0.8, CP_AIR*1.2)
     cp_water = np.clip(cp_water_calc(T_bottle), CP_WATER*0.98, CP_WATER*1.02)
@@ -56,16 +116,11 @@ def update_cycle(T_ext, T_top, T_air,
     # if abs(rho_air_top - old_rho_air_top) > MAX_RHO_AIR_FLUC:
     #     rho_air_top = abs(rho_air_top - old_rho_air_top)/2
 
-    thermal_mass_soil = thermal_mass_calc(0, 0, 0, 0, 0, 0, 0, 0, ground_area, soil_depth, soil_density, soil_cp, 0, 0, 0, 0)
-    thermal_mass_mid = thermal_mass_calc(rho_air, cp_air, cp_water, volume, wall_area, wall_thickness, wall_rho, wall_cp, 0, 0, 0, 0, tot_water_mass, RH_air, T_air, pressure)
-    thermal_mass_wall = thermal_mass_calc(rho_air_top, cp_air, cp_water, volume, wall_area, wall_thickness, wall_rho, wall_cp, 0, 0, 0, 0, 0, 0, 0, 0)
-    thermal_mass_top = thermal_mass_calc(0, 0, 0, 0, wall_area, wall_thickness, wall_rho, wall_cp, 0,  0, 0, 0, tot_water_mass, RH_air, T_top, pressure)
-
-
+    thermal_mass_mid = thermal_mass_calc(rho_air, cp_air, cp_water, p.volume, p.wall_area, p.wall_thickness, p.wall_rho, p.wall_cp, 0, 0, 0, 0, p.tot_water_mass, RH_air, T_air, pressure)
+    thermal_mass_wall = thermal_mass_calc(rho_air_top, cp_air, cp_water, p.volume, p.wall_area, p.wall_thickness, p.wall_rho, p.wall_cp, 0, 0, 0, 0, 0, 0, 0, 0)
+    thermal_mass_top = thermal_mass_calc(0, 0, 0, 0, p.wall_area, p.wall_thickness, p.wall_rho, p.wall_cp, 0,  0, 0, 0, p.tot_water_mass, RH_air, T_top, pressure)
 
-
-
-    Q_bottle, T_bottle_new = bottle_heat_exchange(T_top, T_bottle, tot_water_mass, tot_bottle_area, bottles_percent_open, 15, dt)
+    Q_bottle, _ = bottle_heat_exchange(T_top, T_bottle, p.tot_water_mass, p.tot_bottle_area, p.bottles_percent_open, 15, 0)
 
     # ### Solar
     # latitude = 52.0  # Adjust to your location
@@ -84,37 +139,23 @@ def update_cycle(T_ext, T_top, T_air,
 
     #### WALLS
     # External heat transfer (outside wall surface)
-    Q_wall_solar = max(solar_rad_calc(solar, wall_solar_absorp_coef, wall_area/2), 0) #* np.sin(np.radians(solar_angle))  # Solar absorption
-    Q_wall_ext_rad = radiation_loss_calc(T_wall_ext, T_ext, wall_emissivity, wall_area)  # Radiation loss to sky
-    Q_wall_ext_conv = convection(T_wall_ext, T_ext, wall_conductivity, wall_area)  # Convection with external air
-    Q_wall_ext_cond = conduction_calc(T_wall_ext, T_wall_int, wall_conductivity, wall_thickness, wall_area)  # Conduction from exterior to interior
+    Q_wall_solar = np.maximum(solar_rad_calc(solar, p.wall_solar_absorp_coef, p.wall_area/2), 0) #* np.sin(np.radians(solar_angle))  # Solar absorption
+    Q_wall_ext_rad = radiation_loss_calc(T_wall_ext, T_ext, p.wall_emissivity, p.wall_area)  # Radiation loss to sky
+    Q_wall_ext_conv = convection(T_wall_ext, T_ext, p.wall_conductivity, p.wall_area)  # Convection with external air
+    Q_wall_ext_cond = conduction_calc(T_wall_ext, T_wall_int, p.wall_conductivity, p.wall_thickness, p.wall_area)  # Conduction from exterior to interior
 
     # Internal heat transfer (between interior wall surface and greenhouse air)
-    Q_wall_int_conv = convection(T_wall_int, T_air, wall_conductivity, wall_area)  # Convection with interior air
-    Q_wall_int_cond = conduction_calc(T_wall_int, T_air, wall_conductivity, wall_thickness, wall_area)  # Conduction from interior surface to air
-    Q_wall_int_rad = radiation_loss_calc(T_wall_int, T_air, wall_emissivity, wall_area)
-
-
-
-    if wall_thickness < 0.01:
-        Q_net_ext = 0
+    Q_wall_int_conv = convection(T_wall_int, T_air, p.wall_conductivity, p.wall_area)  # Convection with interior air
+    Q_wall_int_cond = conduction_calc(T_wall_int, T_air, p.wall_conductivity, p.wall_thickness, p.wall_area)  # Conduction from interior surface to air
+    Q_wall_int_rad = radiation_loss_calc(T_wall_int, T_air, p.wall_emissivity, p.wall_area)
 
-        # Q_net_ext = (Q_wall_solar + Q_wall_ext_conv - Q_wall_ext_rad - Q_wall_int_conv - Q_wall_int_cond - Q_wall_int_rad)
-        Q_net_int = Q_net_ext
-        # T_wall_ext_new = T_wall_ext + np.clip((dt*Q_net_ext) / (thermal_mass_wall), -MAX_T_FLUC, MAX_T_FLUC)
-        T_wall_ext_new = T_air
-        T_wall_int_new = T_wall_ext_new
-    
-    else:
-        # Net heat flux for external and internal wall surfaces
-        Q_net_ext = Q_wall_solar + Q_wall_ext_conv - (Q_wall_ext_rad + Q_wall_ext_cond)
-        Q_net_int = Q_wall_ext_cond - (Q_wall_int_conv + Q_wall_int_cond + Q_wall_int_rad)
-
-        # Update temperatures using wall thermal mass
-        T_wall_ext_new = T_wall_ext + np.clip((dt*Q_net_ext) / (thermal_mass_wall), -MAX_T_FLUC, MAX_T_FLUC)
-        T_wall_int_new = T_wall_int + np.clip((dt*Q_net_int) / (thermal_mass_wall), -MAX_T_FLUC, MAX_T_FLUC)
+    # Net heat flux for external and internal wall surfaces
+    Q_net_ext = Q_wall_solar + Q_wall_ext_conv - (Q_wall_ext_rad + Q_wall_ext_cond)
+    Q_net_int = Q_wall_ext_cond - (Q_wall_int_conv + Q_wall_int_cond + Q_wall_int_rad)
 
-    
+    # Thin (film) walls carry no heat of their own and follow the air
+    Q_net_ext = where(p.thin_wall, 0, Q_net_ext)
+    Q_net_int = where(p.thin_wall, Q_net_ext, Q_net_int)
 
     #### TOP TEMP. BODY
         #### AGROFILM ROOF / TOP TEMP. BODY
@@ -124,117 +165,172 @@ def update_cycle(T_ext, T_top, T_air,
     tau = 0.9
     alpha = 0.05
 
-    Q_solar_transmitted = solar * tau * roof_area
-    Q_solar_absorbed = solar * alpha * roof_area
+    Q_solar_transmitted = solar * tau * p.roof_area
+    Q_solar_absorbed = solar * alpha * p.roof_area
 
     # Compute the agrofilm (roof film) temperature T_film via its energy balance.
     # The film has very low mass: mass_film = density_film * roof_area * roof_thickness.
     # For polyethylene, density_film ~ 920 kg/m^3, and roof_thickness must be in meters (e.g., 0.00015 m).
-    density_film = 920  # kg/m^3 (adjust as needed)
-    mass_film = density_film * roof_area * roof_thickness
-    cp_film = 1900  # J/kg·K (typical for polyethylene)
+    # Its heat capacity is neglected: the film follows the top zone temperature.
 
     # Thermal losses from the film:
-    Q_film_cond = conduction_calc(T_top, T_air, roof_conductivity, roof_thickness, roof_area)
-    Q_film_conv = convection(T_top, T_air, roof_conductivity, roof_area)
-    Q_film_rad = radiation_loss_calc(T_top, T_ext, roof_emissivity, roof_area)
+    Q_film_cond = conduction_calc(T_top, T_air, p.roof_conductivity, p.roof_thickness, p.roof_area)
+    Q_film_conv = convection(T_top, T_air, p.roof_conductivity, p.roof_area)
+    Q_film_rad = radiation_loss_calc(T_top, T_ext, p.roof_emissivity, p.roof_area)
     # Total film energy change (absorbed solar minus losses)
     Q_film_net = Q_solar_absorbed - (Q_film_cond + Q_film_conv + Q_film_rad)
-    # Update film temperature (note: dt in seconds)
-    T_film_new = T_top + np.clip((dt * Q_film_net) / (mass_film * cp_film), -MAX_T_FLUC, MAX_T_FLUC)
     # Use transmitted radiation as additional heat gain to the greenhouse top zone.
     Q_top_solar = Q_solar_transmitted
-    Q_top_cond = conduction_calc(T_top, T_ext, roof_conductivity, roof_thickness, roof_area)/500  # Roof conduction
-    Q_top_conv = convection(T_top, T_ext, roof_conductivity, roof_area)  # Roof convection with outside air
-    Q_top_rad = radiation_loss_calc(T_top, T_ext, roof_emissivity, roof_area)  # Radiation loss to sky
-    Q_top_vent = ventilation_loss(T_top, T_ext, cp_air, rho_air_top, top_vent_rate, roof_volume)
+    Q_top_cond = conduction_calc(T_top, T_ext, p.roof_conductivity, p.roof_thickness, p.roof_area)/500  # Roof conduction
+    Q_top_conv = convection(T_top, T_ext, p.roof_conductivity, p.roof_area)  # Roof convection with outside air
+    Q_top_rad = radiation_loss_calc(T_top, T_ext, p.roof_emissivity, p.roof_area)  # Radiation loss to sky
+    Q_top_vent = ventilation_loss(T_top, T_ext, cp_air, rho_air_top, p.top_vent_rate, p.roof_volume)
 
-    Q_roof_int_conv = convection(T_top, T_air, roof_conductivity, roof_area)  # Internal convection
-    Q_roof_int_rad = radiation_loss_calc(T_top, T_air, roof_emissivity, roof_area)  # Internal radiation
+    Q_roof_int_conv = convection(T_top, T_air, p.roof_conductivity, p.roof_area)  # Internal convection
+    Q_roof_int_rad = radiation_loss_calc(T_top, T_air, p.roof_emissivity, p.roof_area)  # Internal radiation
 
     #### GROUND HEAT STORAGE (MULTILAYER CONDUCTION)
-    Q_ground_cond = conduction_calc(T_ground, T_air, soil_cp, soil_depth, ground_area)
-    Q_ground_air_conv = convection(T_air, T_ground, 1, ground_area)
+    Q_ground_cond = conduction_calc(T_ground, T_air, p.soil_cp, p.soil_depth, p.ground_area)
+    Q_ground_air_conv = convection(T_air, T_ground, 1, p.ground_area)
 
     Q_ground_net = Q_ground_air_conv - Q_ground_cond
-    T_ground_new = T_ground + (dt * Q_ground_net) / (RHO_AIR * CP_AIR * thermal_mass_soil)
-    Q_ground = ground_heat_storage(T_ground, T_ext, ground_area, soil_depth)
+    Q_ground = p.soil_conduct * p.ground_area * (T_ext - T_ground) / p.soil_depth  # ground_heat_storage with this design's soil_conduct
 
 
     #### MAIN TEMP. BODY
-    Q_air_cond = conduction_calc(T_air, T_ext, wall_conductivity, wall_thickness, wall_area)
-    Q_air_conv = convection(T_air, T_ext, wall_conductivity, wall_area)
-    Q_air_rad = radiation_loss_calc(T_air, T_ext, wall_emissivity, wall_area)
-    Q_air_vent = ventilation_loss(T_air, T_ext, cp_air, rho_air, vent_rate, volume)
+    Q_air_cond = conduction_calc(T_air, T_ext, p.wall_conductivity, p.wall_thickness, p.wall_area)
+    Q_air_conv = convection(T_air, T_ext, p.wall_conductivity, p.wall_area)
+    Q_air_rad = radiation_loss_calc(T_air, T_ext, p.wall_emissivity, p.wall_area)
+    Q_air_vent = ventilation_loss(T_air, T_ext, cp_air, rho_air, p.vent_rate, p.volume)
 
     # Internal exchange with walls and roof
-    Q_air_internal = convection(T_air, T_top, h_conv, roof_area + wall_area)
-    Q_wall_air_conv = convection(T_wall_int, T_air, wall_conductivity, wall_area)
-    Q_wall_air_rad = radiation_loss_calc(T_wall_int, T_air, wall_emissivity, wall_area)
-
-    
-
-
+    Q_air_internal = convection(T_air, T_top, p.h_conv, p.roof_area + p.wall_area)
+    Q_wall_air_conv = convection(T_wall_int, T_air, p.wall_conductivity, p.wall_area)
+    Q_wall_air_rad = radiation_loss_calc(T_wall_int, T_air, p.wall_emissivity, p.wall_area)
 
     #### CROPS
-    OPEN_BOTTLE_EXPOSED_RATIO = 0.0001
-    RH_air_new = np.clip(compute_humidity_change(T_air, RH_air, T_ext, RH_ext, vent_rate, plant_transpiration_rate, T_ground, solar, 0.2, T_wall_int, 0.01, wall_area+roof_area, T_bottle, tot_bottle_area*bottles_percent_open*OPEN_BOTTLE_EXPOSED_RATIO), 0.5, 100)
-    Q_latent = latent_calc(plant_transpiration_rate, RH_air, T_air)
+    Q_latent = latent_calc(p.plant_transpiration_rate, RH_air, T_air)
     #cond = condensation(0.5, 0.1, 2000, 1700)
 
     # top and main
     Q_top_net = Q_top_solar - (Q_top_cond + Q_top_conv + Q_top_rad + Q_top_vent + Q_roof_int_conv + Q_roof_int_rad) + Q_bottle
-    T_top_new = T_top + np.clip(dt * Q_top_net / (thermal_mass_top), -MAX_T_FLUC, MAX_T_FLUC)
-
     Q_air_net = Q_top_solar/4 + Q_air_internal + Q_wall_int_conv + Q_wall_int_cond - (Q_air_cond + Q_air_conv + Q_air_rad + Q_air_vent + Q_ground + Q_latent) + Q_bottle/4
-    T_air_new = T_air + np.clip(dt * Q_air_net / (thermal_mass_mid), -MAX_T_FLUC, MAX_T_FLUC)
-
-    if (abs(T_top-T_top_new) == MAX_T_FLUC or abs(T_air-T_air_new) == MAX_T_FLUC) and not is_unstable:
-        # is_unstable = True
-        # print(f"{date}: UNSTABLE SOLUTION")
-        pass
-
-
 
     # if hour % 24 < 6 or hour % 24 > 19:
     #     Q_pipe = hydroponic_pipe_cooling(T_air, 14, 30, 30, 20, 0.01)
     # else:
     #     Q_pipe = 0
 
-    if debug < 100:
-        #print(nr_water_bottles, Q_bottle, T_bottle_new) 
-        #print(thermal_mass_mid, thermal_mass_top, cp_water, rho_air, rho_air_top)
+    return HeatFlows(Q_wall_solar, Q_wall_ext_rad, Q_wall_ext_conv, Q_wall_ext_cond,
+                     Q_wall_int_conv, Q_wall_int_cond, Q_wall_int_rad, Q_net_ext, Q_net_int,
+                     Q_film_net, Q_top_solar, Q_top_cond, Q_top_conv, Q_top_rad, Q_top_vent,
+                     Q_roof_int_conv, Q_roof_int_rad, Q_top_net,
+                     Q_ground_cond, Q_ground_air_conv, Q_ground_net, Q_ground,
+                     Q_air_cond, Q_air_conv, Q_air_rad, Q_air_vent, Q_air_internal,
+                     Q_wall_air_conv, Q_wall_air_rad, Q_latent, Q_air_net, Q_bottle,
+                     thermal_mass_mid, thermal_mass_top, thermal_mass_wall)
+
+
+def node_rates(flows, params):
+    """Temperature rates (K/s) of the state nodes, in NODES order.
+
+    Unlike the legacy Euler step, the bottle rate is per second: the bottle update
+    in step_cycle applies Q_bottle once per step regardless of dt.
+    """
+    p = params
+    dT_air = flows.Q_air_net / flows.thermal_mass_mid
+    dT_wall_ext = where(p.thin_wall, dT_air, flows.Q_net_ext / flows.thermal_mass_wall)
+    dT_wall_int = where(p.thin_wall, dT_air, flows.Q_net_int / flows.thermal_mass_wall)
+    return np.array([
+        dT_air,
+        flows.Q_top_net / flows.thermal_mass_top,
+        dT_wall_ext,
+        dT_wall_int,
+        flows.Q_ground_net / (RHO_AIR * CP_AIR * p.thermal_mass_soil),
+        flows.Q_bottle / p.bottle_heat_capacity,
+    ])
+
+
+def humidity_update(T_ext, T_air, T_ground, T_wall_int, T_bottle, solar, RH_air, RH_ext, params):
+    """Relative humidity (%) after one step, from the start-of-step temperatures."""
+    p = params
+    return np.clip(compute_humidity_change(T_air, RH_air, T_ext, RH_ext, p.vent_rate, p.plant_transpiration_rate, T_ground, solar, 0.2, T_wall_int, 0.01, p.exchange_area, T_bottle, p.open_bottle_area), 0.5, 100)
+
+
+def step_cycle(T_ext, T_top, T_air, 
+                    T_ground, T_wall_ext, T_wall_int, T_bottle, 
+                    solar, solar_angle, 
+                    RH_air, RH_ext, 
+                    pressure,
+                    CO2_conc, crop_mass,
+                    old_rho_air, old_rho_air_top,
+                
+                    dt, date, is_unstable, params, debug=0, integrator=None, outputs="full", ledger=None):
+    """Advances the greenhouse one time step with explicitly given parameters.
 
+    params is a GreenhouseParams. States and parameters may be scalars (one
+    greenhouse) or equally shaped arrays (one entry per greenhouse design); the
+    forcing is shared.
 
-        # print(T_ext, T_top, T_air, 
-        #             T_ground, T_wall_ext, T_wall_int, T_bottle, 
-        #             solar, solar_angle, 
-        #             RH_air, RH_ext, 
-        #             pressure,
-        #             CO2_conc, crop_mass,
-                
-        #             dt, hour)
-        #print(f"Q_wall_solar: {Q_wall_solar:.2f}, Q_wall_ext_conv: {Q_wall_ext_conv:.2f}, Q_wall_rad_ext: {Q_wall_rad_ext:.2f}, "
-    #   f"Q_wall_int_cond: {Q_wall_int_cond:.2f}, Q_wall_int_conv: {Q_wall_int_conv:.2f}, Q_net_ext: {Q_net_ext:.2f}, "
-    #   f"Q_net_int: {Q_net_int:.2f}, T_wall_ext_new: {T_wall_ext_new:.2f}, T_wall_int_new: {T_wall_int_new:.2f}, "
-    #   f"Q_top_solar: {Q_top_solar:.2f}, Q_top_cond: {Q_top_cond:.2f}, Q_top_conv: {Q_top_conv:.2f}, "
-    #   f"Q_top_rad: {Q_top_rad:.2f},  Q_top_vent: {Q_top_vent:.2f}, Q_top_net: {Q_top_net:.2f}, Q_air_cond: {Q_air_cond:.2f}, "
-    #   f"Q_air_conv: {Q_air_conv:.2f}, Q_air_rad: {Q_air_rad:.2f}, Q_air_vent: {Q_air_vent:.2f}")
-
-        # print(h_conv, vent_rate, \
-        #                           thermal_mass, plant_transpiration_rate, volume, roof_area, top_vent_rate, \
-        #                           wall_cp, wall_rho, wall_conductivity, wall_thickness, wall_emissivity, wall_solar_absorp_coef, \
-        #                           roof_conductivity, roof_thickness, roof_emissivity, roof_solar_absorp_coef, \
-        #                           wall_area, roof_area, ground_area, \
-        #                           soil_depth, soil_density, soil_cp, \
-        #                           water_bottle_mass)
-        # print(Q_wall_solar, Q_wall_ext_conv, Q_wall_rad, Q_wall_cond)
-        # print(T_air_new, T_top_new, T_wall_ext_new, T_wall_int_new)
-        #print(thermal_mass_mid)
-        #print(Q_solar_top, Q_cond_top, Q_rad_top, Q_vent_top, Q_internal)
-        #print(RH_air_new)
-        #print(solar_gain, conduction_loss, radiation_loss_val, convection_loss, ventilation, latent_heat_loss, floor_loss)
-        pass
+    Without an integrator the temperatures take one forward Euler step of dt,
+    each change clipped to MAX_T_FLUC (the reference model). An integrator from
+    simulation.integrators sub-steps the temperatures instead, without clipping;
+    humidity is updated once per step either way.
+
+    outputs sets what is returned as variables: "full" gives every entry of
+    DIAGNOSTICS, a sequence of names gives only those, and "states" gives None
+    without building any diagnostics.
+
+    A simulation.ledger.EnergyLedger, if given, books the step's heat flows and
+    the heat each node took up.
+    """
+
+    p = params
+    flows = heat_flows(T_ext, T_top, T_air, T_ground, T_wall_ext, T_wall_int, T_bottle, solar, RH_air, pressure, p)
+
+    if integrator is None:
+        # Update temperatures using wall thermal mass
+        T_wall_ext_new = T_wall_ext + np.clip((dt*flows.Q_net_ext) / (flows.thermal_mass_wall), -MAX_T_FLUC, MAX_T_FLUC)
+        T_wall_int_new = T_wall_int + np.clip((dt*flows.Q_net_int) / (flows.thermal_mass_wall), -MAX_T_FLUC, MAX_T_FLUC)
+        T_top_new = T_top + np.clip(dt * flows.Q_top_net / (flows.thermal_mass_top), -MAX_T_FLUC, MAX_T_FLUC)
+        T_air_new = T_air + np.clip(dt * flows.Q_air_net / (flows.thermal_mass_mid), -MAX_T_FLUC, MAX_T_FLUC)
+        T_ground_new = T_ground + (dt * flows.Q_ground_net) / (RHO_AIR * CP_AIR * p.thermal_mass_soil)
+        T_bottle_new = T_bottle + (flows.Q_bottle / p.bottle_heat_capacity)
+
+        # Thin (film) walls carry no heat of their own and follow the air
+        T_wall_ext_new = where(p.thin_wall, T_air, T_wall_ext_new)
+        T_wall_int_new = where(p.thin_wall, T_wall_ext_new, T_wall_int_new)
+    else:
+        def rates(state):
+            T_air_s, T_top_s, T_wall_ext_s, T_wall_int_s, T_ground_s, T_bottle_s = state
+            return node_rates(heat_flows(T_ext, T_top_s, T_air_s, T_ground_s, T_wall_ext_s, T_wall_int_s, T_bottle_s, solar, RH_air, pressure, p), p)
+
+        # thin walls start at the air temperature and move with it (see node_rates)
+        state = np.array([T_air, T_top, T_wall_ext, T_wall_int, T_ground, T_bottle], dtype=float)
+        T_air_new, T_top_new, T_wall_ext_new, T_wall_int_new, T_ground_new, T_bottle_new = integrator.advance(state, rates, dt, node_rates(flows, p))
+
+    RH_air_new = humidity_update(T_ext, T_air, T_ground, T_wall_int, T_bottle, solar, RH_air, RH_ext, p)
+
+    if ledger is not None:
+        ledger.add(date, solar, flows, dt, (
+            flows.thermal_mass_mid * (T_air_new - T_air),
+            flows.thermal_mass_top * (T_top_new - T_top),
+            flows.thermal_mass_wall * (T_wall_ext_new - T_wall_ext),
+            flows.thermal_mass_wall * (T_wall_int_new - T_wall_int),
+            RHO_AIR * CP_AIR * p.thermal_mass_soil * (T_ground_new - T_ground),
+            p.bottle_heat_capacity * (T_bottle_new - T_bottle),
+        ))
+
+    if outputs == "states":
+        return T_air_new, T_top_new, T_wall_ext_new, T_wall_int_new, T_ground_new, T_bottle_new, RH_air_new, old_rho_air, old_rho_air_top, is_unstable, None
+
+    if outputs != "full":
+        # diagnostics that are not a heat flow by the same name
+        step = {"T_ext": T_ext, "Q_wall_rad_ext": flows.Q_wall_ext_rad, "roof_rho": p.roof_rho, "roof_cp": p.roof_cp,
+                "T_wall_ext_new": T_wall_ext_new, "T_wall_int_new": T_wall_int_new, "T_top_new": T_top_new,
+                "T_air_new": T_air_new, "RH_air_new": RH_air_new, "crop_mass": crop_mass}
+        variables = {name: step[name] if name in step else getattr(flows, name) for name in outputs}
+        return T_air_new, T_top_new, T_wall_ext_new, T_wall_int_new, T_ground_new, T_bottle_new, RH_air_new, old_rho_air, old_rho_air_top, is_unstable, variables
 
     variables = {
         #"thermal_mass_mid": thermal_mass_mid,
@@ -242,46 +338,46 @@ def update_cycle(T_ext, T_top, T_air,
         #"thermal_mass_wall": thermal_mass_wall,
         #"T_bottle_new": T_bottle_new,
         "T_ext": T_ext,
-        "Q_wall_solar": Q_wall_solar,
-        "Q_wall_ext_conv": Q_wall_ext_conv,
-        "Q_wall_rad_ext": Q_wall_ext_rad,
-        "Q_wall_ext_cond": Q_wall_ext_cond,
-        "Q_wall_int_conv": Q_wall_int_conv,
-        "Q_wall_int_rad": Q_wall_int_rad,
-        "Q_wall_ext_rad": Q_wall_ext_rad,
-        "Q_net_ext": Q_net_ext,
-        "Q_net_int": Q_net_int,
+        "Q_wall_solar": flows.Q_wall_solar,
+        "Q_wall_ext_conv": flows.Q_wall_ext_conv,
+        "Q_wall_rad_ext": flows.Q_wall_ext_rad,
+        "Q_wall_ext_cond": flows.Q_wall_ext_cond,
+        "Q_wall_int_conv": flows.Q_wall_int_conv,
+        "Q_wall_int_rad": flows.Q_wall_int_rad,
+        "Q_wall_ext_rad": flows.Q_wall_ext_rad,
+        "Q_net_ext": flows.Q_net_ext,
+        "Q_net_int": flows.Q_net_int,
         "T_wall_ext_new": T_wall_ext_new,
         "T_wall_int_new": T_wall_int_new,
-        "Q_top_solar": Q_top_solar,
-        "Q_top_cond": Q_top_cond,
-        "Q_top_conv": Q_top_conv,
-        "Q_top_rad": Q_top_rad,
-        "Q_top_vent": Q_top_vent,
-        "Q_roof_int_conv": Q_roof_int_conv,
-        "Q_roof_int_rad": Q_roof_int_rad,
-        "roof_rho": roof_rho,
-        "roof_cp": roof_cp,
+        "Q_top_solar": flows.Q_top_solar,
+        "Q_top_cond": flows.Q_top_cond,
+        "Q_top_conv": flows.Q_top_conv,
+        "Q_top_rad": flows.Q_top_rad,
+        "Q_top_vent": flows.Q_top_vent,
+        "Q_roof_int_conv": flows.Q_roof_int_conv,
+        "Q_roof_int_rad": flows.Q_roof_int_rad,
+        "roof_rho": p.roof_rho,
+        "roof_cp": p.roof_cp,
         #"Q_ground_cond": Q_ground_cond,
         #"Q_ground_air_conv": Q_ground_air_conv,
         #"Q_ground_net": Q_ground_net,
         #"T_ground_new": T_ground_new,
-        "Q_air_cond": Q_air_cond,
-        "Q_air_conv": Q_air_conv,
-        "Q_air_rad": Q_air_rad,
-        "Q_air_vent": Q_air_vent,
-        "Q_air_internal": Q_air_internal,
-        "Q_wall_air_conv": Q_wall_air_conv,
-        "Q_wall_air_rad": Q_wall_air_rad,
+        "Q_air_cond": flows.Q_air_cond,
+        "Q_air_conv": flows.Q_air_conv,
+        "Q_air_rad": flows.Q_air_rad,
+        "Q_air_vent": flows.Q_air_vent,
+        "Q_air_internal": flows.Q_air_internal,
+        "Q_wall_air_conv": flows.Q_wall_air_conv,
+        "Q_wall_air_rad": flows.Q_wall_air_rad,
         "crop_mass": crop_mass,
         "RH_air_new": RH_air_new,
-        "Q_top_net": Q_top_net,
+        "Q_top_net": flows.Q_top_net,
         "T_top_new": T_top_new,
-        "Q_air_net": Q_air_net,
+        "Q_air_net": flows.Q_air_net,
         "T_air_new": T_air_new,
-        "thermal_mass_top": thermal_mass_top,
-        "thermal_mass_mid": thermal_mass_mid,
-        "thermal_mass_wall": thermal_mass_wall
+        "thermal_mass_top": flows.thermal_mass_top,
+        "thermal_mass_mid": flows.thermal_mass_mid,
+        "thermal_mass_wall": flows.thermal_mass_wall
     }
 
 
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+# profiles and weather are read relative to the repository root
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from data.read_nrel import compile_nrel_data
+
+
+@pytest.fixture(scope="session")
+def weather():
+    """Raqaypampa 2023, the weather of the reference runs."""
+    return compile_nrel_data("data/raqaypampa/2023.csv", use_cache=False)
+
+
+@pytest.fixture(scope="session")
+def month(weather):
+    """The first 30 days of Raqaypampa 2023, for runs that only need some weather."""
+    return weather.iloc[:30*24].reset_index(drop=True)
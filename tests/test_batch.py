@@ -0,0 +1,18 @@
+import numpy as np
+
+from greenhouse_setups.read_profiles import build_params
+from simulation.batch import run_batch_simulation, STATE_KEYS
+from simulation.run import run_simulation
+
+
+def test_batch_matches_scalar_runs(month):
+    designs = [build_params("suticollo_opt1.json"), build_params("suticollo_opt1.json", {"vent_rate": 0.5, "nr_water_bottles": 0})]
+    T_init, RH_init = month["temperature"][0], month["humidity"][0]
+    trajectories, cycles, crop_mass = run_batch_simulation(month, T_init, T_init, RH_init, "Lettuce", 3600, params=designs)
+
+    for k, params in enumerate(designs):
+        result, design_cycles, design_crop_mass = run_simulation(month, T_init, T_init, RH_init, "Lettuce", 3600, params=params, output="states")
+        for key in STATE_KEYS:
+            np.testing.assert_array_equal(trajectories[key][k], result[key], err_msg=key)
+        assert cycles[k] == design_cycles
+        assert crop_mass[k] == design_crop_mass
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from greenhouse_setups.read_profiles import build_params
+from simulation.cache import ResultCache
+from simulation.forcing import build_forcing
+from simulation.integrators import AdaptiveIntegrator
+from simulation.ledger import EnergyLedger
+from simulation.results import STATE_COLUMNS
+from simulation.run import run_simulation
+
+
+def run(weather, cache, params=None, crop="Lettuce", **kwargs):
+    T_init, RH_init = weather["temperature"][0], weather["humidity"][0]
+    return run_simulation(weather, T_init, T_init, RH_init, crop, 3600, params=params or build_params("suticollo_opt1.json"),
+                          output="states", cache=cache, **kwargs)
+
+
+def test_repeated_run_is_a_memory_hit(month):
+    cache = ResultCache()
+    first, cycles, crop_mass = run(month, cache)
+    second, cached_cycles, cached_crop_mass = run(month, cache)
+
+    assert (first.cache_status, second.cache_status) == ("miss", "memory")
+    assert cache.stats() == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
+    assert (cached_cycles, cached_crop_mass) == (cycles, crop_mass)
+    for column in STATE_COLUMNS:
+        np.testing.assert_array_equal(second[column], first[column])
+        assert not second[column].flags.writeable
+
+
+def test_disk_tier_survives_a_new_cache(month, tmp_path):
+    first, cycles, crop_mass = run(month, ResultCache(directory=str(tmp_path)))
+    second, cached_cycles, cached_crop_mass = run(month, ResultCache(directory=str(tmp_path)))
+
+    assert second.cache_status == "disk"
+    assert (cached_cycles, cached_crop_mass) == (cycles, crop_mass)
+    for column in STATE_COLUMNS:
+        np.testing.assert_array_equal(second[column], first[column])
+
+
+def test_key_covers_every_input(month):
+    cache = ResultCache()
+    forcing = build_forcing(month)
+    params = build_params("suticollo_opt1.json")
+    base = (forcing, params, "Lettuce", 3600, 10.0, 10.0, 60.0)
+    keys = {
+        cache.key(*base),
+        cache.key(forcing, build_params("suticollo_opt1.json", {"vent_rate": 0.5}), "Lettuce", 3600, 10.0, 10.0, 60.0),
+        cache.key(forcing, params, "Tomato", 3600, 10.0, 10.0, 60.0),
+        cache.key(forcing, params, "Lettuce", 1800, 10.0, 10.0, 60.0),
+        cache.key(forcing, params, "Lettuce", 3600, 11.0, 10.0, 60.0),
+        cache.key(*base, backend="numba"),
+        cache.key(*base, output="states"),
+        cache.key(*base, integrator=AdaptiveIntegrator()),
+        cache.key(build_forcing(month.iloc[:-1]), params, "Lettuce", 3600, 10.0, 10.0, 60.0),
+    }
+
+    assert len(keys) == 9
+    assert cache.key(*base) == cache.key(forcing, build_params("suticollo_opt1.json"), "Lettuce", 3600, 10.0, 10.0, 60.0)
+
+
+def test_cached_run_refuses_a_ledger(month):
+    with pytest.raises(ValueError):
+        run(month, ResultCache(), ledger=EnergyLedger())
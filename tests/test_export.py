@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from greenhouse_setups.read_profiles import build_params
+from simulation.export import (FLOAT32_TOLERANCE, ResultWriter, export_result, forcing_hash, read_metadata, read_results,
+                               write_records)
+from simulation.results import STATE_COLUMNS
+from simulation.run import run_simulation
+from simulation.stream import iter_simulation, iter_weather_records
+
+
+@pytest.fixture(scope="module")
+def run(month):
+    params = build_params("suticollo_opt1.json")
+    T_init, RH_init = month["temperature"][0], month["humidity"][0]
+    result, cycles, crop_mass = run_simulation(month, T_init, T_init, RH_init, "Lettuce", 3600, params=params, output="states")
+    return result, params
+
+
+def test_exported_result_reads_back(run, tmp_path):
+    result, params = run
+    export_result(result, str(tmp_path), crop="Lettuce", profile="suticollo_opt1.json", params=params)
+    stored = read_results(str(tmp_path))
+
+    np.testing.assert_array_equal(stored["time"].to_numpy(), result.forcing.time)
+    atol, rtol = FLOAT32_TOLERANCE
+    for column in STATE_COLUMNS:
+        np.testing.assert_allclose(stored[column].to_numpy(dtype=float), result[column], rtol=rtol, atol=atol, err_msg=column)
+
+    metadata = read_metadata(str(tmp_path))["metadata"]
+    assert metadata["crop"] == "Lettuce"
+    assert metadata["weather_hash"] == forcing_hash(result.forcing)
+    assert metadata["params"]["vent_rate"] == params.vent_rate
+
+
+def test_columns_and_rows_are_read_selectively(run, tmp_path):
+    result, params = run
+    export_result(result, str(tmp_path))
+    stored = read_results(str(tmp_path), columns=["GH_T_air"], start=100, stop=200)
+
+    assert list(stored.columns) == ["GH_T_air"]
+    assert len(stored) == 100
+    np.testing.assert_allclose(stored["GH_T_air"], result["GH_T_air"][100:200], rtol=1e-6, atol=1e-4)
+
+
+def test_streamed_records_read_back_across_parts(month, tmp_path):
+    params = build_params("suticollo_opt1.json")
+    T_init, RH_init = month["temperature"][0], month["humidity"][0]
+    records = list(iter_simulation(iter_weather_records(month), T_init, T_init, RH_init, "Lettuce", 3600, params=params))
+    last = write_records(iter(records), str(tmp_path), chunk_steps=100)
+    stored = read_results(str(tmp_path), start=250, stop=450)
+
+    assert last == records[-1]
+    assert len(read_metadata(str(tmp_path))["parts"]) == -(-len(records) // 100)
+    expected = np.array([record.GH_T_air for record in records[250:450]])
+    np.testing.assert_allclose(stored["GH_T_air"], expected, rtol=1e-6, atol=1e-4)
+
+
+def test_append_mode_continues_a_result(tmp_path):
+    first = pd.DataFrame({"step": np.arange(3.0), "value": np.full(3, 0.1)})
+    second = pd.DataFrame({"step": np.arange(3.0, 5.0), "value": np.full(2, 1e-9)})
+    with ResultWriter(str(tmp_path), {"run": 1}) as writer:
+        writer.append(first)
+    with ResultWriter(str(tmp_path), mode="a", float32_tolerance=None) as writer:
+        writer.append(second)
+
+    stored = read_results(str(tmp_path))
+    np.testing.assert_array_equal(stored["step"], np.arange(5.0))
+    assert stored["value"].iloc[-1] == 1e-9
+    assert read_metadata(str(tmp_path))["metadata"] == {"run": 1}
+
+    with pytest.raises(ValueError):
+        with ResultWriter(str(tmp_path), mode="a") as writer:
+            writer.append({"step": np.arange(2.0)})
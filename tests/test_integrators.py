@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from greenhouse_setups.read_profiles import build_params
+from simulation.integrators import AdaptiveIntegrator, SemiImplicitIntegrator
+from simulation.results import STATE_COLUMNS
+from simulation.run import run_simulation
+
+NODE_COLUMNS = [column for column in STATE_COLUMNS if column.startswith("GH_T_")]
+
+
+@pytest.fixture(scope="module")
+def two_weeks(weather):
+    # the unbounded semi-implicit step first left the physical range on day 8
+    return weather.iloc[:14*24]
+
+
+def run(weather, integrator):
+    T_init, RH_init = weather["temperature"].iloc[0], weather["humidity"].iloc[0]
+    return run_simulation(weather, T_init, T_init, RH_init, "Lettuce", 3600, params=build_params("suticollo_opt1.json"),
+                          output="states", integrator=integrator)
+
+
+def test_semi_implicit_stays_within_physical_bounds(two_weeks):
+    result, cycles, crop_mass = run(two_weeks, SemiImplicitIntegrator())
+
+    for column in NODE_COLUMNS:
+        assert -30 < result[column].min() and result[column].max() < 80, column
+    assert result.integrator_stats["forced"] == 0
+
+
+def test_forced_substeps_warn(two_weeks):
+    with pytest.warns(RuntimeWarning, match="forced|tolerance"):
+        result, cycles, crop_mass = run(two_weeks, AdaptiveIntegrator(max_substeps=100))
+    assert result.integrator_stats["forced"] > 0
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from greenhouse_setups.read_profiles import build_params
+from simulation.forcing import Forcing
+from simulation.results import STATE_COLUMNS
+from simulation.run import run_simulation
+
+pytest.importorskip("numba")
+
+
+def stable_forcing(days=10, dt=3600):
+    """Smooth daily cycles that keep the greenhouse away from runaway behaviour."""
+    n = int(days*86400/dt)
+    hours = np.arange(n)*dt/3600
+    time = np.datetime64("2023-01-01") + np.arange(n)*np.timedelta64(int(dt), "s")
+    temperature = 10 + 6*np.sin(2*np.pi*(hours - 9)/24)
+    solar = np.maximum(0, 800*np.sin(2*np.pi*(hours - 6)/24))
+    return Forcing(time, temperature, np.full(n, 60.0), np.full(n, 70.0), solar, np.zeros(n))
+
+
+def test_numba_backend_matches_python_backend():
+    forcing = stable_forcing()
+    params = build_params("suticollo_opt1.json")
+    reference, cycles, crop_mass = run_simulation(None, 10.0, 10.0, 60.0, "Lettuce", 3600, forcing=forcing, params=params, output="states")
+    compiled, compiled_cycles, compiled_crop_mass = run_simulation(None, 10.0, 10.0, 60.0, "Lettuce", 3600, forcing=forcing, params=params, backend="numba")
+
+    for column in STATE_COLUMNS:
+        np.testing.assert_allclose(compiled[column], reference[column], rtol=0, atol=1e-9, err_msg=column)
+    assert compiled_cycles == pytest.approx(cycles, rel=1e-12)
+    assert compiled_crop_mass == pytest.approx(crop_mass, rel=1e-12)
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from greenhouse_setups.read_profiles import build_params
+from simulation.ledger import EnergyLedger, J_PER_KWH
+from simulation.results import STATE_COLUMNS
+from simulation.run import run_simulation
+
+
+@pytest.fixture(scope="module")
+def booked(month):
+    ledger = EnergyLedger(periods=("day", "month"))
+    T_init, RH_init = month["temperature"][0], month["humidity"][0]
+    result, cycles, crop_mass = run_simulation(month, T_init, T_init, RH_init, "Lettuce", 3600, params=build_params("suticollo_opt1.json"),
+                                               output=["Q_air_net", "Q_top_solar"], ledger=ledger)
+    return ledger, result
+
+
+def test_ledger_totals_match_the_recorded_flows(booked):
+    ledger, result = booked
+    totals = ledger.totals().set_index("flux")
+
+    for flux in ("Q_air_net", "Q_top_solar"):
+        assert totals.loc[flux, "energy_kWh"] == pytest.approx(result[flux].sum() * 3600 / J_PER_KWH, rel=1e-9)
+        assert totals.loc[flux, "min_W"] == result[flux].min()
+        assert totals.loc[flux, "max_W"] == result[flux].max()
+    assert totals.loc["Q_top_solar", "night_kWh"] == 0
+
+
+def test_ledger_periods_add_up_to_the_run(booked):
+    ledger, result = booked
+    run = ledger.totals().set_index("flux")
+    days = ledger.totals("day")
+
+    assert days["period"].nunique() == 30
+    summed = days.groupby("flux")[["energy_kWh", "day_kWh", "night_kWh"]].sum()
+    np.testing.assert_allclose(summed.loc[run.index].to_numpy(), run[["energy_kWh", "day_kWh", "night_kWh"]].to_numpy(), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(run["day_kWh"] + run["night_kWh"], run["energy_kWh"], rtol=1e-12, atol=1e-12)
+
+
+def test_ledger_leaves_the_run_unchanged(booked, month):
+    ledger, result = booked
+    T_init, RH_init = month["temperature"][0], month["humidity"][0]
+    plain, cycles, crop_mass = run_simulation(month, T_init, T_init, RH_init, "Lettuce", 3600, params=build_params("suticollo_opt1.json"), output="states")
+
+    for column in STATE_COLUMNS:
+        np.testing.assert_array_equal(result[column], plain[column], err_msg=column)
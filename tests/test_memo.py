@@ -0,0 +1,71 @@
+import math
+
+import numpy as np
+
+from analysis import memo as memo_module
+from analysis.memo import ObjectiveMemo
+
+BOUNDS = [(0.0, 1.0), (10.0, 20.0)]
+
+
+def key(memo, values, crop="Lettuce"):
+    return memo.key("raqaypampa", [2023], crop, "suticollo_opt1.json", dict(zip(("vent_rate", "roof_area"), values)))
+
+
+def test_put_and_get(tmp_path):
+    memo = ObjectiveMemo(str(tmp_path / "objectives.sqlite"))
+    design = key(memo, [0.25, 12.0])
+
+    assert memo.get(design) is None
+    memo.put(design, 1.5, 3.0, 4.5)
+    assert memo.get(design) == (1.5, 3.0, 4.5)
+    assert memo.get(key(memo, [0.25, 12.0], crop="Tomato")) is None
+
+
+def test_unstable_scores_round_trip_as_nan(tmp_path):
+    memo = ObjectiveMemo(str(tmp_path / "objectives.sqlite"))
+    memo.put_many([(key(memo, [0.5, 15.0]), np.nan, 0.0, 0.0)])
+
+    comfort, cycles, crop_mass = memo.get(key(memo, [0.5, 15.0]))
+    assert math.isnan(comfort) and cycles == crop_mass == 0
+
+
+def test_candidates_in_one_grid_cell_share_a_key(tmp_path):
+    memo = ObjectiveMemo(str(tmp_path / "objectives.sqlite"), resolution=1e-2)
+    first = memo.quantize([0.2501, 12.004], BOUNDS)
+    second = memo.quantize([0.2499, 11.996], BOUNDS)
+
+    np.testing.assert_allclose(first, [0.25, 12.0])
+    assert key(memo, first) == key(memo, second)
+    np.testing.assert_array_equal(memo.quantize([-1.0, 25.0], BOUNDS), [0.0, 20.0])
+
+
+def test_counts_are_shared_across_connections(tmp_path):
+    path = str(tmp_path / "objectives.sqlite")
+    memo = ObjectiveMemo(path)
+    memo.put(key(memo, [0.25, 12.0]), 1.0, 2.0, 3.0)
+    memo.get(key(memo, [0.25, 12.0]))
+    memo.get(key(memo, [0.75, 18.0]))
+    memo.close()
+
+    other = ObjectiveMemo(path)
+    other.get(key(other, [0.25, 12.0]))
+    stats = other.stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 2, 1)
+    assert (stats["session_hits"], stats["session_misses"]) == (1, 0)
+    other.close()
+
+
+def test_lookups_are_flushed_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(memo_module, "FLUSH_EVERY", 3)
+    path = str(tmp_path / "objectives.sqlite")
+    memo = ObjectiveMemo(path)
+    reader = ObjectiveMemo(path)
+    counts = lambda: dict(reader.connection.execute("SELECT name, value FROM counts").fetchall())
+
+    memo.get(key(memo, [0.1, 11.0]))
+    memo.get(key(memo, [0.2, 11.0]))
+    assert counts() == {"hits": 0, "misses": 0}
+    memo.get(key(memo, [0.3, 11.0]))
+    assert counts() == {"hits": 0, "misses": 3}
+    assert memo.pending == {"hits": 0, "misses": 0}
@@ -0,0 +1,28 @@
+from simulation.cache import MODEL_VERSION, model_version
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_model_version_follows_the_sources(tmp_path):
+    write(tmp_path / "components" / "walls.py", "K = 1\n")
+    write(tmp_path / "greenhouse_setups" / "default.json", "{}\n")
+    before = model_version(tmp_path)
+
+    write(tmp_path / "components" / "__pycache__" / "walls.cpython.pyc", "compiled")
+    write(tmp_path / "components" / "notes.txt", "not a source")
+    assert model_version(tmp_path) == before
+
+    write(tmp_path / "components" / "walls.py", "K = 2\n")
+    assert model_version(tmp_path) != before
+    write(tmp_path / "components" / "walls.py", "K = 1\n")
+    assert model_version(tmp_path) == before
+
+    write(tmp_path / "greenhouse_setups" / "default.json", '{"vent_rate": 1}\n')
+    assert model_version(tmp_path) != before
+
+
+def test_model_version_of_this_tree():
+    assert MODEL_VERSION == model_version()
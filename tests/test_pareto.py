@@ -0,0 +1,37 @@
+import numpy as np
+
+from analysis.pareto import crowding_distance, non_dominated_sort, pareto_front
+
+
+def test_non_dominated_sort_ranks_fronts():
+    objectives = np.array([
+        [1.0, 4.0],  # front 0
+        [2.0, 2.0],  # front 0
+        [4.0, 1.0],  # front 0
+        [3.0, 3.0],  # dominated by [2, 2]
+        [4.0, 4.0],  # dominated by [3, 3]
+        [2.0, 2.0],  # a duplicate dominates neither
+    ])
+
+    np.testing.assert_array_equal(non_dominated_sort(objectives), [0, 0, 0, 1, 2, 0])
+    np.testing.assert_array_equal(pareto_front(objectives), [0, 1, 2, 5])
+
+
+def test_infinite_objectives_rank_last():
+    objectives = np.array([[1.0, 1.0], [np.inf, np.inf], [2.0, 0.5]])
+
+    np.testing.assert_array_equal(non_dominated_sort(objectives), [0, 1, 0])
+
+
+def test_crowding_distance():
+    objectives = np.array([[0.0, 4.0], [1.0, 3.0], [3.0, 1.0], [4.0, 0.0]])
+
+    # interior rows: sum over objectives of the neighbour gap over the span
+    np.testing.assert_allclose(crowding_distance(objectives), [np.inf, 1.5, 1.5, np.inf])
+    np.testing.assert_array_equal(crowding_distance(objectives[:2]), [np.inf, np.inf])
+
+
+def test_crowding_distance_ignores_a_flat_objective():
+    objectives = np.array([[0.0, 1.0], [1.0, 1.0], [3.0, 1.0]])
+
+    np.testing.assert_allclose(crowding_distance(objectives), [np.inf, 1.0, np.inf])
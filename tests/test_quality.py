@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from greenhouse_setups.read_profiles import build_params
+from simulation.forcing import Forcing
+from simulation.quality import check_forcing
+from simulation.run import run_simulation
+
+
+def make_forcing(steps, step=3600):
+    time = np.datetime64("2020-01-01T00") + np.asarray(steps) * np.timedelta64(step, "s")
+    n = len(steps)
+    return Forcing(time, 10 + np.arange(n, dtype=float), np.full(n, 50.0), np.full(n, 700.0), np.zeros(n), np.full(n, 90.0))
+
+
+def test_swapped_hours_are_put_back_in_order():
+    forcing, report = check_forcing(make_forcing([0, 1, 2, 4, 3, 5, 6]))
+
+    hours = (forcing.time - forcing.time[0]) // np.timedelta64(1, "h")
+    assert list(hours) == list(range(7))
+    assert list(forcing.temperature) == [10, 11, 12, 14, 13, 15, 16]
+    assert report.reordered == 2 and report.inserted == report.duplicates == 0
+    assert report.segments == 1 and not forcing.day_index.any()
+
+
+def test_step_is_inferred_from_the_forcing():
+    original = make_forcing(np.arange(48), step=1800)
+    forcing, report = check_forcing(original)
+
+    assert forcing is original
+    assert report.step == 1800 and report.clean
+
+
+def test_years_out_of_order_stay_in_order():
+    year = make_forcing(np.arange(24))
+    time = np.concatenate([year.time, year.time - np.timedelta64(4 * 365, "D")])
+    joined = Forcing(time, *(np.tile(getattr(year, column), 2) for column in ("temperature", "humidity", "pressure", "solar", "solar_angle")))
+    forcing, report = check_forcing(joined)
+
+    assert forcing is joined
+    assert report.segments == 2 and report.clean
+
+
+def test_run_simulation_warns_about_repaired_weather(month):
+    weather = pd.concat([month.iloc[:48], month.iloc[47:48], month.iloc[48:72]], ignore_index=True)
+    with pytest.warns(UserWarning, match="1 duplicates"):
+        result, cycles, crop_mass = run_simulation(weather, 10.0, 10.0, 60.0, "Lettuce", 3600,
+                                                   params=build_params("suticollo_opt1.json"), output="states")
+    assert len(result["GH_T_air"]) == 72
@@ -0,0 +1,79 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from data import read_nrel
+from data.read_nrel import compile_nrel_data
+
+SOURCE = "data/raqaypampa/2023.csv"
+
+
+@pytest.fixture
+def csv(tmp_path, monkeypatch):
+    """A private copy of the 2023 file with its NPZ cache in tmp_path."""
+    monkeypatch.setattr(read_nrel, "CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "2023.csv"
+    shutil.copy(SOURCE, path)
+    return str(path)
+
+
+def no_parsing(*args, **kwargs):
+    raise AssertionError("the csv was parsed again")
+
+
+def test_cached_frame_is_reused(csv, monkeypatch):
+    parsed = compile_nrel_data(csv, use_cache=True)
+    monkeypatch.setattr(read_nrel, "parse_nrel_data", no_parsing)
+    cached = compile_nrel_data(csv, use_cache=True)
+
+    pd.testing.assert_frame_equal(cached, parsed)
+
+
+def test_touched_file_with_the_same_content_is_reused(csv, monkeypatch):
+    parsed = compile_nrel_data(csv, use_cache=True)
+    stat = os.stat(csv)
+    os.utime(csv, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    monkeypatch.setattr(read_nrel, "parse_nrel_data", no_parsing)
+
+    pd.testing.assert_frame_equal(compile_nrel_data(csv, use_cache=True), parsed)
+
+
+def test_changed_file_invalidates_the_cache(csv):
+    parsed = compile_nrel_data(csv, use_cache=True)
+    with open(csv) as file:
+        lines = file.readlines()
+    fields = lines[3].split(",")
+    column = lines[2].split(",").index("Temperature")
+    fields[column] = str(float(fields[column]) + 10)
+    lines[3] = ",".join(fields)
+    with open(csv, "w") as file:
+        file.writelines(lines)
+
+    changed = compile_nrel_data(csv, use_cache=True)
+    assert changed["temperature"][0] == parsed["temperature"][0] + 10
+    pd.testing.assert_frame_equal(changed.iloc[1:], parsed.iloc[1:])
+
+
+def test_parsers_are_cached_separately(csv):
+    reference = compile_nrel_data(csv, use_cache=True)
+    fast = compile_nrel_data(csv, use_cache=True, fast=True)
+
+    assert reference["temperature"].dtype == "float64"
+    assert fast["temperature"].dtype == "float32"
+    assert len(os.listdir(read_nrel.CACHE_DIR)) == 2
+
+
+def test_plain_load_writes_no_cache(csv):
+    compile_nrel_data(csv)
+
+    assert not os.path.exists(read_nrel.CACHE_DIR)
+
+
+def test_new_parser_version_invalidates_the_cache(csv, monkeypatch):
+    parsed = compile_nrel_data(csv, use_cache=True)
+    monkeypatch.setattr(read_nrel, "PARSER_VERSION", "changed")
+    monkeypatch.setattr(read_nrel, "parse_nrel_data", lambda *args: parsed.assign(temperature=0.0))
+
+    assert (compile_nrel_data(csv, use_cache=True)["temperature"] == 0).all()
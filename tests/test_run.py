@@ -0,0 +1,19 @@
+import numpy as np
+import pytest
+
+from greenhouse_setups.read_profiles import build_params
+from simulation.run import run_simulation
+
+# reference run of the baseline model: suticollo_opt1.json, Raqaypampa 2023, Lettuce, dt=3600
+REFERENCE_CYCLES = 14.107116933963725
+REFERENCE_CROP_MASS = 6.6583044796130935
+
+
+def test_reference_run_is_unchanged(weather):
+    T_init, RH_init = weather["temperature"][0], weather["humidity"][0]
+    result, cycles, crop_mass = run_simulation(weather, T_init, T_init, RH_init, "Lettuce", 3600,
+                                               params=build_params("suticollo_opt1.json"), output="states")
+
+    assert cycles == pytest.approx(REFERENCE_CYCLES, rel=1e-12)
+    assert crop_mass == pytest.approx(REFERENCE_CROP_MASS, rel=1e-12)
+    assert np.isfinite(result["GH_T_air"]).all()
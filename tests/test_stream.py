@@ -0,0 +1,29 @@
+import numpy as np
+
+from greenhouse_setups.read_profiles import build_params
+from simulation.results import STATE_COLUMNS
+from simulation.run import run_simulation
+from simulation.stream import iter_simulation, iter_weather_records
+
+
+def test_iter_simulation_matches_run_simulation(month):
+    params = build_params("suticollo_opt1.json")
+    T_init, RH_init = month["temperature"][0], month["humidity"][0]
+    result, cycles, crop_mass = run_simulation(month, T_init, T_init, RH_init, "Lettuce", 3600, params=params, output="states")
+    records = list(iter_simulation(iter_weather_records(month), T_init, T_init, RH_init, "Lettuce", 3600, params=params))
+
+    assert len(records) == len(month)
+    for column in STATE_COLUMNS:
+        np.testing.assert_array_equal([getattr(record, column) for record in records], result[column], err_msg=column)
+    assert records[-1].cycles == cycles
+    assert records[-1].total_crop_mass == crop_mass
+
+
+def test_iter_simulation_accepts_mappings(month):
+    params = build_params("suticollo_opt1.json")
+    T_init, RH_init = month["temperature"][0], month["humidity"][0]
+    days = month.iloc[:48]
+    from_tuples = list(iter_simulation(iter_weather_records(days), T_init, T_init, RH_init, "Lettuce", 3600, params=params))
+    from_dicts = list(iter_simulation(days.to_dict("records"), T_init, T_init, RH_init, "Lettuce", 3600, params=params))
+
+    assert from_tuples == from_dicts
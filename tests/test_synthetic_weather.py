@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+from data.synthetic_weather import fit_weather_model, generate_weather
+
+
+@pytest.fixture(scope="module")
+def model():
+    return fit_weather_model("raqaypampa", years=[2022, 2023])
+
+
+def test_same_seed_gives_the_same_weather(model):
+    first = pd.concat(generate_weather(model, years=2, seed=7))
+    second = pd.concat(generate_weather(model, years=2, seed=7))
+
+    pd.testing.assert_frame_equal(first, second)
+    assert len(first) == 2 * 365 * 24
+
+
+def test_weather_does_not_depend_on_the_chunking(model):
+    whole = pd.concat(generate_weather(model, years=1, seed=7), ignore_index=True)
+    chunked = pd.concat(generate_weather(model, years=1, seed=7, chunk_days=30), ignore_index=True)
+
+    pd.testing.assert_frame_equal(whole, chunked)
+
+
+def test_seeds_give_different_weather(model):
+    first = next(generate_weather(model, seed=1))
+    second = next(generate_weather(model, seed=2))
+
+    pd.testing.assert_series_equal(first["time"], second["time"])
+    assert not first["temperature"].equals(second["temperature"])
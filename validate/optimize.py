@@ -1,17 +1,35 @@
 import numpy as np
 import pandas as pd
 from scipy.optimize import minimize
-from validate.run_validation_data import validate_simulation  # Your validation function
+from validate.run_validation_data import validate_simulation, load_validation_dataset, validation_rmse  # Your validation function
 from greenhouse_setups.params import update_all_params, roof_solar_absorp_coef, wall_solar_absorp_coef  # Import parameter update function
 from analysis.RMSE import calculate_rmse  # Import RMSE function
 from scipy.optimize import differential_evolution
 from visuals.plot_selected_params import plot_parameters
 from analysis.RMSE import rmse_for_validation
+from simulation.cache import ResultCache
+from analysis.parallel import population_map
+from functools import lru_cache
 
+RESULT_CACHE = ResultCache(max_entries=4)  # per process; DE re-evaluates identical parameter sets once it converges
+DATA_PATH = "data/validate_data/"
 
-def optimize_params():
 
-    global param_bounds
+@lru_cache(maxsize=4)
+def get_dataset(data_path):
+    """The validation dataset, aligned once per process and reused by every candidate."""
+    return load_validation_dataset(data_path)
+
+
+def optimize_params(workers=1, seed=None):
+    """Fits the model parameters to the Suticollo sensor records.
+
+    Args:
+        workers (int): processes evaluating each generation, -1 for all cores.
+        seed (int): seed of differential_evolution; with the deferred updating the
+            result does not depend on workers.
+    """
+    dataset = get_dataset(DATA_PATH)
 
     # Define parameter bounds for optimization (lower bound, upper bound)
     param_bounds = {
@@ -32,7 +50,10 @@ def optimize_params():
 
 
     # run opt
-    result = differential_evolution(objective_function, bounds, x0=init, strategy="best1bin", popsize=30, tol=0.001)
+    param_keys = list(param_bounds.keys())
+    with population_map(workers, get_dataset, (DATA_PATH,)) as population:
+        result = differential_evolution(objective_function, bounds, args=(param_keys, DATA_PATH), x0=init, strategy="best1bin", popsize=30, tol=0.001,
+                                        updating="deferred", workers=population, seed=seed)
 
     # params extract
     optimal_params = {list(param_bounds.keys())[i]: result.x[i] for i in range(len(result.x))}
@@ -40,36 +61,34 @@ def optimize_params():
     print("\nOptimal Parameters Found:")
     print(optimal_params)
 
-    recorded_data_path = "data/validate_data/"
-    validated_results = validate_simulation(recorded_data_path)
+    validated_results = validate_simulation(DATA_PATH, dataset=dataset)
 
     return optimal_params, validated_results
 
-def objective_function(param_values):
+def objective_function(param_values, param_keys, data_path=DATA_PATH):
     """
     Objective function for optimization, runs the simulation with given parameters and returns the RMSE.
     
     Parameters:
         param_values (list): List of parameter values in the order of param_keys.
+        param_keys (list): names of the optimized parameters.
+        data_path (str): folder of the validation data.
     
     Returns:
         float: RMSE value (error between simulation and recorded data).
     """
 
     
-    param_keys = list(param_bounds.keys()) # mapping to values
-    param_dict = {param_keys[i]: param_values[i] for i in range(len(param_keys))}
+    param_dict = {param_keys[i]: param_values[i] for i in range(len(param_keys))} # mapping to values
 
 
-    recorded_data_path = "data/validate_data/"  
-    validated_results = validate_simulation(recorded_data_path, param_dict) # run
-    if validated_results is None:
+    rmse = validation_rmse(get_dataset(data_path), param_dict, cache=RESULT_CACHE) # run
+    if rmse is None:
         print(f"Tried Parameters: {param_dict}, RMSE: -") 
 
         return 1000000
     
 
-    rmse = rmse_for_validation(validated_results)
     print(f"Trying Parameters: {param_dict}, RMSE: {rmse:.4f}") 
 
 
@@ -1,52 +1,127 @@
 import pandas as pd
+import numpy as np
 import os
+import hashlib
+import warnings
 from simulation.run import run_simulation  # Import your simulation function
 from analysis.RMSE import calculate_rmse  # Import your RMSE function
-from data.read_nrel import compile_nrel_data
-
-def validate_simulation(data_path, params_dict=None):
-
-    csv_files = {
-        "Sensor 1": os.path.join(data_path, "1.csv"),  # Top Temp
-        "Sensor 2": os.path.join(data_path, "2.csv"),  # Crop Level Temp
-        "Sensor 3": os.path.join(data_path, "3.csv"),  # Air Temp
-        "Sensor 4": os.path.join(data_path, "4.csv"),  # Outside Temp
-    }
-
-    sensor_names = {
-        "Sensor 1": "top_temp",
-        "Sensor 2": "croplvl_temp",
-        "Sensor 3": "air_temp",
-        "Sensor 4": "outside_temp",
-    }
-
-    # aggrigate to hourly
-    data_frames = []
-    for sensor, file in csv_files.items():
-        df = pd.read_csv(file, delimiter=";", parse_dates=["Date"], dayfirst=True)
-        df = df.rename(columns={df.columns[2]: sensor_names[sensor]})  # rename
-        df = df.set_index("Date").resample("h").mean().reset_index()  # hourly (through averaging)
-        data_frames.append(df[["Date", sensor_names[sensor]]])
-
-    # merge sensor data
-    merged_df = data_frames[0]
-    for df in data_frames[1:]:
-        merged_df = merged_df.merge(df, on="Date", how="outer")
-
-    merged_df = merged_df.sort_values(by="Date")
-    merged_df = merged_df.rename(columns={"Date": "time"})  #align columns
+from data.read_nrel import compile_nrel_data, CACHE_DIR
+from simulation.forcing import build_forcing
+from simulation.quality import check_weather
+from greenhouse_setups.read_profiles import build_params
+
+SENSOR_FILES = {
+    "Sensor 1": "1.csv",  # Top Temp
+    "Sensor 2": "2.csv",  # Crop Level Temp
+    "Sensor 3": "3.csv",  # Air Temp
+    "Sensor 4": "4.csv",  # Outside Temp
+}
+SENSOR_NAMES = {
+    "Sensor 1": "top_temp",
+    "Sensor 2": "croplvl_temp",
+    "Sensor 3": "air_temp",
+    "Sensor 4": "outside_temp",
+}
+WEATHER_FILE = "suticollo 2025-02-11 to 2025-02-19.csv"
+SOLAR_ANGLE_FILE = "solar_angle.csv"
+
+
+class ValidationDataset:
+    """Sensor records aligned hourly with the weather forcing, ready to simulate.
+
+    Built once by load_validation_dataset and reused for every validate_simulation
+    call, e.g. all candidates of the validation optimizer.
+    """
+
+    def __init__(self, frame):
+        self.frame = frame
+        self.forcing = build_forcing(frame)
+
+        self.T_air_init = frame["air_temp"].dropna().iloc[0]
+        self.T_top_init = frame["top_temp"].dropna().iloc[0]
+        self.RH_init = frame["humidity"].dropna().iloc[0]
+
+
+def load_validation_dataset(data_path, use_cache=True, sensor_store=None):
+    """The aligned validation dataset of a folder of sensor and weather files.
+
+    The aligned frame is checked and repaired with simulation.quality.check_weather
+    and cached in CACHE_DIR under a hash of the source files' contents, so it is
+    only rebuilt when one of them changes.
+
+    Args:
+        data_path (str): folder with the sensor csv files, the hourly weather and solar_angle.csv.
+        use_cache (bool): read and write the cache.
+        sensor_store (SensorStore): incremental store of the sensor logs, see align_validation_data.
+
+    Returns:
+        ValidationDataset: the aligned dataset.
+    """
+    sources = [*SENSOR_FILES.values(), WEATHER_FILE, SOLAR_ANGLE_FILE]
+    digest = hashlib.sha256(b"checked")
+    for name in sources:
+        digest.update(name.encode())
+        with open(os.path.join(data_path, name), "rb") as file:
+            digest.update(file.read())
+    cache_path = os.path.join(CACHE_DIR, f"validation_{digest.hexdigest()[:16]}.npz")
+
+    if use_cache and os.path.exists(cache_path):
+        with np.load(cache_path) as cached:
+            return ValidationDataset(pd.DataFrame({name: cached[name] for name in cached.files}))
+
+    frame, quality = check_weather(align_validation_data(data_path, sensor_store))
+    if not quality.clean:
+        warnings.warn(f"Validation data of {data_path} repaired:\n{quality}")
+    if use_cache:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_path + ".tmp", "wb") as file:
+            np.savez(file, **{name: frame[name].to_numpy() for name in frame.columns})
+        os.replace(cache_path + ".tmp", cache_path)
+    return ValidationDataset(frame)
+
+
+def align_validation_data(data_path, sensor_store=None):
+    """Reads the sensor and weather files and aligns them on the hourly sensor times.
+
+    With a sensor_store (validate.sensor_store.SensorStore) the sensor logs are
+    ingested into it incrementally, so only readings appended since the last call
+    are parsed, and the hourly means come from the store.
+    """
+
+    csv_files = {sensor: os.path.join(data_path, name) for sensor, name in SENSOR_FILES.items()}
+
+    if sensor_store is not None:
+        for sensor, file in csv_files.items():
+            sensor_store.ingest(file, SENSOR_NAMES[sensor])
+        merged_df = sensor_store.frame([SENSOR_NAMES[sensor] for sensor in csv_files])
+    else:
+        # aggrigate to hourly
+        data_frames = []
+        for sensor, file in csv_files.items():
+            df = pd.read_csv(file, delimiter=";", parse_dates=["Date"], dayfirst=True)
+            df = df.rename(columns={df.columns[2]: SENSOR_NAMES[sensor]})  # rename
+            df = df.set_index("Date").resample("h").mean().reset_index()  # hourly (through averaging)
+            data_frames.append(df[["Date", SENSOR_NAMES[sensor]]])
+
+        # merge sensor data
+        merged_df = data_frames[0]
+        for df in data_frames[1:]:
+            merged_df = merged_df.merge(df, on="Date", how="outer")
+
+        merged_df = merged_df.sort_values(by="Date")
+        merged_df = merged_df.rename(columns={"Date": "time"})  #align columns
 
     #loud hourly
-    hourly_file_path = os.path.join(data_path, "suticollo 2025-02-11 to 2025-02-19.csv")
+    hourly_file_path = os.path.join(data_path, WEATHER_FILE)
     df_hourly = pd.read_csv(hourly_file_path, parse_dates=["datetime"])
 
-    solar_angle_data_path = os.path.join(data_path, "solar_angle.csv")
+    solar_angle_data_path = os.path.join(data_path, SOLAR_ANGLE_FILE)
     solar_angle_data = compile_nrel_data(solar_angle_data_path)
 
 
     df_hourly = df_hourly.rename(columns={"datetime": "time", "humidity": "humidity", "solarradiation": "solar"}) # keep relevant only in our data
 
-    merged_df["time"] = pd.to_datetime(merged_df["time"]) # ensure timestamps are good
+    merged_df["time"] = pd.to_datetime(merged_df["time"]).astype(solar_angle_data["time"].dtype) # ensure timestamps are good (and of one unit)
     df_hourly["time"] = pd.to_datetime(df_hourly["time"])
     solar_angle_data["time"] = pd.to_datetime(solar_angle_data["time"])
 
@@ -59,14 +134,23 @@ def validate_simulation(data_path, params_dict=None):
     merged_df["temperature"] = merged_df["outside_temp"]
     merged_df["pressure"] = 721
 
-    T_air_init = merged_df["air_temp"].dropna().iloc[0]  
-    T_top_init = merged_df["top_temp"].dropna().iloc[0]  
-    RH_init = merged_df["humidity"].dropna().iloc[0]  
+    return merged_df.reset_index(drop=True)
 
-    simulated_data, cycles, crop_mass = run_simulation(merged_df, T_air_init, T_top_init, RH_init, "Lettuce", 3600, "suticollo_opt1.json", params_dict) # run sim
+
+def validate_simulation(data_path, params_dict=None, output="full", cache=None, dataset=None):
+    """Simulates the Suticollo greenhouse over the recorded period and compares it with the sensors.
+
+    dataset (a ValidationDataset) skips loading and aligning the files of data_path.
+    """
+    if dataset is None: dataset = load_validation_dataset(data_path)
+    merged_df = dataset.frame
+    T_air_init, T_top_init, RH_init = dataset.T_air_init, dataset.T_top_init, dataset.RH_init
+
+    simulated_data, cycles, crop_mass = run_simulation(merged_df, T_air_init, T_top_init, RH_init, "Lettuce", 3600, "suticollo_opt1.json", params_dict, forcing=dataset.forcing, output=output, cache=cache) # run sim
     #simulated_data.to_csv("data/raqaypampa/simulated_greenhouse_suticollo_2025.csv", index=False)
     if simulated_data is None:
         return None
+    simulated_data = simulated_data.to_frame()
 
     # compute difference
     simulated_data["difference"] = simulated_data["air_temp"] - simulated_data["GH_T_air"]
@@ -76,3 +160,20 @@ def validate_simulation(data_path, params_dict=None):
     simulated_data["RMSE"] = rmse_value
 
     return simulated_data
+
+
+def validation_rmse(dataset, params_dict=None, cache=None):
+    """rmse_for_validation of a parameter set, computed on the result arrays.
+
+    The optimizer's fast path: only the states are simulated and no DataFrame is
+    built, and the parameters are built without touching the loaded setup, so
+    candidates can run in any worker process. Returns None if the run is unstable.
+    """
+    params = build_params("suticollo_opt1.json", params_dict)
+    simulated_data, _, _ = run_simulation(dataset.frame, dataset.T_air_init, dataset.T_top_init, dataset.RH_init, "Lettuce", 3600, forcing=dataset.forcing, params=params, output="states", cache=cache)
+    if simulated_data is None:
+        return None
+
+    rmse = calculate_rmse(dataset.frame["air_temp"].to_numpy(), simulated_data["GH_T_air"])
+    rmse2 = calculate_rmse(dataset.frame["top_temp"].to_numpy(), simulated_data["GH_T_top"])
+    return rmse+rmse2
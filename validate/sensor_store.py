@@ -0,0 +1,192 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+
+SENSOR_DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
+
+class SensorStore:
+    """Sensor readings aggregated to the model time step, built incrementally from logger files.
+
+    Each ingest reads a logger csv in chunks from where the previous ingest of that
+    file stopped (a byte offset checkpoint) and adds the chunk's readings to running
+    sums and counts per time step, so appending a day of logs costs that day's parse
+    and memory is bounded by the chunk size. Means are formed on read, which keeps
+    steps that straddle two ingests exact. Each sensor is fed by one file.
+
+    Files in directory: index.json (step, sensors, checkpoints) and data.npz (the
+    step times and, per sensor, the sums and counts).
+
+    Args:
+        directory (str): folder of the store, created if missing.
+        step (int): aggregation step in seconds; an existing store keeps its own.
+    """
+
+    def __init__(self, directory, step=3600):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        index_path = os.path.join(directory, "index.json")
+
+        self.step = step
+        self.sensors = []
+        self.checkpoints = {}
+        self.times = np.empty(0, dtype=np.int64)  # ns, start of each step
+        self.sums = {}
+        self.counts = {}
+
+        if os.path.exists(index_path):
+            with open(index_path) as file:
+                index = json.load(file)
+            self.step, self.sensors, self.checkpoints = index["step"], index["sensors"], index["checkpoints"]
+            with np.load(os.path.join(directory, "data.npz")) as data:
+                self.times = data["times"]
+                for sensor in self.sensors:
+                    self.sums[sensor] = data[f"{sensor}_sum"]
+                    self.counts[sensor] = data[f"{sensor}_count"]
+
+    def ingest(self, file_path, sensor, chunksize=100_000, tail=False):
+        """Adds the readings of a logger file not ingested yet.
+
+        The readings are staged and only added to the store together with the new
+        checkpoint, so an ingest that fails part way adds nothing and can be retried.
+        A file shorter than its checkpoint was rotated or rewritten: it is read from
+        the start and replaces the sensor's readings.
+
+        Args:
+            file_path (str): semicolon separated logger csv (ID;Date;value;).
+            sensor (str): column name of the readings in the store.
+            chunksize (int): rows parsed at once.
+            tail (bool): the file is still being written; stop at the last complete
+                line instead of the end of the file.
+
+        Returns:
+            int: number of rows read.
+        """
+        key = f"{os.path.abspath(file_path)}::{sensor}"
+        offset = self.checkpoints.get(key, 0)
+        size = os.path.getsize(file_path)
+        rotated = size < offset
+        if rotated:
+            offset = 0
+
+        with open(file_path, "rb") as file:
+            end = _last_line_end(file, size) if tail else size
+            if end <= offset:
+                return 0
+            file.seek(offset)
+            reader = pd.read_csv(_Window(file, end - offset), sep=";", header=None, usecols=[1, 2], names=["ID", "Date", "value", "_"],
+                                 skiprows=1 if offset == 0 else 0, chunksize=chunksize, encoding="utf-8-sig")
+            rows = 0
+            staged = []
+            for chunk in reader:
+                time = pd.to_datetime(chunk["Date"], format=SENSOR_DATE_FORMAT).to_numpy().astype("datetime64[ns]").view(np.int64)
+                staged.append(self._aggregate(time, chunk["value"].to_numpy(dtype=float)))
+                rows += len(chunk)
+
+        if rotated and sensor in self.sensors:
+            self.sums[sensor][:] = 0
+            self.counts[sensor][:] = 0
+        if staged:
+            self._add(sensor, *_combine(staged))
+        self.checkpoints[key] = end
+        self.save()
+        return rows
+
+    def _aggregate(self, time, values):
+        """(steps, sums, counts) of the valid readings."""
+        step_ns = self.step * 10**9
+        valid = ~np.isnan(values)
+        bins, inverse = np.unique(time[valid] // step_ns * step_ns, return_inverse=True)
+        sums = np.bincount(inverse, weights=values[valid], minlength=len(bins))
+        counts = np.bincount(inverse, minlength=len(bins))
+        return bins, sums, counts
+
+    def _add(self, sensor, bins, sums, counts):
+        if sensor not in self.sensors:
+            self.sensors.append(sensor)
+            self.sums[sensor] = np.zeros(len(self.times))
+            self.counts[sensor] = np.zeros(len(self.times), dtype=np.int64)
+
+        times = np.union1d(self.times, bins)
+        if len(times) != len(self.times):
+            at = np.searchsorted(times, self.times)
+            for name in self.sensors:
+                grown_sums, grown_counts = np.zeros(len(times)), np.zeros(len(times), dtype=np.int64)
+                grown_sums[at], grown_counts[at] = self.sums[name], self.counts[name]
+                self.sums[name], self.counts[name] = grown_sums, grown_counts
+            self.times = times
+
+        at = np.searchsorted(self.times, bins)
+        self.sums[sensor][at] += sums
+        self.counts[sensor][at] += counts
+
+    def save(self):
+        data_path = os.path.join(self.directory, "data.npz")
+        with open(data_path + ".tmp", "wb") as file:
+            np.savez(file, times=self.times, **{f"{sensor}_sum": self.sums[sensor] for sensor in self.sensors},
+                     **{f"{sensor}_count": self.counts[sensor] for sensor in self.sensors})
+        os.replace(data_path + ".tmp", data_path)
+        with open(os.path.join(self.directory, "index.json"), "w") as file:
+            json.dump({"step": self.step, "sensors": self.sensors, "checkpoints": self.checkpoints}, file, indent=4)
+
+    def frame(self, sensors=None):
+        """Mean reading per step on a regular grid from the first to the last step.
+
+        Returns:
+            DataFrame: time and one column per sensor, NaN where a step has no readings.
+        """
+        sensors = self.sensors if sensors is None else sensors
+        step_ns = self.step * 10**9
+        if len(self.times) == 0:
+            return pd.DataFrame({"time": np.empty(0, dtype="datetime64[ns]"), **{sensor: np.empty(0) for sensor in sensors}})
+
+        grid = np.arange(self.times[0], self.times[-1] + step_ns, step_ns)
+        at = np.searchsorted(grid, self.times)
+        columns = {"time": grid.view("datetime64[ns]")}
+        for sensor in sensors:
+            means = np.full(len(grid), np.nan)
+            counts = self.counts[sensor]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[at] = np.where(counts > 0, self.sums[sensor] / counts, np.nan)
+            columns[sensor] = means
+        return pd.DataFrame(columns)
+
+
+def _combine(staged):
+    """Joins the (steps, sums, counts) of several chunks."""
+    bins, inverse = np.unique(np.concatenate([bins for bins, _, _ in staged]), return_inverse=True)
+    sums = np.bincount(inverse, weights=np.concatenate([sums for _, sums, _ in staged]), minlength=len(bins))
+    counts = np.bincount(inverse, weights=np.concatenate([counts for _, _, counts in staged]), minlength=len(bins)).astype(np.int64)
+    return bins, sums, counts
+
+
+class _Window:
+    """File-like view of the next length bytes of a file."""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def __iter__(self):
+        return iter(self.read().splitlines(keepends=True))
+
+
+def _last_line_end(file, size):
+    """Byte position after the last newline of the file."""
+    position = size
+    while position > 0:
+        start = max(0, position - 4096)
+        file.seek(start)
+        block = file.read(position - start)
+        newline = block.rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        position = start
+    return 0